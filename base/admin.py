@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Subject, Material, Goal, Profile, UserProgress, JournalEntry, Certificate, Question, PracticalChallenge
+from .models import Subject, Material, Goal, Profile, UserProgress, JournalEntry, Certificate, Question, PracticalChallenge, CertificateRenderJob, SubjectProgress, XPEvent, QuizAttempt, QuizAnswer, QuestionStats
 
 # 1. Setup Questions to appear inside the Goal page
 class QuestionInline(admin.StackedInline):
@@ -15,12 +15,36 @@ class PracticalChallengeInline(admin.StackedInline):
 class GoalAdmin(admin.ModelAdmin):
     inlines = [QuestionInline, PracticalChallengeInline]
 
-# 4. Register Everything
+# 4. Quiz attempts with their answers; per-question correctness
+class QuizAnswerInline(admin.TabularInline):
+    model = QuizAnswer
+    extra = 0
+
+class QuizAttemptAdmin(admin.ModelAdmin):
+    inlines = [QuizAnswerInline]
+    list_display = ('user', 'goal', 'score', 'total', 'passed', 'created_at')
+    list_filter = ('passed',)
+
+class QuestionStatsAdmin(admin.ModelAdmin):
+    list_display = ('question', 'attempts', 'correct', 'correct_rate')
+    ordering = ('question',)
+
+class ProfileAdmin(admin.ModelAdmin):
+    list_display = ('user', 'total_score')
+    ordering = ('-total_score', 'user')  # served by profile_score_idx
+    list_select_related = ('user',)
+
+# 5. Register Everything
 admin.site.register(Subject)
 admin.site.register(Material)
 admin.site.register(Goal, GoalAdmin)
-admin.site.register(Profile)
+admin.site.register(Profile, ProfileAdmin)
 admin.site.register(UserProgress)
+admin.site.register(SubjectProgress)
+admin.site.register(XPEvent)
+admin.site.register(QuizAttempt, QuizAttemptAdmin)
+admin.site.register(QuestionStats, QuestionStatsAdmin)
 admin.site.register(JournalEntry)
 admin.site.register(Certificate)
+admin.site.register(CertificateRenderJob)
 # admin.site.register(PracticalChallenge) # No need to register separately, it's inside Goal
\ No newline at end of file
@@ -3,3 +3,7 @@ from django.apps import AppConfig
 
 class BaseConfig(AppConfig):
     name = 'base'
+
+    def ready(self):
+        # Connect cache-invalidation / bookkeeping signal handlers
+        from . import signals  # noqa: F401
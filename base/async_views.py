@@ -0,0 +1,138 @@
+from asgiref.sync import sync_to_async
+from django.contrib import messages
+from django.contrib.auth.decorators import login_required
+from django.shortcuts import redirect, render
+from django.utils.functional import SimpleLazyObject
+
+from . import attempts, catalog, grading, journal, leaderboard, uploads
+from .completion import complete_goal
+from .models import JournalEntry
+from .progress import ProgressIndex, asubject_progress
+
+# Async versions of the learning-flow views, routed instead of the ones in
+# base/views.py when USE_ASYNC_VIEWS is on (serve studybuddy.asgi:application).
+# Same URLs, templates and behaviour; what changes is what blocks:
+#   - reads use the async ORM / cache APIs (or in-memory catalog data);
+#   - writes that need a transaction (complete_goal) and image uploads run in a
+#     thread, so a slow certificate insert or upload no longer pins a worker;
+#   - templates render in a thread too: they may touch lazy data (request.profile,
+#     uncached dashboard panels) that has to be loaded synchronously.
+arender = sync_to_async(render)
+acomplete_goal = sync_to_async(complete_goal)
+
+
+async def _user(request):
+    # Load the user once, asynchronously, and keep it for the template (request.user
+    # would otherwise load it again, synchronously)
+    request.user = await request.auser()
+    return request.user
+
+
+async def home(request):
+    user = await _user(request)
+    # 1. CHECK: If user is NOT logged in, show the Landing Page
+    if not user.is_authenticated:
+        return await arender(request, 'base/landing.html')
+
+    # 2. IF LOGGED IN: Dashboard (panels are cached fragments; the leaderboard and rank
+    # stay lazy so a warm render runs no queries, see views.home)
+    subjects = (await catalog.asnapshot()).subjects
+    context = {
+        'subjects': subjects,
+        'leaderboard': leaderboard.top(5),
+        'my_rank': SimpleLazyObject(lambda: leaderboard.rank_for(user)[0]),
+    }
+    return await arender(request, 'base/home.html', context)
+
+
+@login_required(login_url='login')
+async def subject_page(request, pk):
+    user = await _user(request)
+    # 1. Subject, materials and goals from the in-memory catalog snapshot
+    subject = await catalog.aget_subject_or_404(pk)
+    snapshot = await catalog.asnapshot()
+
+    # 2. Completed goal ids (cached set) and the header counters
+    request._progress_index = ProgressIndex(user)
+    completed_ids = await request._progress_index.acompleted_ids(subject.id)
+    progress = await asubject_progress(user, subject)
+
+    context = {
+        'subject': subject,
+        'materials': snapshot.materials_by_subject.get(subject.id, []),
+        'goals': snapshot.goals_by_subject.get(subject.id, []),
+        'completed_ids': completed_ids,
+        'progress': progress,
+    }
+    return await arender(request, 'base/subject.html', context)
+
+
+@login_required(login_url='login')
+async def mark_complete(request, subject_id, goal_id):
+    user = await _user(request)
+    if request.method == 'POST':
+        goal = await catalog.aget_goal_or_404(goal_id)
+
+        # Transactional write (+ certificate check): in a thread
+        result = await acomplete_goal(user, goal, 'goal')
+        if result.certificate:
+            return redirect('certificate', pk=result.certificate.id)
+
+    return redirect('subject', pk=subject_id)
+
+
+@login_required(login_url='login')
+async def submit_quiz(request, subject_id, goal_id):
+    user = await _user(request)
+    if request.method == 'POST':
+        # 1. Goal and compiled answer key (cached, see base/grading.py)
+        goal = await catalog.aget_goal_or_404(goal_id)
+        key = await grading.aanswer_key(goal.id)
+
+        # 2. Grade (pure CPU) and queue the attempt (in-memory buffer, no I/O)
+        result = grading.grade(key, request.POST)
+        if result.total:
+            attempts.record_attempt(user, result)
+
+        # 3. Must get 100% to pass
+        if result.passed:
+            completion = await acomplete_goal(user, goal, 'quiz')
+            if completion.created:
+                messages.success(request, f"Quiz Passed! +{goal.points} XP")
+                if completion.certificate:
+                    return redirect('certificate', pk=completion.certificate.id)
+            else:
+                messages.info(request, "You have already completed this quiz.")
+        elif result.total:
+            wrong = ", ".join(str(n) for n in result.wrong_numbers)
+            messages.error(request, f"You scored {result.score}/{result.total}. You need 100% to pass. "
+                                    f"Check question(s) {wrong} and try again!")
+
+    return redirect('subject', pk=subject_id)
+
+
+def _read_journal_form(request):
+    # Parsing the multipart body and checking/downsampling the image is the slow part
+    image = uploads.accept_image(request, 'image')
+    fields = {name: request.POST.get(name) for name in ('title', 'description', 'date', 'start_time', 'end_time')}
+    return fields, image
+
+
+@login_required(login_url='login')
+async def journal_page(request):
+    user = await _user(request)
+    if request.method == 'POST':
+        try:
+            fields, image = await sync_to_async(_read_journal_form, thread_sensitive=False)(request)
+        except uploads.UploadRejected as exc:
+            messages.error(request, str(exc))
+            return redirect('journal')
+
+        await JournalEntry.objects.acreate(user=user, image=image, **fields)
+        return redirect('journal')
+
+    # First page of the timeline; the rest loads on scroll (views.journal_entries)
+    start, end = journal.parse_range(request.GET)
+    entries, next_cursor = await journal.aentries_page(user, start=start, end=end)
+    context = {'entries': entries, 'next_cursor': next_cursor, 'start': start, 'end': end}
+    return await arender(request, 'base/journal.html', context)
@@ -0,0 +1,127 @@
+import atexit
+import logging
+import threading
+from collections import Counter
+
+from django.conf import settings
+from django.db import DatabaseError, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .background import submit
+from .models import Goal, Question, QuestionStats, QuizAnswer, QuizAttempt
+
+logger = logging.getLogger(__name__)
+
+# Quiz attempt history. submit_quiz only appends the graded result to an in-process
+# buffer (a list append under a lock); the buffer is written in one transaction with
+# bulk_create once it holds QUIZ_ATTEMPT_BATCH_SIZE attempts or QUIZ_ATTEMPT_FLUSH_SECONDS
+# after the first unflushed one, whichever comes first. The same write adds each batch
+# to the per-question QuestionStats counters, so difficulty stats never scan attempts.
+# Trade-off: attempts still buffered when a worker is killed are lost (they're analytics,
+# not progress; completions and XP are written synchronously by complete_goal).
+_buffer = []
+_lock = threading.Lock()
+_timer = None
+
+
+def batch_size():
+    return getattr(settings, 'QUIZ_ATTEMPT_BATCH_SIZE', 200)
+
+
+def flush_interval():
+    return getattr(settings, 'QUIZ_ATTEMPT_FLUSH_SECONDS', 5)
+
+
+def record_attempt(user, result):
+    """Queues one graded attempt (a base.grading.GradeResult). Never touches the database."""
+    row = (user.id, result.key.goal_id, result.key.question_ids, result.given,
+           result.correct, result.score, timezone.now())
+    with _lock:
+        _buffer.append(row)
+        full = len(_buffer) >= batch_size()
+        if not full:
+            _schedule_flush()
+    if full:
+        submit(flush)
+
+
+def _schedule_flush():
+    # Caller holds _lock
+    global _timer
+    if _timer is None:
+        _timer = threading.Timer(flush_interval(), _timed_flush)
+        _timer.daemon = True
+        _timer.start()
+
+
+def _timed_flush():
+    global _timer
+    with _lock:
+        _timer = None
+    submit(flush)
+
+
+def flush():
+    """Writes everything buffered so far. Returns the number of attempts written."""
+    with _lock:
+        rows = _buffer[:]
+        _buffer.clear()
+    if rows:
+        try:
+            write(rows)
+        except DatabaseError:
+            # One bad row shouldn't cost everyone else's attempts: retry them one by one
+            logger.exception("Could not write %d buffered quiz attempts as a batch", len(rows))
+            for row in rows:
+                try:
+                    write([row])
+                except DatabaseError:
+                    logger.exception("Dropping quiz attempt of user %s on goal %s", row[0], row[1])
+    return len(rows)
+
+
+@transaction.atomic
+def write(rows):
+    # Goals/questions deleted since the submission can't be referenced any more
+    goal_ids = set(Goal.objects.filter(id__in={row[1] for row in rows}).values_list('id', flat=True))
+    question_ids = set(
+        Question.objects.filter(id__in={qid for row in rows for qid in row[2]}).values_list('id', flat=True)
+    )
+    rows = [row for row in rows if row[1] in goal_ids]
+
+    attempts = QuizAttempt.objects.bulk_create([
+        QuizAttempt(user_id=user_id, goal_id=goal_id, score=score, total=len(qids),
+                    passed=bool(qids) and score == len(qids), created_at=submitted_at)
+        for user_id, goal_id, qids, _given, _correct, score, submitted_at in rows
+    ], batch_size=500)
+
+    answers = []
+    seen, right = Counter(), Counter()
+    for attempt, (_user_id, _goal_id, qids, given, correct, _score, _at) in zip(attempts, rows):
+        for question_id, choice, ok in zip(qids, given, correct):
+            if question_id not in question_ids:
+                continue
+            answers.append(QuizAnswer(attempt=attempt, question_id=question_id, given=choice or '', is_correct=ok))
+            seen[question_id] += 1
+            right[question_id] += ok
+    QuizAnswer.objects.bulk_create(answers, batch_size=1000)
+
+    # Incremental stats: one UPDATE per question in the batch
+    QuestionStats.objects.bulk_create([QuestionStats(question_id=qid) for qid in seen], ignore_conflicts=True)
+    now = timezone.now()
+    for question_id, count in seen.items():
+        QuestionStats.objects.filter(question_id=question_id).update(
+            attempts=F('attempts') + count, correct=F('correct') + right[question_id], updated_at=now,
+        )
+    return len(attempts)
+
+
+def _flush_at_exit():
+    try:
+        flush()
+    except Exception:
+        logger.exception("Could not write buffered quiz attempts at shutdown")
+
+
+atexit.register(_flush_at_exit)
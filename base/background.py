@@ -0,0 +1,48 @@
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+
+logger = logging.getLogger(__name__)
+
+# In-process worker pool for work that should not hold up the response
+# (certificate images, etc.). No broker needed: jobs that must survive a
+# restart are also recorded in the database and can be drained by a
+# management command.
+_executor = None
+_lock = threading.Lock()
+
+
+def get_executor():
+    global _executor
+    if _executor is None:
+        with _lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(
+                    max_workers=getattr(settings, 'BACKGROUND_WORKERS', 2),
+                    thread_name_prefix='studybuddy-bg',
+                )
+    return _executor
+
+
+def _run(fn, args, kwargs):
+    close_old_connections()
+    try:
+        return fn(*args, **kwargs)
+    except Exception:
+        logger.exception("Background task %s failed", getattr(fn, '__name__', fn))
+        raise
+    finally:
+        # Worker threads get their own DB connection; don't leak it
+        close_old_connections()
+
+
+def submit(fn, *args, **kwargs):
+    return get_executor().submit(_run, fn, args, kwargs)
+
+
+def submit_on_commit(fn, *args, **kwargs):
+    # Only start once the rows the task needs are visible to other connections
+    transaction.on_commit(lambda: submit(fn, *args, **kwargs))
@@ -0,0 +1,385 @@
+import time
+
+# Micro-benchmarks, run with: python manage.py benchmark <name>
+# Each one is registered with @benchmark and receives a `write` callable for
+# its output plus the number of iterations requested on the command line.
+BENCHMARKS = {}
+
+
+def benchmark(name):
+    def register(fn):
+        BENCHMARKS[name] = fn
+        return fn
+    return register
+
+
+def rate(fn, iterations):
+    # Calls per second over `iterations` runs
+    start = time.perf_counter()
+    for _ in range(iterations):
+        fn()
+    elapsed = time.perf_counter() - start
+    return iterations / elapsed if elapsed else float('inf')
+
+
+@benchmark('certificates')
+def certificates_benchmark(write, iterations):
+    from .utils import clear_render_cache, generate_certificate_image
+
+    def render(**kwargs):
+        return generate_certificate_image("Ada Lovelace", "Web Development (Modular)", "2026-01-01", **kwargs)
+
+    def cold_render():
+        # What every call used to cost: load fonts and draw the static layer from scratch
+        clear_render_cache()
+        render()
+
+    write(f"Rendering {iterations} certificates per variant...")
+    before = rate(cold_render, iterations)
+    render()  # warm the caches
+    rows = [
+        ("before (no reuse, PNG)", before),
+        ("after (cached layer, PNG)", rate(render, iterations)),
+        ("after (cached layer, optimized PNG)", rate(lambda: render(optimize=True), iterations)),
+        ("after (cached layer, WebP)", rate(lambda: render(image_format='WEBP'), iterations)),
+    ]
+    for label, per_second in rows:
+        write(f"  {label:<40} {per_second:8.1f} certificates/s")
+
+    sizes = {
+        'PNG': len(render().read()),
+        'PNG optimized': len(render(optimize=True).read()),
+        'WebP': len(render(image_format='WEBP').read()),
+    }
+    write("  output size: " + ", ".join(f"{name} {size / 1024:.0f} KB" for name, size in sizes.items()))
+
+
+def _peak_rss_kb(fn, *args):
+    # Runs fn in a forked child and returns how far its peak RSS rose (ru_maxrss, KB on Linux)
+    import multiprocessing
+    import resource
+
+    def child(conn):
+        baseline = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        fn(*args)
+        conn.send(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - baseline)
+
+    parent, conn = multiprocessing.get_context('fork').Pipe()
+    process = multiprocessing.get_context('fork').Process(target=child, args=(conn,))
+    process.start()
+    peak = parent.recv()
+    process.join()
+    return peak
+
+
+@benchmark('uploads')
+def uploads_benchmark(write, iterations):
+    import os
+    import tempfile
+    from io import BytesIO
+
+    from PIL import Image
+    from django.core.files.uploadedfile import TemporaryUploadedFile
+
+    from .uploads import process_image
+
+    # A 24MP phone-sized JPEG, written once to disk like a streamed upload would be
+    path = os.path.join(tempfile.mkdtemp(), 'photo.jpg')
+    Image.effect_noise((6000, 4000), 32).convert('RGB').save(path, quality=90)
+    size = os.path.getsize(path)
+
+    def before():
+        # Old path: whole request body in memory, then a full-size decode
+        with open(path, 'rb') as f:
+            data = f.read()
+        Image.open(BytesIO(data)).load()
+
+    def after():
+        # New path: temp file on disk, header probe, reduced-scale draft decode
+        uploaded = TemporaryUploadedFile('photo.jpg', 'image/jpeg', size, None)
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(64 * 1024), b''):
+                uploaded.write(chunk)
+        process_image(uploaded).close()
+
+    write(f"Peak RSS per {size / (1024 * 1024):.1f} MB 6000x4000 JPEG upload ({iterations} runs each)...")
+    for label, fn in (("before (in memory, full decode)", before), ("after (streamed, draft downsample)", after)):
+        peaks = [_peak_rss_kb(fn) for _ in range(iterations)]
+        write(f"  {label:<40} {max(peaks) / 1024:8.1f} MB peak")
+    os.remove(path)
+
+
+@benchmark('grading')
+def grading_benchmark(write, iterations):
+    import collections
+    import random
+
+    from .grading import AnswerKey, grade, grade_batch
+    from .models import Question
+
+    # A 20-question quiz and `iterations` x 1000 random offline submissions
+    questions = [Question(id=i, goal_id=1, correct_option=random.choice('1234')) for i in range(1, 21)]
+    key = AnswerKey(1, tuple(q.id for q in questions), tuple(f'question_{q.id}' for q in questions),
+                    tuple(q.correct_option for q in questions))
+    submissions = [
+        {f'question_{q.id}': random.choice('1234') for q in questions}
+        for _ in range(iterations * 1000)
+    ]
+
+    def before():
+        # Old submit_quiz loop (minus the per-submission Question query)
+        for answers in submissions:
+            score = 0
+            for q in questions:
+                if answers.get(f'question_{q.id}') == q.correct_option:
+                    score += 1
+            yield score
+
+    def timed(fn):
+        start = time.perf_counter()
+        collections.deque(fn(), maxlen=0)  # consume the results without keeping them
+        return len(submissions) / (time.perf_counter() - start)
+
+    write(f"Grading {len(submissions)} submissions of a 20-question quiz...")
+    rows = [
+        ("before (per-question loop, score only)", before),
+        ("after (compiled key, with feedback)", lambda: (grade(key, answers) for answers in submissions)),
+        ("after (grade_batch)", lambda: grade_batch(((1, answers) for answers in submissions), keys={1: key})),
+    ]
+    for label, fn in rows:
+        write(f"  {label:<45} {timed(fn):10.0f} submissions/s")
+
+
+@benchmark('catalog_import')
+def catalog_import_benchmark(write, iterations):
+    from django.db import connection, transaction
+
+    from .catalog_import import import_catalog
+    from .models import Goal, Material, Question, Subject
+
+    # `iterations` subjects x (10 materials + 20 goals x 3 questions), written and rolled back
+    document = {'subjects': [
+        {'name': f"Benchmark subject {s}", 'description': "Generated",
+         'materials': [{'title': f"Material {m}", 'content_type': 'video',
+                        'link': f"https://www.youtube.com/watch?v=bench{s:03d}{m:03d}"} for m in range(10)],
+         'goals': [{'description': f"Goal {g}", 'points': 10,
+                    'questions': [{'text': f"Question {q}", 'options': ["a", "b", "c", "d"], 'answer': 1}
+                                  for q in range(3)]} for g in range(20)]}
+        for s in range(iterations)
+    ]}
+
+    def before():
+        # Old populate_modular_data: one get_or_create per row
+        for item in document['subjects']:
+            subject, _ = Subject.objects.get_or_create(name=item['name'], defaults={'description': item['description']})
+            for m in item['materials']:
+                Material.objects.get_or_create(subject=subject, title=m['title'], content_type=m['content_type'],
+                                               link=m['link'])
+            for g in item['goals']:
+                goal, _ = Goal.objects.get_or_create(subject=subject, description=g['description'], points=g['points'])
+                for q in g['questions']:
+                    Question.objects.get_or_create(goal=goal, question_text=q['text'], option_1="a", option_2="b",
+                                                   option_3="c", option_4="d", correct_option='1')
+
+    def timed(*steps):
+        # (seconds, queries) per step; everything is rolled back afterwards
+        results, count = [], [0]
+
+        def counter(execute, sql, params, many, context):
+            count[0] += 1
+            return execute(sql, params, many, context)
+
+        with transaction.atomic(), connection.execute_wrapper(counter):
+            for step in steps:
+                count[0], start = 0, time.perf_counter()
+                step()
+                results.append((time.perf_counter() - start, count[0]))
+            transaction.set_rollback(True)
+        return results
+
+    rows = iterations * (1 + 10 + 20 + 60)
+    write(f"Importing {iterations} subjects ({rows} rows)...")
+    results = timed(before, before) + timed(lambda: import_catalog(document), lambda: import_catalog(document))
+    labels = ("before (get_or_create), empty db", "before (get_or_create), re-run",
+              "after (bulk import), empty db", "after (bulk import), re-run")
+    for label, (seconds, queries) in zip(labels, results):
+        write(f"  {label:<40} {seconds:8.2f} s {queries:8d} queries")
+
+
+def _free_port():
+    import socket
+
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def _wait_for_port(process, port, timeout=30):
+    import socket
+
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline and process.poll() is None:
+        try:
+            socket.create_connection(('127.0.0.1', port), timeout=1).close()
+            return True
+        except OSError:
+            time.sleep(0.2)
+    return False
+
+
+def _status(port, request, headers):
+    import http.client
+
+    method, url, body = request
+    connection = http.client.HTTPConnection('127.0.0.1', port, timeout=30)
+    try:
+        connection.request(method, url, body=body, headers=headers)
+        return connection.getresponse().status
+    finally:
+        connection.close()
+
+
+def _load(port, plan, headers, concurrency, iterations):
+    """
+    HTTP load generator: `concurrency` keep-alive connections, each sending `iterations`
+    requests from `plan` back to back. Returns (seconds, latencies, errors).
+    """
+    import http.client
+    import threading
+
+    latencies, errors, lock = [], [0], threading.Lock()
+    start_line = threading.Barrier(concurrency + 1)
+
+    def client():
+        connection = http.client.HTTPConnection('127.0.0.1', port, timeout=30)
+        mine, failed = [], 0
+        start_line.wait()
+        for n in range(iterations):
+            method, url, body = plan[n % len(plan)]
+            start = time.perf_counter()
+            try:
+                connection.request(method, url, body=body, headers=headers)
+                response = connection.getresponse()
+                response.read()
+                failed += response.status >= 400
+            except (OSError, http.client.HTTPException):
+                failed += 1
+                connection.close()
+                connection = http.client.HTTPConnection('127.0.0.1', port, timeout=30)
+            mine.append(time.perf_counter() - start)
+        connection.close()
+        with lock:
+            latencies.extend(mine)
+            errors[0] += failed
+
+    threads = [threading.Thread(target=client) for _ in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    start_line.wait()
+    start = time.perf_counter()
+    for thread in threads:
+        thread.join()
+    return time.perf_counter() - start, sorted(latencies), errors[0]
+
+
+@benchmark('loadtest')
+def loadtest_benchmark(write, iterations, concurrency=32, workers=4):
+    import importlib.util
+    import os
+    import statistics
+    import subprocess
+    import sys
+    import tempfile
+    from urllib.parse import urlencode
+
+    from django.conf import settings
+    from django.contrib.auth.models import User
+    from django.db import connection
+    from django.test import Client, override_settings
+    from django.test.utils import setup_databases, teardown_databases
+    from django.urls import reverse
+
+    from . import catalog_import
+    from .models import Goal, Profile
+
+    # The learning flow against real servers: gunicorn serving studybuddy.wsgi (sync
+    # views) vs uvicorn serving studybuddy.asgi (async views, USE_ASYNC_VIEWS=1), same
+    # number of worker processes, driven over HTTP by `concurrency` keep-alive clients
+    # sending `iterations` requests each (subject page, journal, dashboard, a quiz post).
+    #
+    # Everything runs against a throwaway test database (test_<NAME>, as manage.py test
+    # creates it), handed to the servers via DATABASE_NAME, and the servers get a
+    # process-local cache: nothing touches the live database or the shared cache.
+    missing = [name for name in ('gunicorn', 'uvicorn') if importlib.util.find_spec(name) is None]
+    if missing:
+        write(f"Needs {' and '.join(missing)}: pip install gunicorn uvicorn")
+        return
+
+    if connection.vendor == 'sqlite':
+        # The servers are other processes: a file, not the in-memory test default
+        connection.settings_dict['TEST']['NAME'] = os.path.join(tempfile.mkdtemp(), 'loadtest.sqlite3')
+    locmem = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+    with override_settings(CACHES=locmem):
+        old_config = setup_databases(verbosity=0, interactive=False)
+        try:
+            # 1. Fixtures: the bundled course catalog and one logged-in learner
+            catalog_import.import_files(sorted(catalog_import.CURRICULA_DIR.glob('*.json')))
+            goal = Goal.objects.filter(questions__isnull=False).order_by('id').first() or Goal.objects.first()
+            user = User.objects.create_user('loadtest', password=None)
+            Profile.objects.create(user=user)
+            client = Client()
+            client.force_login(user)
+            csrf = 'loadtest' * 4
+            headers = {
+                'Host': '127.0.0.1',
+                'Cookie': f"{settings.SESSION_COOKIE_NAME}={client.cookies[settings.SESSION_COOKIE_NAME].value}; "
+                          f"{settings.CSRF_COOKIE_NAME}={csrf}",
+                'X-CSRFToken': csrf,
+                'Content-Type': 'application/x-www-form-urlencoded',
+            }
+            plan = [
+                ('GET', reverse('subject', args=[goal.subject_id]), None),
+                ('GET', reverse('journal'), None),
+                ('GET', reverse('home'), None),
+                ('POST', reverse('submit_quiz', args=[goal.subject_id, goal.id]), urlencode({'question_0': '1'})),
+            ]
+
+            env = {key: value for key, value in os.environ.items() if key not in ('REDIS_URL', 'USE_ASYNC_VIEWS')}
+            env['DATABASE_NAME'] = connection.settings_dict['NAME']
+            servers = [
+                ("WSGI (gunicorn, sync views)", {},
+                 [sys.executable, '-m', 'gunicorn', 'studybuddy.wsgi:application', '--workers', str(workers),
+                  '--bind', '127.0.0.1:{port}', '--log-level', 'warning']),
+                ("ASGI (uvicorn, async views)", {'USE_ASYNC_VIEWS': '1'},
+                 [sys.executable, '-m', 'uvicorn', 'studybuddy.asgi:application', '--workers', str(workers),
+                  '--host', '127.0.0.1', '--port', '{port}', '--log-level', 'warning', '--no-access-log']),
+            ]
+            write(f"{workers} worker processes per server, {concurrency} clients x {iterations} requests...")
+            for label, extra_env, command in servers:
+                port = _free_port()
+                process = subprocess.Popen([part.format(port=port) for part in command], env={**env, **extra_env},
+                                           stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
+                try:
+                    if not _wait_for_port(process, port):
+                        write(f"  {label}: server didn't start\n{process.stderr.read() if process.poll() else ''}")
+                        continue
+                    # Only the throwaway database has this session: anything else means the
+                    # server isn't on it (settings must read DATABASE_NAME), so stop here
+                    if _status(port, plan[1], headers) != 200:
+                        write(f"  {label}: not serving the throwaway database, skipped")
+                        continue
+                    _load(port, plan, headers, concurrency, len(plan))  # warm-up (catalog snapshot, ...)
+
+                    elapsed, latencies, errors = _load(port, plan, headers, concurrency, iterations)
+                    p50 = statistics.median(latencies)
+                    p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))]
+                    write(f"  {label:<30} {len(latencies) / elapsed:8.1f} req/s   p50 {p50 * 1000:7.1f} ms   "
+                          f"p99 {p99 * 1000:7.1f} ms   {errors} error(s)")
+                finally:
+                    process.terminate()
+                    try:
+                        process.wait(timeout=10)
+                    except subprocess.TimeoutExpired:
+                        process.kill()
+        finally:
+            teardown_databases(old_config, verbosity=0)
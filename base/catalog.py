@@ -0,0 +1,113 @@
+import threading
+
+from asgiref.sync import sync_to_async
+from django.core.cache import cache
+from django.http import Http404
+
+from .fragments import CATALOG, bump_on_commit
+from .models import Goal, Material, Subject
+from .versions import aget_version, get_version
+
+# The course catalog (Subject, Material, Goal, Question, PracticalChallenge) only
+# changes through the admin or the population script, so it is loaded once into a
+# snapshot and served from memory:
+#   1. this process keeps the snapshot for the current catalog version;
+#   2. other processes share it through the cache (built once per version);
+#   3. any catalog save/delete bumps the version (base/signals.py), after commit.
+# Every lookup costs one cache read (the version) and no queries while it's warm.
+# Objects in a snapshot are shared between requests: treat them as read-only.
+SNAPSHOT_TIMEOUT = 60 * 60 * 24
+
+_local = {'version': None, 'snapshot': None}
+_lock = threading.Lock()
+
+
+class CatalogSnapshot:
+    def __init__(self):
+        self.subjects = list(Subject.objects.order_by('id'))
+        by_id = {subject.id: subject for subject in self.subjects}
+
+        self.materials_by_subject = {subject.id: [] for subject in self.subjects}
+        for material in Material.objects.order_by('id'):
+            material.subject = by_id[material.subject_id]
+            self.materials_by_subject[material.subject_id].append(material)
+
+        self.goals_by_subject = {subject.id: [] for subject in self.subjects}
+        self.goals = {}
+        self.challenges = {}
+        # Questions prefetched, PracticalChallenge joined, has_quiz/has_challenge annotated
+        for goal in Goal.objects.with_activities().order_by('id'):
+            goal.subject = by_id[goal.subject_id]
+            self.goals[goal.id] = goal
+            self.goals_by_subject[goal.subject_id].append(goal)
+            if goal.has_challenge:
+                self.challenges[goal.practicalchallenge.id] = goal.practicalchallenge
+        self.subjects_by_id = by_id
+
+
+def snapshot():
+    version = get_version(CATALOG)
+    if _local['version'] == version:
+        return _local['snapshot']
+
+    with _lock:
+        if _local['version'] != version:
+            key = f"catalog:snapshot:{version}"
+            current = cache.get(key)
+            if current is None:
+                current = CatalogSnapshot()
+                cache.set(key, current, SNAPSHOT_TIMEOUT)
+            _local['snapshot'], _local['version'] = current, version
+        return _local['snapshot']
+
+
+async def asnapshot():
+    # Async views: a warm snapshot costs one async cache read; a rebuild runs in a thread
+    if _local['version'] == await aget_version(CATALOG):
+        return _local['snapshot']
+    return await sync_to_async(snapshot)()
+
+
+def invalidate():
+    bump_on_commit(CATALOG)
+
+
+# --- Lookups used by the views ---
+def subjects():
+    return snapshot().subjects
+
+
+def _get_or_404(mapping, pk):
+    try:
+        return mapping[int(pk)]
+    except (KeyError, TypeError, ValueError):
+        raise Http404("Not found in the course catalog")
+
+
+def get_subject_or_404(pk):
+    return _get_or_404(snapshot().subjects_by_id, pk)
+
+
+def get_goal_or_404(pk):
+    return _get_or_404(snapshot().goals, pk)
+
+
+def get_challenge_or_404(pk):
+    return _get_or_404(snapshot().challenges, pk)
+
+
+def materials(subject_id):
+    return snapshot().materials_by_subject.get(subject_id, [])
+
+
+def goals(subject_id):
+    return snapshot().goals_by_subject.get(subject_id, [])
+
+
+# --- Async versions (base/async_views.py) ---
+async def aget_subject_or_404(pk):
+    return _get_or_404((await asnapshot()).subjects_by_id, pk)
+
+
+async def aget_goal_or_404(pk):
+    return _get_or_404((await asnapshot()).goals, pk)
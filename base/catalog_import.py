@@ -0,0 +1,278 @@
+import json
+import logging
+from collections import Counter
+from pathlib import Path
+
+from django.db import transaction
+
+from . import catalog, embeds, progress
+from .models import Goal, Material, PracticalChallenge, Question, Subject
+
+logger = logging.getLogger(__name__)
+
+# Declarative catalog import. A course file (JSON, or YAML when PyYAML is installed)
+# describes subjects with their materials, goals, quiz questions and code labs:
+#
+#   {"subjects": [{"name": "...", "description": "...",
+#                  "materials": [{"title": "...", "content_type": "video", "link": "https://..."}],
+#                  "goals": [{"description": "...", "points": 10,
+#                             "questions": [{"text": "...", "options": ["a", "b", "c", "d"], "answer": 2}],
+#                             "challenge": {"instruction": "...", "validation_text": "...", "rules": [...]}}]}]}
+#
+# Rows are matched on natural keys (subject name; title / description / question text
+# within their parent; one challenge per goal), diffed against the database, and written
+# with bulk_create / bulk_update in one transaction: a few queries per model no matter
+# how large the file is. Bulk writes skip the model signals, so the catalog version and
+# the SubjectProgress totals are refreshed here instead. With prune=True, rows of the
+# imported subjects that the file no longer lists are deleted (with their progress!).
+CURRICULA_DIR = Path(__file__).resolve().parent / 'curricula'
+BATCH_SIZE = 500
+
+CONTENT_TYPES = {value for value, _label in Material._meta.get_field('content_type').choices}
+
+
+class CatalogError(ValueError):
+    pass
+
+
+class ImportReport:
+    """What an import changed: counts per (model name, 'created' / 'updated' / 'unchanged' / 'deleted')."""
+
+    def __init__(self):
+        self.counts = Counter()
+
+    def add(self, model, action, n=1):
+        if n:
+            self.counts[model.__name__, action] += n
+
+    @property
+    def changed(self):
+        return any(n for (_model, action), n in self.counts.items() if action != 'unchanged')
+
+    def lines(self):
+        for model in (Subject, Material, Goal, Question, PracticalChallenge):
+            parts = [f"{self.counts[model.__name__, action]} {action}"
+                     for action in ('created', 'updated', 'deleted', 'unchanged')
+                     if self.counts[model.__name__, action]]
+            if parts:
+                yield f"{model.__name__}: " + ", ".join(parts)
+
+
+def load(path):
+    """Reads one course file into the plain dict import_catalog() takes."""
+    path = Path(path)
+    with open(path, encoding='utf-8') as f:
+        if path.suffix in ('.yaml', '.yml'):
+            try:
+                import yaml
+            except ImportError:
+                raise CatalogError("Reading YAML course files needs PyYAML (pip install pyyaml)")
+            data = yaml.safe_load(f)
+        else:
+            try:
+                data = json.load(f)
+            except json.JSONDecodeError as e:
+                raise CatalogError(f"{path}: invalid JSON ({e})")
+    if not isinstance(data, dict) or not isinstance(data.get('subjects'), list):
+        raise CatalogError(f"{path}: expected an object with a 'subjects' list")
+    return data
+
+
+def merge(documents):
+    """Several course files -> one document (a subject may only be defined once)."""
+    return {'subjects': [subject for document in documents for subject in document['subjects']]}
+
+
+# --- Validation: file -> desired rows, keyed by natural key ---
+
+def _require(item, field, where):
+    value = item.get(field) if isinstance(item, dict) else None
+    if value in (None, ''):
+        raise CatalogError(f"{where}: '{field}' is required")
+    return value
+
+
+def _unique(keys, key, where):
+    if key in keys:
+        raise CatalogError(f"{where}: defined twice")
+    keys.add(key)
+
+
+def _question_fields(item, where):
+    text = _require(item, 'text', where)
+    options = _require(item, 'options', where)
+    answer = str(_require(item, 'answer', where))
+    if not isinstance(options, list) or len(options) != 4:
+        raise CatalogError(f"{where}: 'options' must list exactly 4 choices")
+    if answer not in ('1', '2', '3', '4'):
+        raise CatalogError(f"{where}: 'answer' must be 1-4")
+    fields = {'question_text': text, 'correct_option': answer}
+    fields.update({f'option_{n}': str(option) for n, option in enumerate(options, 1)})
+    return fields
+
+
+def _points(item, where):
+    # Accepts 10 or "10"; rejects floats, booleans, negatives and junk instead of letting int() raise
+    points = item.get('points', 10)
+    if isinstance(points, bool) or not isinstance(points, (int, str)) or not str(points).strip().isdigit():
+        raise CatalogError(f"{where}: 'points' must be a whole number of 0 or more")
+    return int(points)
+
+
+def _challenge_fields(item, where):
+    from .validator import compile_rules
+
+    fields = {
+        'instruction': _require(item, 'instruction', where),
+        'starter_code': item.get('starter_code', PracticalChallenge._meta.get_field('starter_code').default),
+        'hint': item.get('hint', ''),
+        'validation_text': item.get('validation_text', ''),
+        'rules': item.get('rules', []),
+    }
+    if not fields['validation_text'] and not fields['rules']:
+        raise CatalogError(f"{where}: needs 'validation_text' or 'rules'")
+    try:
+        compile_rules(fields['rules'])
+    except ValueError as e:
+        raise CatalogError(f"{where}: {e}")
+    return fields
+
+
+def parse(document):
+    """
+    Validates a document and flattens it into natural key -> field dicts:
+    subjects[name], materials[name, title], goals[name, description],
+    questions[name, description, text], challenges[name, description].
+    """
+    subjects, materials, goals, questions, challenges = {}, {}, {}, {}, {}
+    seen = set()
+    for subject in document['subjects']:
+        name = _require(subject, 'name', "subject")
+        _unique(seen, ('subject', name), f"subject '{name}'")
+        subjects[name] = {'description': subject.get('description', '')}
+
+        for item in subject.get('materials', []):
+            title = _require(item, 'title', f"material in '{name}'")
+            where = f"material '{title}' in '{name}'"
+            _unique(seen, ('material', name, title), where)
+            content_type = _require(item, 'content_type', where)
+            if content_type not in CONTENT_TYPES:
+                raise CatalogError(f"{where}: content_type must be one of {sorted(CONTENT_TYPES)}")
+            link = _require(item, 'link', where)
+            materials[name, title] = {'link': link, 'content_type': content_type,
+                                      'embed_url': embeds.resolve(link, content_type)}
+
+        for item in subject.get('goals', []):
+            description = _require(item, 'description', f"goal in '{name}'")
+            where = f"goal '{description}' in '{name}'"
+            _unique(seen, ('goal', name, description), where)
+            goals[name, description] = {'points': _points(item, where)}
+            for question in item.get('questions', []):
+                fields = _question_fields(question, f"question in {where}")
+                _unique(seen, ('question', name, description, fields['question_text']),
+                        f"question '{fields['question_text']}' in {where}")
+                questions[name, description, fields['question_text']] = fields
+            if item.get('challenge'):
+                challenges[name, description] = _challenge_fields(item['challenge'], f"challenge for {where}")
+    return subjects, materials, goals, questions, challenges
+
+
+# --- Diff and write ---
+
+def _sync(model, report, existing, desired, build, prune):
+    """
+    existing: natural key -> instance (lowest id wins if the table has duplicates)
+    desired:  natural key -> field values
+    build:    natural key -> new instance (parents already saved)
+    Creates / updates / optionally deletes, and returns natural key -> saved instance.
+    """
+    rows, to_create, to_update, fields = {}, [], [], set()
+    for key, values in desired.items():
+        obj = existing.get(key)
+        if obj is None:
+            obj = build(key)
+            for field, value in values.items():
+                setattr(obj, field, value)
+            to_create.append(obj)
+        else:
+            changed = [field for field, value in values.items() if getattr(obj, field) != value]
+            for field in changed:
+                setattr(obj, field, values[field])
+            if changed:
+                fields.update(changed)
+                to_update.append(obj)
+            else:
+                report.add(model, 'unchanged')
+        rows[key] = obj
+
+    # Postgres (and SQLite 3.35+) set the new primary keys on the instances
+    model.objects.bulk_create(to_create, batch_size=BATCH_SIZE)
+    if to_update:
+        model.objects.bulk_update(to_update, sorted(fields), batch_size=BATCH_SIZE)
+    report.add(model, 'created', len(to_create))
+    report.add(model, 'updated', len(to_update))
+
+    stale = [obj.pk for key, obj in existing.items() if key not in desired]
+    if prune and stale:
+        model.objects.filter(pk__in=stale).delete()
+        report.add(model, 'deleted', len(stale))
+    return rows
+
+
+def _index(rows, key):
+    index = {}
+    for row in rows:
+        index.setdefault(key(row), row)
+    return index
+
+
+@transaction.atomic
+def import_catalog(document, prune=False, dry_run=False):
+    """Brings the database in line with `document`. Returns an ImportReport."""
+    subjects, materials, goals, questions, challenges = parse(document)
+    report = ImportReport()
+
+    # 1. Subjects (matched by name)
+    existing = _index(Subject.objects.filter(name__in=subjects).order_by('id'), lambda s: s.name)
+    subject_rows = _sync(Subject, report, existing, subjects, lambda name: Subject(name=name), prune=False)
+    names = {subject.id: name for name, subject in subject_rows.items()}
+    subject_ids = list(names)
+
+    # 2. Materials and goals of those subjects
+    existing = _index(Material.objects.filter(subject_id__in=subject_ids).order_by('id'),
+                      lambda m: (names[m.subject_id], m.title))
+    _sync(Material, report, existing, materials,
+          lambda key: Material(subject=subject_rows[key[0]], title=key[1]), prune)
+
+    existing = _index(Goal.objects.filter(subject_id__in=subject_ids).order_by('id'),
+                      lambda g: (names[g.subject_id], g.description))
+    goal_rows = _sync(Goal, report, existing, goals,
+                      lambda key: Goal(subject=subject_rows[key[0]], description=key[1]), prune)
+    goal_keys = {goal.id: key for key, goal in goal_rows.items()}
+
+    # 3. Questions and code labs of the imported goals
+    existing = _index(Question.objects.filter(goal_id__in=goal_keys).order_by('id'),
+                      lambda q: (*goal_keys[q.goal_id], q.question_text))
+    _sync(Question, report, existing, questions,
+          lambda key: Question(goal=goal_rows[key[:2]], question_text=key[2]), prune)
+
+    existing = _index(PracticalChallenge.objects.filter(goal_id__in=goal_keys), lambda c: goal_keys[c.goal_id])
+    _sync(PracticalChallenge, report, existing, challenges,
+          lambda key: PracticalChallenge(goal=goal_rows[key]), prune)
+
+    if dry_run:
+        transaction.set_rollback(True)
+        return report
+
+    # 4. What the skipped signals would have done
+    if report.counts['Goal', 'created'] or report.counts['Goal', 'deleted']:
+        progress.recount(subject_ids)
+    if report.changed:
+        catalog.invalidate()
+    for line in report.lines():
+        logger.info(line)
+    return report
+
+
+def import_files(paths, prune=False, dry_run=False):
+    return import_catalog(merge(load(path) for path in paths), prune=prune, dry_run=dry_run)
@@ -0,0 +1,162 @@
+import logging
+import threading
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import IntegrityError, transaction
+from django.db.models import Count, Exists, F, OuterRef, Subquery
+from django.utils import timezone
+
+from .background import submit, submit_on_commit
+from .models import Certificate, CertificateRenderJob, Goal, UserProgress
+from .utils import generate_certificate_image
+
+logger = logging.getLogger(__name__)
+
+MAX_ATTEMPTS = 3
+
+
+def issue_certificate(user, subject):
+    """
+    Records the Certificate (without an image) plus a render job, and hands the
+    job to the background pool once the transaction commits.
+    The request only pays for two INSERTs.
+    """
+    try:
+        with transaction.atomic():
+            cert = Certificate.objects.create(user=user, subject=subject)
+            job = CertificateRenderJob.objects.create(certificate=cert)
+    except IntegrityError:
+        # A concurrent completion issued it first (unique per user and subject)
+        return Certificate.objects.get(user=user, subject=subject)
+    submit_on_commit(render_job, job.id)
+    return cert
+
+
+def render_certificate_bytes(username, subject_name, date_str):
+    # Pure PIL work, no database access: safe to run in a separate process
+    return generate_certificate_image(
+        username,
+        subject_name,
+        date_str,
+        image_format=getattr(settings, 'CERTIFICATE_IMAGE_FORMAT', 'PNG'),
+        optimize=getattr(settings, 'CERTIFICATE_IMAGE_OPTIMIZE', False),
+    ).read()
+
+
+def claim(job_id):
+    """
+    Atomic status flip, so a job is never rendered by two workers at once.
+    Returns the job (with certificate, user and subject loaded) or None if someone else has it.
+    """
+    claimed = CertificateRenderJob.objects.filter(id=job_id, status='pending').update(
+        status='running', attempts=F('attempts') + 1, updated_at=timezone.now()
+    )
+    if not claimed:
+        return None
+    return CertificateRenderJob.objects.select_related(
+        'certificate__user', 'certificate__subject'
+    ).get(id=job_id)
+
+
+def render_args(job):
+    cert = job.certificate
+    return cert.user.username, cert.subject.name, cert.issued_date.strftime("%Y-%m-%d")
+
+
+def store(job, data):
+    cert = job.certificate
+    extension = getattr(settings, 'CERTIFICATE_IMAGE_FORMAT', 'PNG').lower()
+    cert.image.save(f"cert_{cert.user_id}_{cert.subject_id}.{extension}", ContentFile(data))
+    CertificateRenderJob.objects.filter(id=job.id).update(status='done', error='', updated_at=timezone.now())
+
+
+def fail(job, exc):
+    # Back to 'pending' and tried again after a backoff, until MAX_ATTEMPTS is reached
+    logger.error("Certificate render failed for %s: %s", job.certificate_id, exc)
+    status = 'failed' if job.attempts >= MAX_ATTEMPTS else 'pending'
+    CertificateRenderJob.objects.filter(id=job.id).update(
+        status=status, error=str(exc), updated_at=timezone.now()
+    )
+    if status == 'pending':
+        retry_later(job.id, job.attempts)
+
+
+def retry_later(job_id, attempts):
+    # 5 s, 10 s, 20 s... The job stays 'pending' in the table meanwhile, so a restart
+    # (which loses the timer) is covered by render_certificates.
+    delay = getattr(settings, 'CERTIFICATE_RETRY_SECONDS', 5) * 2 ** (attempts - 1)
+    timer = threading.Timer(delay, submit, (render_job, job_id))
+    timer.daemon = True
+    timer.start()
+    return timer
+
+
+def render_job(job_id):
+    """
+    Draws and stores the image for one job. Returns True if this call rendered it.
+    """
+    job = claim(job_id)
+    if job is None:
+        return False
+    try:
+        store(job, render_certificate_bytes(*render_args(job)))
+    except Exception as exc:
+        fail(job, exc)
+        return False
+    return True
+
+
+def pending_job_ids(limit=None):
+    ids = CertificateRenderJob.objects.filter(status='pending').order_by('created_at').values_list('id', flat=True)
+    return list(ids[:limit] if limit else ids)
+
+
+def requeue_stale(older_than):
+    """
+    Puts 'running' jobs that have not been touched since `older_than` back to
+    'pending' (e.g. the process rendering them was restarted).
+    """
+    return CertificateRenderJob.objects.filter(status='running', updated_at__lt=older_than).update(
+        status='pending', updated_at=timezone.now()
+    )
+
+
+def find_missing_certificates():
+    """
+    Every (user_id, subject_id) pair where the user has completed all of the
+    subject's goals but has no Certificate yet, in one aggregated query.
+    """
+    goal_totals = (
+        Goal.objects.filter(subject=OuterRef('subject'))
+        .order_by()
+        .values('subject')
+        .annotate(total=Count('id'))
+        .values('total')
+    )
+    has_certificate = Certificate.objects.filter(user=OuterRef('user'), subject=OuterRef('subject'))
+    return list(
+        UserProgress.objects.filter(is_completed=True)
+        .exclude(Exists(has_certificate))
+        .order_by()
+        .values('user_id', 'subject_id')
+        .annotate(completed=Count('id'), total=Subquery(goal_totals))
+        .filter(completed=F('total'))
+        .values_list('user_id', 'subject_id')
+    )
+
+
+def create_pending_certificates(pairs):
+    """
+    Bulk-inserts a Certificate and a pending render job for each (user_id, subject_id) pair.
+    Committed before any rendering starts, so an interrupted run can be resumed.
+    Pairs issued meanwhile (e.g. by a learner finishing the course in a view) are skipped.
+    Returns the number of certificates created.
+    """
+    with transaction.atomic():
+        certs = [Certificate(user_id=user_id, subject_id=subject_id) for user_id, subject_id in pairs]
+        Certificate.objects.bulk_create(certs, ignore_conflicts=True)
+        # Ids are generated here (UUIDs), so the skipped rows are simply the ones not in the table
+        created = list(Certificate.objects.filter(id__in=[cert.id for cert in certs]).values_list('id', flat=True))
+        CertificateRenderJob.objects.bulk_create([CertificateRenderJob(certificate_id=cert_id) for cert_id in created])
+    return len(created)
@@ -0,0 +1,43 @@
+from typing import NamedTuple, Optional
+
+from django.db import IntegrityError, transaction
+
+from .certificates import issue_certificate
+from .models import Certificate, UserProgress
+from .progress import subject_progress
+from .xp import award_xp
+
+
+class Completion(NamedTuple):
+    created: bool                     # False if the goal was already completed
+    certificate: Optional[Certificate]  # set when this completion finished the course
+
+
+def check_course_completion(user, subject):
+    # Single-row read of the denormalized counters (see base/progress.py)
+    progress = subject_progress(user, subject)
+
+    if progress and progress.is_complete:
+        # Check if certificate already exists
+        if not Certificate.objects.filter(user=user, subject=subject).exists():
+            # ISSUE CERTIFICATE (the image is drawn in the background, see base/certificates.py)
+            return issue_certificate(user, subject)
+    return None
+
+
+def complete_goal(user, goal, reason):
+    """
+    Idempotent "complete goal" used by every learning flow (mark done, quiz, code lab).
+    Inserts the UserProgress row and relies on the unique (user, goal) constraint to
+    detect repeats, so a resubmission costs a single INSERT and never awards XP twice.
+    XP and the certificate check only happen when the row was actually created.
+    """
+    with transaction.atomic():
+        try:
+            with transaction.atomic():
+                UserProgress.objects.create(user=user, goal=goal, is_completed=True)
+        except IntegrityError:
+            return Completion(created=False, certificate=None)
+
+        award_xp(user, goal.points, reason, goal=goal)
+        return Completion(created=True, certificate=check_course_completion(user, goal.subject))
@@ -0,0 +1,94 @@
+import re
+from urllib.parse import parse_qs, quote, urlparse
+
+from django.conf import settings
+
+# Material links -> URLs that can go in the content modal's <iframe>.
+# Resolved once when a Material is saved (Material.embed_url), never while rendering.
+# Add a provider with:
+#
+#   @resolver
+#   def my_provider(link, content_type):
+#       return "https://..." or None  # None = not mine, try the next one
+#
+# Resolvers run in registration order; the first non-None result wins.
+RESOLVERS = []
+
+YOUTUBE_ID = re.compile(r'^[0-9A-Za-z_-]{11}$')
+YOUTUBE_PATH = re.compile(r'^/(?:embed|shorts|live|v)/([0-9A-Za-z_-]{11})')
+VIMEO_PATH = re.compile(r'^/(?:video/)?(\d+)')
+
+
+def resolver(fn):
+    RESOLVERS.append(fn)
+    return fn
+
+
+def resolve(link, content_type=None):
+    for fn in RESOLVERS:
+        url = fn(link, content_type)
+        if url:
+            return url
+    return link
+
+
+def embed_origin():
+    # e.g. 'https://studybuddy.example'; YouTube needs it to allow the embed
+    return getattr(settings, 'EMBED_ORIGIN', '')
+
+
+@resolver
+def youtube(link, content_type):
+    parts = urlparse(link)
+    host = parts.netloc.lower().removeprefix('www.').removeprefix('m.')
+    if host not in ('youtube.com', 'youtu.be', 'youtube-nocookie.com'):
+        return None
+
+    query = parse_qs(parts.query)
+    video_id = None
+    if host == 'youtu.be':
+        video_id = parts.path.strip('/')[:11]
+    elif 'v' in query:
+        video_id = query['v'][0]
+    else:
+        match = YOUTUBE_PATH.match(parts.path)
+        video_id = match.group(1) if match else None
+
+    params = 'rel=0&modestbranding=1'
+    if embed_origin():
+        params += f'&origin={quote(embed_origin(), safe=":/")}'
+    if video_id and YOUTUBE_ID.match(video_id):
+        return f"https://www.youtube.com/embed/{video_id}?{params}"
+    if 'list' in query:
+        return f"https://www.youtube.com/embed/videoseries?list={quote(query['list'][0])}&{params}"
+    return None
+
+
+@resolver
+def vimeo(link, content_type):
+    parts = urlparse(link)
+    if parts.netloc.lower().removeprefix('www.') not in ('vimeo.com', 'player.vimeo.com'):
+        return None
+    match = VIMEO_PATH.match(parts.path)
+    return f"https://player.vimeo.com/video/{match.group(1)}" if match else None
+
+
+@resolver
+def google_drive(link, content_type):
+    # Drive / Docs files: the /preview page can be framed, /view can't
+    if 'drive.google.com' in link or 'docs.google.com' in link:
+        if '/view' in link:
+            return link.replace('/view', '/preview', 1)
+    return None
+
+
+PDF_VIEWER = "https://docs.google.com/viewer?url="
+
+
+@resolver
+def pdf_viewer(link, content_type):
+    # Opt-in (EMBED_PDF_VIEWER): other PDFs go through Google's viewer. Most hosts refuse
+    # to be framed, but it hands every material URL to a third party
+    if content_type == 'pdf' and getattr(settings, 'EMBED_PDF_VIEWER', False):
+        return f"{PDF_VIEWER}{quote(link, safe='')}&embedded=true"
+    return None
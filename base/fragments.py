@@ -0,0 +1,70 @@
+from django.core.cache import cache
+from django.db import transaction
+
+from .versions import bump_version, get_version
+
+# Cached template fragments, used with {% load fragment_tags %}{% cachefragment 'name' %}.
+# Each fragment is keyed on the versions of the data it shows, so a save bumps a
+# version (base/signals.py) and the next render rebuilds it. A warm hit is a few
+# cache reads and no database queries.
+CATALOG = 'catalog'
+LEADERBOARD = 'leaderboard'
+FRAGMENT_TIMEOUT = 60 * 60 * 24
+
+
+def user_version_name(user_id):
+    # Per-user XP, rank and profile picture
+    return f"user:{user_id}"
+
+
+def _user_id(request):
+    return request.user.id
+
+
+# name -> the parts of its cache key (besides the name) for this request
+FRAGMENTS = {
+    'home_subjects': lambda request: [get_version(CATALOG)],
+    'home_leaderboard': lambda request: [get_version(LEADERBOARD)],
+    # Rank depends on everybody's score, so the leaderboard version is part of the key
+    'home_status': lambda request: [
+        _user_id(request), get_version(user_version_name(_user_id(request))), get_version(LEADERBOARD),
+    ],
+    'navbar_user': lambda request: [_user_id(request), get_version(user_version_name(_user_id(request)))],
+}
+
+
+def fragment_key(name, request):
+    parts = ':'.join(str(part) for part in FRAGMENTS[name](request))
+    return f"fragment:{name}:{parts}"
+
+
+def bump_on_commit(*names):
+    # Bump after the transaction commits, so a concurrent request can't cache
+    # the old data under the new version
+    transaction.on_commit(lambda: [bump_version(name) for name in names])
+
+
+# --- Hit/miss counters (shared cache, so they cover every worker process) ---
+def _stat_key(name, outcome):
+    return f"fragment_stats:{name}:{outcome}"
+
+
+def record(name, hit):
+    key = _stat_key(name, 'hits' if hit else 'misses')
+    try:
+        cache.incr(key)
+    except ValueError:
+        if not cache.add(key, 1, timeout=None):
+            cache.incr(key)
+
+
+def stats():
+    keys = [_stat_key(name, outcome) for name in FRAGMENTS for outcome in ('hits', 'misses')]
+    values = cache.get_many(keys)
+    result = {}
+    for name in FRAGMENTS:
+        hits = values.get(_stat_key(name, 'hits'), 0)
+        misses = values.get(_stat_key(name, 'misses'), 0)
+        total = hits + misses
+        result[name] = {'hits': hits, 'misses': misses, 'hit_rate': round(hits / total, 3) if total else None}
+    return result
@@ -0,0 +1,132 @@
+import threading
+from operator import eq
+from typing import NamedTuple, Optional
+
+from . import catalog
+from .fragments import CATALOG
+from .versions import aget_version, get_version
+
+# Quiz grading. A goal's questions are compiled once into an AnswerKey (form field
+# names + correct options, in question order); grading a submission is then a single
+# pass over two tuples. Keys are cached per catalog version, which every Question
+# save/delete bumps (base/signals.py), so edits in the admin apply immediately.
+
+
+class AnswerKey(NamedTuple):
+    goal_id: int
+    question_ids: tuple
+    fields: tuple   # 'question_<id>', the radio group names in subject.html
+    answers: tuple  # correct option per question: '1'..'4'
+
+
+class QuestionFeedback(NamedTuple):
+    question_id: int
+    given: Optional[str]
+    correct_option: str
+    is_correct: bool
+
+
+class GradeResult(NamedTuple):
+    key: AnswerKey
+    given: tuple    # submitted option per question (None if unanswered)
+    correct: tuple  # bool per question
+    score: int
+
+    @property
+    def total(self):
+        return len(self.key.answers)
+
+    @property
+    def passed(self):
+        # Must get 100% to pass (and a goal without questions is not a quiz)
+        return self.total > 0 and self.score == self.total
+
+    @property
+    def feedback(self):
+        # Per-question detail, built only when someone asks for it
+        return [
+            QuestionFeedback(question_id, given, answer, ok)
+            for question_id, given, answer, ok in zip(self.key.question_ids, self.given, self.key.answers, self.correct)
+        ]
+
+    @property
+    def wrong_numbers(self):
+        # 1-based positions of the questions answered wrong, as shown in the quiz
+        return [n for n, ok in enumerate(self.correct, 1) if not ok]
+
+
+# Anything else a client posts (a crafted or stale form) counts as unanswered; it must
+# never reach QuizAnswer.given (one character) and fail a whole batch of attempts
+OPTIONS = frozenset({'1', '2', '3', '4'})
+
+_keys = {'version': None, 'by_goal': {}}
+_lock = threading.Lock()
+
+
+def compile_key(goal):
+    questions = list(goal.questions.all())  # same order the quiz modal lists them in
+    return AnswerKey(
+        goal_id=goal.id,
+        question_ids=tuple(q.id for q in questions),
+        fields=tuple(f'question_{q.id}' for q in questions),
+        answers=tuple(q.correct_option for q in questions),
+    )
+
+
+def answer_key(goal_id):
+    version = get_version(CATALOG)
+    with _lock:
+        if _keys['version'] != version:
+            _keys['version'], _keys['by_goal'] = version, {}
+        key = _keys['by_goal'].get(goal_id)
+    if key is None:
+        # Questions come prefetched with the catalog snapshot: no query
+        key = compile_key(catalog.get_goal_or_404(goal_id))
+        with _lock:
+            if _keys['version'] == version:
+                _keys['by_goal'][goal_id] = key
+    return key
+
+
+async def aanswer_key(goal_id):
+    # answer_key() for async views (compiling needs no queries: questions are prefetched)
+    version = await aget_version(CATALOG)
+    with _lock:
+        if _keys['version'] != version:
+            _keys['version'], _keys['by_goal'] = version, {}
+        key = _keys['by_goal'].get(goal_id)
+    if key is None:
+        key = compile_key(await catalog.aget_goal_or_404(goal_id))
+        with _lock:
+            if _keys['version'] == version:
+                _keys['by_goal'][goal_id] = key
+    return key
+
+
+def _option(choice):
+    return choice if isinstance(choice, str) and choice in OPTIONS else None
+
+
+def grade(key, answers):
+    """
+    Grades one submission. `answers` maps field name -> chosen option
+    (request.POST works as-is). Missing or invalid answers count as wrong.
+    """
+    given = tuple(map(_option, map(answers.get, key.fields)))
+    correct = tuple(map(eq, given, key.answers))
+    return GradeResult(key, given, correct, sum(correct))
+
+
+def grade_batch(submissions, keys=None):
+    """
+    Bulk grading for offline submissions (e.g. an exam import): an iterable of
+    (goal_id, answers) pairs. Each answer key is looked up once per batch; pass
+    `keys` ({goal_id: AnswerKey}) to supply them up front.
+    Yields a GradeResult per submission, in order.
+    """
+    keys = dict(keys or {})
+    for goal_id, answers in submissions:
+        key = keys.get(goal_id)
+        if key is None:
+            key = keys[goal_id] = answer_key(goal_id)
+        yield grade(key, answers)
@@ -0,0 +1,176 @@
+import hashlib
+import json
+import logging
+from io import BytesIO
+
+from PIL import Image, ImageOps
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+
+from .background import submit
+from .fragments import user_version_name
+from .models import Profile
+from .storage import digest_from_name
+from .versions import bump_version
+
+logger = logging.getLogger(__name__)
+
+# HEIC uploads (iPhone photos) can only be decoded with the optional pillow-heif plugin
+try:
+    from pillow_heif import register_heif_opener
+    register_heif_opener()
+except ImportError:
+    pass
+
+# Downscaled copies served instead of the original upload
+DERIVATIVE_WIDTHS = (160, 320, 640, 1280)
+DERIVATIVE_FORMATS = {
+    'webp': {'format': 'WEBP', 'quality': 80, 'method': 4},
+    'jpeg': {'format': 'JPEG', 'quality': 82, 'optimize': True, 'progressive': True},
+}
+DERIVATIVE_ROOT = 'derivatives'
+CACHE_TIMEOUT = 60 * 60 * 24
+QUEUE_TIMEOUT = 60 * 10  # a queued job that died is retried on a render after this
+
+
+def content_hash(name):
+    # name -> sha256 of the file, computed once (upload names are never reused by storage)
+    digest = digest_from_name(name)
+    if digest:
+        return digest  # content-addressed blob: the name is the hash
+    key = f"image_hash:{name}"
+    digest = cache.get(key)
+    if digest is None:
+        sha = hashlib.sha256()
+        with default_storage.open(name, 'rb') as f:
+            for chunk in iter(lambda: f.read(64 * 1024), b''):
+                sha.update(chunk)
+        digest = sha.hexdigest()
+        cache.set(key, digest, CACHE_TIMEOUT)
+    return digest
+
+
+def _manifest_name(digest):
+    return f"{DERIVATIVE_ROOT}/{digest[:2]}/{digest}.json"
+
+
+def _derivative_name(digest, width, ext):
+    return f"{DERIVATIVE_ROOT}/{digest[:2]}/{digest}_{width}.{ext}"
+
+
+def generate_derivatives(name):
+    """
+    Writes every size/format for one original and a small JSON manifest listing them.
+    EXIF orientation is applied and all metadata (GPS etc.) is dropped.
+    Derivatives are keyed by content hash, so re-uploads of the same photo reuse them.
+    Returns the manifest: {'webp': {width: name}, 'jpeg': {width: name}}.
+    """
+    digest = content_hash(name)
+    manifest_name = _manifest_name(digest)
+    if default_storage.exists(manifest_name):
+        return _read_manifest(digest)
+
+    with default_storage.open(name, 'rb') as f:
+        original = Image.open(f)
+        original = ImageOps.exif_transpose(original)
+        original = original.convert('RGB')
+    original.info = {}
+
+    # Never upscale: sizes wider than the original collapse to the original width
+    widths = sorted({min(width, original.width) for width in DERIVATIVE_WIDTHS})
+    manifest = {ext: {} for ext in DERIVATIVE_FORMATS}
+    for width in widths:
+        resized = original.copy()
+        resized.thumbnail((width, original.height), Image.LANCZOS)
+        for ext, options in DERIVATIVE_FORMATS.items():
+            buffer = BytesIO()
+            resized.save(buffer, **options)
+            derivative = _derivative_name(digest, width, ext)
+            if not default_storage.exists(derivative):
+                default_storage.save(derivative, ContentFile(buffer.getvalue()))
+            manifest[ext][width] = derivative
+
+    default_storage.save(manifest_name, ContentFile(json.dumps(manifest).encode()))
+    cache.set(f"derivatives:{digest}", manifest, CACHE_TIMEOUT)
+    return manifest
+
+
+def _read_manifest(digest):
+    manifest = cache.get(f"derivatives:{digest}")
+    if manifest is None:
+        with default_storage.open(_manifest_name(digest), 'rb') as f:
+            raw = json.load(f)
+        # JSON keys are strings; widths are ints everywhere else
+        manifest = {ext: {int(w): n for w, n in sizes.items()} for ext, sizes in raw.items()}
+        cache.set(f"derivatives:{digest}", manifest, CACHE_TIMEOUT)
+    return manifest
+
+
+def delete_derivatives(digest):
+    # Drops every size/format of one original (used when its blob is garbage-collected)
+    folder = f"{DERIVATIVE_ROOT}/{digest[:2]}"
+    if not default_storage.exists(folder):
+        return 0
+    _dirs, files = default_storage.listdir(folder)
+    names = [f"{folder}/{f}" for f in files if f.startswith(digest)]
+    for name in names:
+        default_storage.delete(name)
+    cache.delete(f"derivatives:{digest}")
+    return len(names)
+
+
+def derivatives_for(field_file):
+    """
+    Manifest for an ImageField value, or None if there is no image, it can't be read, or
+    its derivatives don't exist yet. Those are normally made in the background right after
+    upload; if not (older uploads, or the job hasn't finished) generation is queued here,
+    never run in the request: decoding a few large photos would stall the page.
+    """
+    if not field_file:
+        return None
+    name = field_file.name
+    try:
+        # Hashing an old upload reads the whole file: leave that to the background job too
+        digest = digest_from_name(name) or cache.get(f"image_hash:{name}")
+        if digest and (cache.get(f"derivatives:{digest}") or default_storage.exists(_manifest_name(digest))):
+            return _read_manifest(digest)
+    except (OSError, ValueError):
+        logger.warning("Could not read derivatives for %s", name, exc_info=True)
+        return None
+    queue_derivatives(name)
+    return None
+
+
+def queue_derivatives(name):
+    # At most one background job per upload at a time (the upload signal and the first
+    # render of a page would otherwise both start one)
+    if cache.add(f"derivatives_queued:{name}", True, QUEUE_TIMEOUT):
+        submit(build_derivatives, name)
+
+
+def build_derivatives(name):
+    # generate_derivatives() plus the cached fragments that showed the upload itself
+    # meanwhile (the navbar avatar): bumping the owners' version re-renders them
+    manifest = generate_derivatives(name)
+    for user_id in Profile.objects.filter(profile_pic=name).values_list('user_id', flat=True):
+        bump_version(user_version_name(user_id))
+    return manifest
+
+
+def derivative_url(field_file, width, ext='webp'):
+    # Smallest derivative at least `width` wide (or the largest there is); the original
+    # (already downsampled on upload) until the derivatives are ready
+    manifest = derivatives_for(field_file)
+    if not manifest:
+        return field_file.url if field_file else ''
+    sizes = manifest[ext]
+    chosen = next((w for w in sorted(sizes) if w >= width), max(sizes))
+    return default_storage.url(sizes[chosen])
+
+
+def srcset(field_file, ext='webp'):
+    manifest = derivatives_for(field_file)
+    if not manifest:
+        return ''
+    return ', '.join(f"{default_storage.url(n)} {w}w" for w, n in sorted(manifest[ext].items()))
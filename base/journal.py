@@ -0,0 +1,82 @@
+import base64
+from datetime import date, time
+
+from django.db.models import Q
+from django.utils.dateparse import parse_date
+
+from .models import JournalEntry
+
+PAGE_SIZE = 20
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+# The timeline is ordered newest day first, then by start time within a day.
+# 'id' breaks ties so the ordering (and therefore the cursor) is total.
+TIMELINE_ORDER = ('-date', 'start_time', 'id')
+
+
+def encode_cursor(entry):
+    raw = f"{entry.date.isoformat()}|{entry.start_time.isoformat()}|{entry.id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def decode_cursor(cursor):
+    try:
+        day, start, pk = base64.urlsafe_b64decode(cursor.encode()).decode().split('|')
+        return date.fromisoformat(day), time.fromisoformat(start), int(pk)
+    except (ValueError, UnicodeError) as exc:
+        raise InvalidCursor(cursor) from exc
+
+
+def parse_range(params):
+    # Optional ?start=YYYY-MM-DD&end=YYYY-MM-DD window; bad values are ignored
+    def _parse(value):
+        try:
+            return parse_date(value) if value else None
+        except ValueError:
+            return None
+    return _parse(params.get('start')), _parse(params.get('end'))
+
+
+def timeline(user, cursor=None, start=None, end=None):
+    """The user's entries after `cursor`, in timeline order (a lazy queryset)."""
+    entries = JournalEntry.objects.filter(user=user)
+    if start:
+        entries = entries.filter(date__gte=start)
+    if end:
+        entries = entries.filter(date__lte=end)
+
+    if cursor:
+        day, start_time, pk = decode_cursor(cursor)
+        # Everything after the cursor in (-date, start_time, id) order
+        entries = entries.filter(
+            Q(date__lt=day)
+            | Q(date=day, start_time__gt=start_time)
+            | Q(date=day, start_time=start_time, id__gt=pk)
+        )
+    return entries.order_by(*TIMELINE_ORDER)
+
+
+def _page(rows, limit):
+    # One extra row was fetched to know whether there is a next page
+    if len(rows) > limit:
+        rows = rows[:limit]
+        return rows, encode_cursor(rows[-1])
+    return rows, None
+
+
+def entries_page(user, cursor=None, start=None, end=None, limit=PAGE_SIZE):
+    """
+    One page of the user's timeline using keyset pagination on (date, start_time, id),
+    so page N costs the same as page 1 (an index range scan, no OFFSET).
+    Returns (entries, next_cursor); next_cursor is None on the last page.
+    """
+    return _page(list(timeline(user, cursor, start, end)[:limit + 1]), limit)
+
+
+async def aentries_page(user, cursor=None, start=None, end=None, limit=PAGE_SIZE):
+    # entries_page() for async views
+    return _page([entry async for entry in timeline(user, cursor, start, end)[:limit + 1]], limit)
@@ -0,0 +1,67 @@
+from django.db import transaction
+from django.db.models import Sum
+
+from .fragments import LEADERBOARD, bump_on_commit
+from .models import LeaderboardEntry, Profile, UserProgress, XPEvent
+
+
+def record_score(user, total_score):
+    """
+    Store the learner's current XP total in the rank table.
+    Called right after XP is awarded, so the dashboard never has to sort Profile.
+    """
+    updated = LeaderboardEntry.objects.filter(user=user).update(score=total_score)
+    if not updated:
+        # First award (or a user created before the leaderboard existed)
+        LeaderboardEntry.objects.update_or_create(user=user, defaults={'score': total_score})
+
+
+def top(limit=5):
+    # Index-ordered scan of the first `limit` rows, usernames joined in the same query
+    return (
+        LeaderboardEntry.objects
+        .select_related('user')
+        .order_by('-score', 'user_id')[:limit]
+    )
+
+
+def rank_for(user):
+    """
+    Returns (rank, score) for the user, or (None, 0) if they are not ranked yet.
+    Rank is 1 + the number of learners strictly ahead (ties share a rank).
+
+    Cost: the count is an index-only range scan of leaderboard_rank_idx over the learners
+    ahead, so O(rank) index entries, not O(log n) (no heap reads, no sort). That's kept on
+    purpose: a stored rank column would make every XP award rewrite the rank of everyone it
+    passes, and a sorted set needs Redis, which isn't a required dependency. It only runs
+    when the home_status fragment is rebuilt (see base/fragments.py), not per dashboard hit.
+    """
+    entry = LeaderboardEntry.objects.filter(user=user).values_list('score', flat=True).first()
+    if entry is None:
+        return None, 0
+    ahead = LeaderboardEntry.objects.filter(score__gt=entry).count()
+    return ahead + 1, entry
+
+
+@transaction.atomic
+def rebuild(from_events=False):
+    """
+    Recompute every entry, either from completed UserProgress rows (sum of goal points)
+    or, with from_events=True, from the XPEvent ledger.
+    Every learner with a Profile is ranked, even with 0 XP.
+    Returns the number of entries written.
+    """
+    if from_events:
+        rows = XPEvent.objects.values('user_id').annotate(total=Sum('points'))
+    else:
+        rows = UserProgress.objects.filter(is_completed=True).values('user_id').annotate(total=Sum('goal__points'))
+    totals = dict(rows.order_by().values_list('user_id', 'total'))
+    user_ids = set(Profile.objects.values_list('user_id', flat=True)) | set(totals)
+
+    LeaderboardEntry.objects.all().delete()
+    LeaderboardEntry.objects.bulk_create(
+        [LeaderboardEntry(user_id=user_id, score=totals.get(user_id) or 0) for user_id in user_ids],
+        batch_size=1000,
+    )
+    bump_on_commit(LEADERBOARD)
+    return len(user_ids)
@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from base.benchmarks import BENCHMARKS
+
+
+class Command(BaseCommand):
+    help = "Run one of the built-in micro-benchmarks (see base/benchmarks.py)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('name', help="Benchmark to run: " + ", ".join(sorted(BENCHMARKS)))
+        parser.add_argument('--iterations', type=int, default=50)
+
+    def handle(self, *args, **options):
+        name = options['name']
+        if name not in BENCHMARKS:
+            raise CommandError(f"Unknown benchmark '{name}'. Choose from: {', '.join(sorted(BENCHMARKS))}")
+        BENCHMARKS[name](self.stdout.write, options['iterations'])
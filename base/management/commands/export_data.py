@@ -0,0 +1,33 @@
+import itertools
+import sys
+
+from django.core.management.base import BaseCommand
+
+from base.transfer import CHUNK_SIZE, export_catalog, export_progress, write_ndjson
+
+
+class Command(BaseCommand):
+    help = ("Stream the course catalog and/or learner data (users, profiles, progress, journal) "
+            "as newline-delimited JSON, for backups or moving to another environment. "
+            "Load it with import_data. Includes password hashes: keep dumps private.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('-o', '--output', default='-', help="File to write ('-' for stdout, the default).")
+        parser.add_argument('--only', choices=['catalog', 'progress'], help="Export just one half.")
+        parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE, help="Rows fetched per query.")
+
+    def handle(self, *args, **options):
+        parts = []
+        if options['only'] != 'progress':
+            parts.append(export_catalog(options['chunk_size']))
+        if options['only'] != 'catalog':
+            parts.append(export_progress(options['chunk_size']))
+
+        path = options['output']
+        stream = sys.stdout if path == '-' else open(path, 'w', encoding='utf-8')
+        try:
+            count = write_ndjson(itertools.chain(*parts), stream)
+        finally:
+            if stream is not sys.stdout:
+                stream.close()
+        self.stderr.write(f"Exported {count} record(s).")
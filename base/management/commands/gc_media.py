@@ -0,0 +1,33 @@
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+
+from base.images import delete_derivatives
+from base.storage import digest_from_name, orphaned_blobs
+
+
+class Command(BaseCommand):
+    help = "Delete media blobs no JournalEntry, Profile or Certificate references any more (plus their thumbnails)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help="List orphans without deleting them.")
+        parser.add_argument('--min-age', type=int, default=60,
+                            help="Only collect files older than this many minutes (uploads in flight).")
+
+    def handle(self, *args, **options):
+        orphans = list(orphaned_blobs(default_storage, min_age=options['min_age'] * 60))
+        if options['dry_run']:
+            for name in orphans:
+                self.stdout.write(name)
+            self.stdout.write(f"{len(orphans)} orphaned file(s) would be deleted.")
+            return
+
+        freed = 0
+        for name in orphans:
+            freed += default_storage.size(name)
+            default_storage.delete(name)
+            digest = digest_from_name(name)
+            if digest:
+                delete_derivatives(digest)
+        self.stdout.write(self.style.SUCCESS(
+            f"Deleted {len(orphans)} orphaned file(s), {freed / (1024 * 1024):.1f} MB freed."
+        ))
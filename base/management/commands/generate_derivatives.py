@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+
+from base import images
+from base.models import JournalEntry, Profile
+
+
+class Command(BaseCommand):
+    help = "Build thumbnails/srcset derivatives for existing journal images and profile pictures."
+
+    def handle(self, *args, **options):
+        names = set(JournalEntry.objects.exclude(image='').exclude(image__isnull=True).values_list('image', flat=True))
+        names |= set(Profile.objects.exclude(profile_pic='').exclude(profile_pic__isnull=True)
+                     .values_list('profile_pic', flat=True))
+
+        built = failed = 0
+        for name in sorted(names):
+            try:
+                images.build_derivatives(name)
+                built += 1
+            except Exception as exc:
+                failed += 1
+                self.stderr.write(f"  {name}: {exc}")
+        self.stdout.write(self.style.SUCCESS(f"Derivatives ready for {built} image(s), {failed} failed."))
@@ -0,0 +1,64 @@
+import json
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+from django.http import Http404
+
+from base.grading import grade_batch
+
+
+def read_submissions(stream):
+    # One line at a time: the file is never loaded as a whole
+    for number, line in enumerate(stream, 1):
+        if not line.strip():
+            continue
+        try:
+            row = json.loads(line)
+        except json.JSONDecodeError as exc:
+            raise CommandError(f"line {number}: invalid JSON ({exc})")
+        if not isinstance(row, dict):
+            raise CommandError(f"line {number}: expected a JSON object")
+        if type(row.get('goal')) is not int:
+            raise CommandError(f"line {number}: 'goal' must be a goal id")
+        if not isinstance(row.get('answers'), dict):
+            raise CommandError(f"line {number}: 'answers' must be an object")
+        yield number, row
+
+
+class Command(BaseCommand):
+    help = ("Grade offline quiz submissions in bulk. Input: one JSON object per line, "
+            '{"goal": <goal id>, "answers": {"question_<id>": "1".."4", ...}, ...}. '
+            "Writes one JSON result per line (extra input keys are copied through). No XP is awarded.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="NDJSON file with the submissions ('-' for stdin).")
+
+    def handle(self, *args, **options):
+        path = options['path']
+        try:
+            stream = sys.stdin if path == '-' else open(path, encoding='utf-8')
+        except OSError as exc:
+            raise CommandError(f"Could not read {path}: {exc}")
+
+        current = None
+
+        def submissions():
+            nonlocal current
+            for current in read_submissions(stream):
+                yield current[1]['goal'], current[1]['answers']
+
+        graded = passed = 0
+        try:
+            for result in grade_batch(submissions()):
+                _number, row = current
+                graded += 1
+                passed += result.passed
+                row.pop('answers')
+                row.update(score=result.score, total=result.total, passed=result.passed, wrong=result.wrong_numbers)
+                self.stdout.write(json.dumps(row))
+        except Http404:
+            raise CommandError(f"line {current[0]}: no goal with id {current[1]['goal']}")
+        finally:
+            if stream is not sys.stdin:
+                stream.close()
+        self.stderr.write(f"Graded {graded} submission(s), {passed} passed.")
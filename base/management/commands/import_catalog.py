@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from base.catalog_import import CatalogError, import_files
+
+
+class Command(BaseCommand):
+    help = ("Load course files (JSON, or YAML with PyYAML installed) into the catalog. "
+            "Rows are matched by name/title/description and only the differences are written, "
+            "in bulk and in one transaction. See base/catalog_import.py for the format.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('paths', nargs='+', help="Course files to import.")
+        parser.add_argument('--prune', action='store_true',
+                            help="Delete materials/goals/questions/code labs of the imported subjects "
+                                 "that the files no longer list (removes learners' progress on them).")
+        parser.add_argument('--dry-run', action='store_true', help="Report the changes without saving them.")
+
+    def handle(self, *args, **options):
+        try:
+            report = import_files(options['paths'], prune=options['prune'], dry_run=options['dry_run'])
+        except (CatalogError, OSError) as exc:
+            raise CommandError(exc)
+
+        for line in report.lines():
+            self.stdout.write(f"  {line}")
+        if options['dry_run']:
+            self.stdout.write(self.style.WARNING("Dry run: nothing was saved."))
+        elif report.changed:
+            self.stdout.write(self.style.SUCCESS("Catalog updated."))
+        else:
+            self.stdout.write("Catalog already up to date.")
@@ -0,0 +1,32 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from base.catalog_import import CatalogError
+from base.transfer import CHUNK_SIZE, TransferError, import_ndjson
+
+
+class Command(BaseCommand):
+    help = ("Load a newline-delimited JSON dump written by export_data. Rows that already exist "
+            "(same subject/goal names, usernames...) are kept; only missing ones are added.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="Dump to read ('-' for stdin).")
+        parser.add_argument('--batch-size', type=int, default=CHUNK_SIZE, help="Rows inserted per query.")
+        parser.add_argument('--prune', action='store_true',
+                            help="Also delete catalog rows of the dumped subjects that the dump doesn't list.")
+
+    def handle(self, *args, **options):
+        path = options['path']
+        stream = sys.stdin if path == '-' else open(path, encoding='utf-8')
+        try:
+            counts = import_ndjson(stream, batch_size=options['batch_size'], prune=options['prune'])
+        except (TransferError, CatalogError) as exc:
+            raise CommandError(exc)
+        finally:
+            if stream is not sys.stdin:
+                stream.close()
+
+        for kind, count in counts.items():
+            self.stdout.write(f"  {kind}: {count} written")
+        self.stdout.write(self.style.SUCCESS("Import finished." if counts else "Nothing new to import."))
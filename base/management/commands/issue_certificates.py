@@ -0,0 +1,73 @@
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+from django.utils import timezone
+
+from base import certificates
+
+
+class Command(BaseCommand):
+    help = (
+        "Issue certificates for every user who has completed a subject but has none yet, "
+        "rendering the images in parallel across CPU cores. Safe to re-run: certificates are "
+        "recorded before rendering, and unfinished jobs are picked up on the next run."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=os.cpu_count() or 1,
+                            help="Render processes (default: number of CPU cores).")
+        parser.add_argument('--batch-size', type=int, default=500,
+                            help="Certificates created per transaction.")
+        parser.add_argument('--dry-run', action='store_true', help="Only report what would be issued.")
+
+    def handle(self, *args, **options):
+        # 1. Find complete user x subject pairs without a certificate (one aggregated query)
+        pairs = certificates.find_missing_certificates()
+        self.stdout.write(f"{len(pairs)} completed course(s) without a certificate.")
+        if options['dry_run']:
+            return
+
+        # 2. Record them (committed per batch, so an interrupted run can resume)
+        batch_size = options['batch_size']
+        created = sum(certificates.create_pending_certificates(pairs[start:start + batch_size])
+                      for start in range(0, len(pairs), batch_size))
+        if created != len(pairs):
+            self.stdout.write(f"{len(pairs) - created} were issued meanwhile, skipped.")
+
+        # Jobs orphaned by a crashed run go back in the queue
+        certificates.requeue_stale(timezone.now() - timedelta(minutes=10))
+
+        # 3. Render every pending job in a process pool
+        job_ids = certificates.pending_job_ids()
+        total = len(job_ids)
+        if not total:
+            self.stdout.write(self.style.SUCCESS("Nothing to render."))
+            return
+        self.stdout.write(f"Rendering {total} certificate(s) with {options['workers']} worker(s)...")
+
+        # Forked workers must not share the parent's DB connection
+        connections.close_all()
+        done = failed = 0
+        window = options['workers'] * 4
+        with ProcessPoolExecutor(max_workers=options['workers']) as pool:
+            for start in range(0, total, window):
+                futures = {}
+                for job_id in job_ids[start:start + window]:
+                    job = certificates.claim(job_id)
+                    if job is not None:
+                        futures[pool.submit(certificates.render_certificate_bytes, *certificates.render_args(job))] = job
+
+                for future in as_completed(futures):
+                    job = futures[future]
+                    try:
+                        certificates.store(job, future.result())
+                        done += 1
+                    except Exception as exc:
+                        certificates.fail(job, exc)
+                        failed += 1
+                self.stdout.write(f"  {done + failed}/{total} processed ({failed} failed)")
+
+        self.stdout.write(self.style.SUCCESS(f"Issued {done} certificate image(s), {failed} failed."))
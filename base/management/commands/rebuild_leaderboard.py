@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from base import leaderboard
+
+
+class Command(BaseCommand):
+    help = "Rebuild the leaderboard rank table from completed UserProgress rows (or the XP ledger)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--from-events', action='store_true',
+                            help="Sum the XPEvent ledger instead of completed goals.")
+
+    def handle(self, *args, **options):
+        count = leaderboard.rebuild(from_events=options['from_events'])
+        self.stdout.write(self.style.SUCCESS(f"Leaderboard rebuilt: {count} learners ranked."))
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from base import progress
+
+
+class Command(BaseCommand):
+    help = "Recompute the SubjectProgress counters from UserProgress and Goal rows."
+
+    def handle(self, *args, **options):
+        count = progress.recount()
+        self.stdout.write(self.style.SUCCESS(f"Progress recounted: {count} user x subject rows."))
@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+
+from base import catalog, embeds
+from base.models import Material
+
+
+class Command(BaseCommand):
+    help = "Recompute Material.embed_url for every material (after changing EMBED_ORIGIN or adding a resolver)."
+
+    def handle(self, *args, **options):
+        changed = []
+        for material in Material.objects.only('id', 'link', 'content_type', 'embed_url').iterator():
+            url = embeds.resolve(material.link, material.content_type)
+            if url != material.embed_url:
+                material.embed_url = url
+                changed.append(material)
+        Material.objects.bulk_update(changed, ['embed_url'], batch_size=500)
+        if changed:
+            catalog.invalidate()  # bulk_update sends no signals
+        self.stdout.write(self.style.SUCCESS(f"Updated {len(changed)} embed URL(s)."))
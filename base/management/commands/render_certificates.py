@@ -0,0 +1,38 @@
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from base import certificates
+
+
+class Command(BaseCommand):
+    help = (
+        "Render pending certificate images from the job table. "
+        "Picks up jobs left behind by a restart; use --loop to run as a standalone worker."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--loop', action='store_true', help="Keep polling for new jobs.")
+        parser.add_argument('--interval', type=float, default=2.0, help="Seconds between polls with --loop.")
+        parser.add_argument('--stale-minutes', type=int, default=10,
+                            help="Requeue 'running' jobs untouched for this long.")
+
+    def handle(self, *args, **options):
+        while True:
+            stale_before = timezone.now() - timedelta(minutes=options['stale_minutes'])
+            requeued = certificates.requeue_stale(stale_before)
+            if requeued:
+                self.stdout.write(f"Requeued {requeued} stale job(s).")
+
+            rendered = 0
+            for job_id in certificates.pending_job_ids():
+                if certificates.render_job(job_id):
+                    rendered += 1
+            if rendered or not options['loop']:
+                self.stdout.write(self.style.SUCCESS(f"Rendered {rendered} certificate(s)."))
+
+            if not options['loop']:
+                break
+            time.sleep(options['interval'])
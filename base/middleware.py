@@ -0,0 +1,51 @@
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.core.cache import cache
+from django.utils.functional import SimpleLazyObject
+
+from .fragments import user_version_name
+from .models import Profile
+from .versions import get_version
+
+PROFILE_TIMEOUT = 60 * 60
+
+
+def load_profile(user):
+    """
+    The user's Profile, created on first use. Cached per user and keyed on the user's
+    version, which Profile saves and XP awards bump (base/signals.py), so an edit or
+    new score shows up on the very next request.
+    """
+    key = f"profile:{user.id}:{get_version(user_version_name(user.id))}"
+    profile = cache.get(key)
+    if profile is None:
+        profile, _ = Profile.objects.get_or_create(user=user)
+        user_field = Profile._meta.get_field('user')
+        if user_field.is_cached(profile):
+            user_field.delete_cached_value(profile)  # don't pickle the User too
+        cache.set(key, profile, PROFILE_TIMEOUT)
+    profile.user = user  # also fills request.user.profile
+    return profile
+
+
+class ProfileMiddleware:
+    """
+    Sets request.profile: the logged-in user's Profile, loaded at most once per
+    request (and usually from cache), or None for anonymous visitors.
+    Must come after AuthenticationMiddleware.
+    Works under WSGI and ASGI; in async views it's loaded when the template (rendered
+    in a thread, see base/async_views.py) first uses it.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        request.profile = SimpleLazyObject(
+            lambda: load_profile(request.user) if request.user.is_authenticated else None
+        )
+        # Under ASGI get_response is async and this returns its coroutine for the handler to await
+        return self.get_response(request)
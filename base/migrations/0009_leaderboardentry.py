@@ -0,0 +1,40 @@
+# Generated by Django 6.0 on 2026-10-18 18:02
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def seed_from_profiles(apps, schema_editor):
+    # Start the rank table from the scores learners already have
+    Profile = apps.get_model('base', 'Profile')
+    LeaderboardEntry = apps.get_model('base', 'LeaderboardEntry')
+    LeaderboardEntry.objects.bulk_create(
+        [LeaderboardEntry(user_id=user_id, score=score)
+         for user_id, score in Profile.objects.values_list('user_id', 'total_score').iterator()],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('base', '0008_practicalchallenge'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LeaderboardEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('score', models.IntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='leaderboard_entry', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['-score', 'user'], name='leaderboard_rank_idx')],
+            },
+        ),
+        migrations.RunPython(seed_from_profiles, migrations.RunPython.noop),
+    ]
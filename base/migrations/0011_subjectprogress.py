@@ -0,0 +1,49 @@
+# Generated by Django 6.0 on 2026-10-18 18:07
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def backfill_counts(apps, schema_editor):
+    Goal = apps.get_model('base', 'Goal')
+    UserProgress = apps.get_model('base', 'UserProgress')
+    SubjectProgress = apps.get_model('base', 'SubjectProgress')
+
+    totals = dict(Goal.objects.order_by().values('subject_id').annotate(n=Count('id')).values_list('subject_id', 'n'))
+    completed = (
+        UserProgress.objects.filter(is_completed=True).order_by()
+        .values('user_id', 'goal__subject_id').annotate(n=Count('id'))
+        .values_list('user_id', 'goal__subject_id', 'n')
+    )
+    SubjectProgress.objects.bulk_create(
+        [SubjectProgress(user_id=user_id, subject_id=subject_id, completed=n, total=totals.get(subject_id, 0))
+         for user_id, subject_id, n in completed.iterator()],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('base', '0010_certificaterenderjob'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SubjectProgress',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('completed', models.IntegerField(default=0)),
+                ('total', models.IntegerField(default=0)),
+                ('subject', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='base.subject')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'unique_together': {('user', 'subject')},
+            },
+        ),
+        migrations.RunPython(backfill_counts, migrations.RunPython.noop),
+    ]
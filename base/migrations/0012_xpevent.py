@@ -0,0 +1,40 @@
+# Generated by Django 6.0 on 2026-10-18 18:08
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def opening_balances(apps, schema_editor):
+    # Scores earned before the ledger existed become one opening-balance event each,
+    # so the sum of a user's events always equals their total_score
+    Profile = apps.get_model('base', 'Profile')
+    XPEvent = apps.get_model('base', 'XPEvent')
+    XPEvent.objects.bulk_create(
+        [XPEvent(user_id=user_id, points=score, reason='opening_balance')
+         for user_id, score in Profile.objects.exclude(total_score=0).values_list('user_id', 'total_score').iterator()],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('base', '0011_subjectprogress'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='XPEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('points', models.IntegerField()),
+                ('reason', models.CharField(choices=[('goal', 'Goal Completed'), ('quiz', 'Quiz Passed'), ('challenge', 'Code Lab Passed'), ('opening_balance', 'Opening Balance')], max_length=20)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('goal', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to='base.goal')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.RunPython(opening_balances, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 6.0 on 2026-10-18 18:23
+
+from django.db import migrations, models
+
+
+def backfill_embed_urls(apps, schema_editor):
+    # Historical models don't run Material.save(), so resolve here
+    from base.embeds import resolve
+
+    Material = apps.get_model('base', 'Material')
+    materials = list(Material.objects.only('id', 'link', 'content_type'))
+    for material in materials:
+        material.embed_url = resolve(material.link, material.content_type)
+    Material.objects.bulk_update(materials, ['embed_url'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('base', '0013_journal_timeline_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='material',
+            name='embed_url',
+            field=models.URLField(blank=True, editable=False, max_length=500),
+        ),
+        migrations.RunPython(backfill_embed_urls, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 6.0 on 2026-10-18 18:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('base', '0015_quiz_attempts'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='practicalchallenge',
+            name='rules',
+            field=models.JSONField(blank=True, default=list),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 6.0 on 2026-10-18 18:38
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('base', '0016_practicalchallenge_rules'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='profile',
+            index=models.Index(fields=['-total_score', 'user'], name='profile_score_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='userprogress',
+            index=models.Index(condition=models.Q(('is_completed', True)), fields=['user', 'goal'], name='progress_completed_idx'),
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 6.0 on 2026-10-18 18:38
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def remove_duplicate_certificates(apps, schema_editor):
+    # Keep one certificate per (user, subject): a rendered one if any, else the oldest
+    Certificate = apps.get_model('base', 'Certificate')
+    duplicated = (Certificate.objects.values('user_id', 'subject_id').annotate(n=Count('id'))
+                  .filter(n__gt=1).order_by().values_list('user_id', 'subject_id'))
+    for user_id, subject_id in duplicated:
+        certs = sorted(Certificate.objects.filter(user_id=user_id, subject_id=subject_id),
+                       key=lambda cert: (not cert.image, cert.issued_date))
+        Certificate.objects.filter(id__in=[cert.id for cert in certs[1:]]).delete()  # render jobs cascade
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('base', '0017_hot_path_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RunPython(remove_duplicate_certificates, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='certificate',
+            constraint=models.UniqueConstraint(fields=('user', 'subject'), name='unique_certificate_per_subject'),
+        ),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 6.0 on 2026-10-18 18:39
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+
+BATCH_SIZE = 10000
+
+
+def backfill_subject(apps, schema_editor):
+    # One UPDATE per id range, each committed on its own (atomic = False), so a
+    # large table isn't locked in one long transaction
+    UserProgress = apps.get_model('base', 'UserProgress')
+    Goal = apps.get_model('base', 'Goal')
+    subject_of_goal = Subquery(Goal.objects.filter(pk=OuterRef('goal_id')).values('subject_id')[:1])
+
+    last = UserProgress.objects.order_by('-pk').values_list('pk', flat=True).first() or 0
+    for start in range(0, last + 1, BATCH_SIZE):
+        UserProgress.objects.filter(pk__gte=start, pk__lt=start + BATCH_SIZE, subject__isnull=True).update(
+            subject_id=subject_of_goal,
+        )
+
+
+class Migration(migrations.Migration):
+    atomic = False
+
+    dependencies = [
+        ('base', '0018_unique_certificate'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='userprogress',
+            name='subject',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, to='base.subject'),
+        ),
+        migrations.RunPython(backfill_subject, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 6.0 on 2026-10-18 18:40
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('base', '0019_userprogress_subject'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='userprogress',
+            name='subject',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='base.subject'),
+        ),
+        migrations.RemoveIndex(
+            model_name='userprogress',
+            name='progress_completed_idx',
+        ),
+        migrations.AddIndex(
+            model_name='userprogress',
+            index=models.Index(condition=models.Q(('is_completed', True)), fields=['user', 'subject', 'goal'], name='progress_user_subject_idx'),
+        ),
+    ]
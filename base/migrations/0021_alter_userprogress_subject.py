@@ -0,0 +1,19 @@
+# Generated by Django 6.0 on 2026-10-18 18:56
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('base', '0020_userprogress_subject_index'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='userprogress',
+            name='subject',
+            field=models.ForeignKey(editable=False, on_delete=django.db.models.deletion.CASCADE, to='base.subject'),
+        ),
+    ]
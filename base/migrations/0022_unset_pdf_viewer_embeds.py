@@ -0,0 +1,26 @@
+# Generated by Django 6.0 on 2026-10-18 19:40
+
+from django.db import migrations
+
+
+def reresolve_pdf_embeds(apps, schema_editor):
+    # 0014 backfilled every PDF through the Google Docs viewer, which is now opt-in
+    # (EMBED_PDF_VIEWER): resolve those rows again under the current settings
+    from base.embeds import PDF_VIEWER, resolve
+
+    Material = apps.get_model('base', 'Material')
+    materials = list(Material.objects.filter(embed_url__startswith=PDF_VIEWER).only('id', 'link', 'content_type'))
+    for material in materials:
+        material.embed_url = resolve(material.link, material.content_type)
+    Material.objects.bulk_update(materials, ['embed_url'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('base', '0021_alter_userprogress_subject'),
+    ]
+
+    operations = [
+        migrations.RunPython(reresolve_pdf_embeds, migrations.RunPython.noop),
+    ]
@@ -1,8 +1,10 @@
 from django.db import models
+from django.core.exceptions import ValidationError
 from django.contrib.auth.models import User
-import re
 import uuid 
 
+from . import embeds
+
 # ... Keep Subject model as is ...
 
 class Subject(models.Model):
@@ -20,34 +22,46 @@ class Material(models.Model):
         ('article', 'Article')
     ])
 
+    # Where the content modal points its <iframe>; computed from link on save (base/embeds.py)
+    embed_url = models.URLField(max_length=500, blank=True, editable=False)
+
     def __str__(self): return self.title
 
-    # NEW: Helper to convert YouTube links to Embed format
+    def save(self, *args, **kwargs):
+        self.embed_url = embeds.resolve(self.link, self.content_type)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and ('link' in update_fields or 'content_type' in update_fields):
+            kwargs['update_fields'] = {*update_fields, 'embed_url'}
+        super().save(*args, **kwargs)
+
     def get_embed_url(self):
-        # 1. Handle YouTube
-        if "youtube.com" in self.link or "youtu.be" in self.link:
-            # Regex to grab the 11-char ID
-            import re
-            regex = r'(?:v=|\/)([0-9A-Za-z_-]{11}).*'
-            match = re.search(regex, self.link)
-            
-            if match:
-                video_id = match.group(1)
-                # IMPORTANT: We add '?rel=0' (no recommended videos) and 'origin' (fixes localhost error)
-                return f"https://www.youtube.com/embed/{video_id}?rel=0&modestbranding=1&origin=http://127.0.0.1:8000"
-        
-        # 2. Handle Google Drive / Docs (for PDFs)
-        if "drive.google.com" in self.link and "/view" in self.link:
-            return self.link.replace("/view", "/preview")
-            
-        return self.link
+        return self.embed_url or self.link
     
 
+class GoalQuerySet(models.QuerySet):
+    def with_activities(self):
+        """
+        Loads goals together with their PracticalChallenge (joined) and Questions
+        (one prefetch query), annotated with has_quiz / has_challenge.
+        Two queries in total, no matter how many goals the subject has.
+        """
+        return (
+            self.select_related('practicalchallenge')
+            .prefetch_related('questions')
+            .annotate(
+                has_quiz=models.Exists(Question.objects.filter(goal=models.OuterRef('pk'))),
+                has_challenge=models.Exists(PracticalChallenge.objects.filter(goal=models.OuterRef('pk'))),
+            )
+        )
+
+
 class Goal(models.Model):
     subject = models.ForeignKey(Subject, on_delete=models.CASCADE)
     description = models.CharField(max_length=255)
     points = models.IntegerField(default=10)
 
+    objects = GoalQuerySet.as_manager()
+
     def __str__(self): return self.description
 
 # NEW: Quiz Question Model
@@ -78,16 +92,69 @@ class Profile(models.Model):
     bio = models.TextField(null=True, blank=True)
     profile_pic = models.ImageField(null=True, blank=True, upload_to="profile_pics/")
 
+    class Meta:
+        # Highest score first (admin list, leaderboard rebuilds)
+        indexes = [models.Index(fields=['-total_score', 'user'], name='profile_score_idx')]
+
     def __str__(self):
         return self.user.username
 
 class UserProgress(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE)
     goal = models.ForeignKey(Goal, on_delete=models.CASCADE)
+    # NEW: Copy of goal.subject, so per-subject progress never joins Goal (set in save())
+    subject = models.ForeignKey(Subject, on_delete=models.CASCADE, editable=False)
     is_completed = models.BooleanField(default=False)
     date_completed = models.DateTimeField(auto_now_add=True)
-    class Meta: unique_together = ('user', 'goal')
+    class Meta:
+        unique_together = ('user', 'goal')
+        # "What has this user completed (in this subject)": completed rows only, goal included
+        # so the completed-goal sets and per-subject counts are index-only scans
+        indexes = [models.Index(fields=['user', 'subject', 'goal'], condition=models.Q(is_completed=True),
+                                name='progress_user_subject_idx')]
     def __str__(self): return f"{self.user.username} - {self.goal.description}"
+
+    def save(self, *args, **kwargs):
+        # Always follows the goal (bulk_create skips this: set subject_id yourself there)
+        self.subject_id = self.goal.subject_id
+        super().save(*args, **kwargs)
+
+# NEW: Append-only XP ledger (every award is recorded; Profile.total_score is the running sum)
+class XPEvent(models.Model):
+    REASON_CHOICES = [
+        ('goal', 'Goal Completed'),
+        ('quiz', 'Quiz Passed'),
+        ('challenge', 'Code Lab Passed'),
+        ('opening_balance', 'Opening Balance'),
+    ]
+    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    goal = models.ForeignKey(Goal, on_delete=models.SET_NULL, null=True, blank=True)
+    points = models.IntegerField()
+    reason = models.CharField(max_length=20, choices=REASON_CHOICES)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self): return f"{self.user.username} +{self.points} XP ({self.reason})"
+
+# NEW: Denormalized per-user, per-subject counters (kept in sync by base/signals.py)
+class SubjectProgress(models.Model):
+    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    subject = models.ForeignKey(Subject, on_delete=models.CASCADE)
+    completed = models.IntegerField(default=0)
+    total = models.IntegerField(default=0)
+    class Meta: unique_together = ('user', 'subject')
+
+    def __str__(self): return f"{self.user.username} - {self.subject.name}: {self.completed}/{self.total}"
+
+    @property
+    def is_complete(self):
+        return self.total > 0 and self.completed >= self.total
+
+    @property
+    def percent(self):
+        if not self.total:
+            return 0
+        return min(100, round(100 * self.completed / self.total))
+
 class JournalEntry(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE)
     title = models.CharField(max_length=200)
@@ -101,6 +168,10 @@ class JournalEntry(models.Model):
     image = models.ImageField(upload_to='journal_images/', blank=True, null=True)
     created_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        # Matches the timeline order (-date, start_time, id) used by keyset pagination
+        indexes = [models.Index(fields=['user', '-date', 'start_time', 'id'], name='journal_timeline_idx')]
+
     def __str__(self):
         return f"{self.title} ({self.date})"
 class Certificate(models.Model):
@@ -108,10 +179,38 @@ class Certificate(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE)
     subject = models.ForeignKey(Subject, on_delete=models.CASCADE)
     issued_date = models.DateField(auto_now_add=True)
-    image = models.ImageField(upload_to='certificates/')
+    # Empty until the background renderer has drawn it (see base/certificates.py)
+    image = models.ImageField(upload_to='certificates/', blank=True)
+
+    class Meta:
+        # One certificate per learner and course (also the index for the "already issued?" check)
+        constraints = [models.UniqueConstraint(fields=['user', 'subject'], name='unique_certificate_per_subject')]
 
     def __str__(self):
         return f"Certificate: {self.user.username} - {self.subject.name}"
+
+    @property
+    def is_ready(self):
+        return bool(self.image)
+
+
+# NEW: DB-backed queue for certificate images (rendered off the request path)
+class CertificateRenderJob(models.Model):
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('running', 'Running'),
+        ('done', 'Done'),
+        ('failed', 'Failed'),
+    ]
+    certificate = models.OneToOneField(Certificate, on_delete=models.CASCADE, related_name='render_job')
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='pending', db_index=True)
+    attempts = models.IntegerField(default=0)
+    error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Render job ({self.status}): {self.certificate_id}"
 class PracticalChallenge(models.Model):
     goal = models.OneToOneField(Goal, on_delete=models.CASCADE) # One challenge per goal
     instruction = models.TextField() # e.g., "Create an h1 tag with 'Hello'"
@@ -120,6 +219,64 @@ class PracticalChallenge(models.Model):
     
     # Validation: We will check if the user's code contains this string
     validation_text = models.CharField(max_length=100) # e.g., "color: blue"
+    # NEW: Structured checks on the parsed page (see base/validator.py); replaces validation_text when set
+    rules = models.JSONField(default=list, blank=True)
     
+    def clean(self):
+        from .validator import compile_rules
+        try:
+            compile_rules(self.rules)
+        except ValueError as e:
+            raise ValidationError({'rules': str(e)})
+
+    def __str__(self):
+        return f"Challenge: {self.goal.description}"
+# NEW: Materialized Leaderboard (one row per learner, kept in sync when XP is awarded)
+class LeaderboardEntry(models.Model):
+    user = models.OneToOneField(User, on_delete=models.CASCADE, related_name='leaderboard_entry')
+    score = models.IntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        # Top-N and "my rank" both walk this index instead of sorting Profile
+        indexes = [models.Index(fields=['-score', 'user'], name='leaderboard_rank_idx')]
+
+    def __str__(self):
+        return f"{self.user.username}: {self.score} XP"
+
+# NEW: Quiz attempt history (passed and failed), written in batches by base/attempts.py
+class QuizAttempt(models.Model):
+    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    goal = models.ForeignKey(Goal, on_delete=models.CASCADE)
+    score = models.IntegerField()
+    total = models.IntegerField()
+    passed = models.BooleanField()
+    created_at = models.DateTimeField(db_index=True)  # submission time, set by the writer
+
     def __str__(self):
-        return f"Challenge: {self.goal.description}"
\ No newline at end of file
+        return f"{self.user.username}: {self.goal.description} {self.score}/{self.total}"
+
+
+class QuizAnswer(models.Model):
+    attempt = models.ForeignKey(QuizAttempt, on_delete=models.CASCADE, related_name='answers')
+    question = models.ForeignKey(Question, on_delete=models.CASCADE)
+    given = models.CharField(max_length=1, blank=True)  # '' = left unanswered
+    is_correct = models.BooleanField()
+
+
+# NEW: Running per-question correctness (updated with each flushed batch, never by scanning attempts)
+class QuestionStats(models.Model):
+    question = models.OneToOneField(Question, on_delete=models.CASCADE, related_name='stats')
+    attempts = models.IntegerField(default=0)
+    correct = models.IntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name_plural = 'question stats'
+
+    def __str__(self):
+        return f"{self.question.question_text}: {self.correct}/{self.attempts} correct"
+
+    @property
+    def correct_rate(self):
+        return round(self.correct / self.attempts, 3) if self.attempts else None
@@ -0,0 +1,170 @@
+from django.core.cache import cache
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F
+
+from .models import Goal, Subject, SubjectProgress, UserProgress
+from .versions import aget_version, get_version
+
+PROGRESS_CACHE_TIMEOUT = 60 * 60
+
+
+def progress_version_name(user_id):
+    # Bumped by base.signals whenever one of the user's UserProgress rows changes
+    return f"progress:{user_id}"
+
+
+class ProgressIndex:
+    """
+    Completed-goal sets for one user, one frozenset per subject.
+    Membership checks are O(1); each subject is loaded at most once per request
+    (from the cache when possible, otherwise with one query scoped to that subject).
+    """
+
+    def __init__(self, user):
+        self.user_id = user.pk
+        self._by_subject = {}
+        self._version = None
+
+    def _cache_key(self, subject_id):
+        if self._version is None:
+            self._version = get_version(progress_version_name(self.user_id))
+        return f"progress:{self.user_id}:{self._version}:{subject_id}"
+
+    def completed_ids(self, subject_id):
+        if subject_id not in self._by_subject:
+            key = self._cache_key(subject_id)
+            ids = cache.get(key)
+            if ids is None:
+                ids = frozenset(
+                    UserProgress.objects.filter(
+                        user_id=self.user_id, subject_id=subject_id, is_completed=True
+                    ).values_list('goal_id', flat=True)
+                )
+                cache.set(key, ids, PROGRESS_CACHE_TIMEOUT)
+            self._by_subject[subject_id] = ids
+        return self._by_subject[subject_id]
+
+    async def acompleted_ids(self, subject_id):
+        # completed_ids() for async views: async cache reads and async ORM iteration
+        if subject_id not in self._by_subject:
+            if self._version is None:
+                self._version = await aget_version(progress_version_name(self.user_id))
+            key = self._cache_key(subject_id)
+            ids = await cache.aget(key)
+            if ids is None:
+                ids = frozenset([
+                    goal_id async for goal_id in UserProgress.objects.filter(
+                        user_id=self.user_id, subject_id=subject_id, is_completed=True
+                    ).values_list('goal_id', flat=True)
+                ])
+                await cache.aset(key, ids, PROGRESS_CACHE_TIMEOUT)
+            self._by_subject[subject_id] = ids
+        return self._by_subject[subject_id]
+
+    def completed_count(self, subject_id):
+        return len(self.completed_ids(subject_id))
+
+    def is_completed(self, goal):
+        return goal.id in self.completed_ids(goal.subject_id)
+
+    def summary(self):
+        """
+        Per-subject progress for every subject that has goals, e.g. for the profile page.
+        Completed counts come from the SubjectProgress counters (one query).
+        """
+        subjects = Subject.objects.annotate(total=Count('goal')).filter(total__gt=0).order_by('name')
+        completed = dict(
+            SubjectProgress.objects.filter(user_id=self.user_id).values_list('subject_id', 'completed')
+        )
+        summary = []
+        for subject in subjects:
+            done = min(completed.get(subject.id, 0), subject.total)
+            summary.append({
+                'subject': subject,
+                'completed': done,
+                'total': subject.total,
+                'percent': round(100 * done / subject.total),
+            })
+        return summary
+
+
+def progress_for(request):
+    # One index per request, shared by the view and anything it calls
+    if not hasattr(request, '_progress_index'):
+        request._progress_index = ProgressIndex(request.user)
+    return request._progress_index
+
+
+# --- SubjectProgress counters ---
+# Maintained from base/signals.py, inside the transaction that changes the
+# UserProgress / Goal rows, so completion checks are a single-row read.
+
+def _counts(user_id, subject_id):
+    return {
+        'completed': UserProgress.objects.filter(
+            user_id=user_id, subject_id=subject_id, is_completed=True
+        ).count(),
+        'total': Goal.objects.filter(subject_id=subject_id).count(),
+    }
+
+
+def record_completion(user_id, subject_id):
+    with transaction.atomic():
+        updated = SubjectProgress.objects.filter(user_id=user_id, subject_id=subject_id).update(
+            completed=F('completed') + 1
+        )
+        if updated:
+            return
+        # First completion in this subject: start from the real counts
+        # (they already include the row that triggered this call)
+        try:
+            with transaction.atomic():
+                SubjectProgress.objects.create(user_id=user_id, subject_id=subject_id, **_counts(user_id, subject_id))
+        except IntegrityError:
+            # Created concurrently by another request; just apply our change
+            SubjectProgress.objects.filter(user_id=user_id, subject_id=subject_id).update(
+                completed=F('completed') + 1
+            )
+
+
+def record_uncompletion(user_id, subject_id):
+    # Never creates a row: during cascading deletes the subject may be on its way out
+    SubjectProgress.objects.filter(user_id=user_id, subject_id=subject_id).update(completed=F('completed') - 1)
+
+
+def record_goal_change(subject_id, delta):
+    SubjectProgress.objects.filter(subject_id=subject_id).update(total=F('total') + delta)
+
+
+def subject_progress(user, subject):
+    # Single-row read; None if the user hasn't completed anything in the subject yet
+    return SubjectProgress.objects.filter(user=user, subject=subject).first()
+
+
+async def asubject_progress(user, subject):
+    return await SubjectProgress.objects.filter(user=user, subject=subject).afirst()
+
+
+def recount(subject_ids=None):
+    """
+    Recompute SubjectProgress from UserProgress and Goal, e.g. after bulk imports
+    that bypass signals. Returns the number of rows written.
+    """
+    goals = Goal.objects.order_by()
+    progress = UserProgress.objects.filter(is_completed=True).order_by()
+    existing = SubjectProgress.objects.all()
+    if subject_ids is not None:
+        goals = goals.filter(subject_id__in=subject_ids)
+        progress = progress.filter(subject_id__in=subject_ids)
+        existing = existing.filter(subject_id__in=subject_ids)
+
+    totals = dict(goals.values('subject_id').annotate(n=Count('id')).values_list('subject_id', 'n'))
+    rows = [
+        SubjectProgress(user_id=user_id, subject_id=subject_id, completed=n, total=totals.get(subject_id, 0))
+        for user_id, subject_id, n in progress.values('user_id', 'subject_id')
+        .annotate(n=Count('id')).values_list('user_id', 'subject_id', 'n')
+    ]
+    with transaction.atomic():
+        existing.delete()
+        SubjectProgress.objects.bulk_create(rows, batch_size=1000)
+    return len(rows)
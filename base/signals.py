@@ -0,0 +1,92 @@
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from .fragments import CATALOG, LEADERBOARD, bump_on_commit, user_version_name
+from .images import queue_derivatives
+from .models import Goal, JournalEntry, Material, PracticalChallenge, Profile, Question, Subject, UserProgress
+from .progress import progress_version_name, record_completion, record_goal_change, record_uncompletion, recount
+
+
+# --- Progress index invalidation (see base/progress.py) ---
+@receiver([post_save, post_delete], sender=UserProgress)
+def invalidate_progress_index(sender, instance, **kwargs):
+    bump_on_commit(progress_version_name(instance.user_id))
+
+
+# --- SubjectProgress counters ---
+@receiver(post_save, sender=UserProgress)
+def count_completion(sender, instance, created, raw=False, **kwargs):
+    if created and instance.is_completed and not raw:
+        record_completion(instance.user_id, instance.subject_id)
+
+
+@receiver(post_delete, sender=UserProgress)
+def uncount_completion(sender, instance, **kwargs):
+    if instance.is_completed:
+        record_uncompletion(instance.user_id, instance.subject_id)
+
+
+@receiver(post_save, sender=Goal)
+def count_goal(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        record_goal_change(instance.subject_id, 1)
+    elif not raw:
+        # A goal moved to another subject takes its UserProgress.subject copies along
+        # (update() sends no signals: the learners' cached progress is invalidated here)
+        moved = UserProgress.objects.filter(goal=instance).exclude(subject_id=instance.subject_id)
+        rows = set(moved.values_list('user_id', 'subject_id'))
+        if rows:
+            moved.update(subject_id=instance.subject_id)
+            recount({subject_id for _user_id, subject_id in rows} | {instance.subject_id})
+            bump_on_commit(*(name for user_id in {user_id for user_id, _subject_id in rows}
+                             for name in (progress_version_name(user_id), user_version_name(user_id))))
+
+
+@receiver(post_delete, sender=Goal)
+def uncount_goal(sender, instance, **kwargs):
+    record_goal_change(instance.subject_id, -1)
+
+
+# --- Image derivatives (thumbnails / srcset sizes), built off the request path ---
+@receiver(post_save, sender=JournalEntry)
+@receiver(post_save, sender=Profile)
+def build_image_derivatives(sender, instance, raw=False, **kwargs):
+    image = instance.image if sender is JournalEntry else instance.profile_pic
+    if image and not raw:
+        name = image.name
+        transaction.on_commit(lambda: queue_derivatives(name))
+
+
+# --- Cached dashboard fragments (see base/fragments.py) ---
+# Also the version of the catalog snapshot (base/catalog.py)
+@receiver([post_save, post_delete], sender=Subject)
+@receiver([post_save, post_delete], sender=Material)
+@receiver([post_save, post_delete], sender=Goal)
+@receiver([post_save, post_delete], sender=Question)
+@receiver([post_save, post_delete], sender=PracticalChallenge)
+def invalidate_catalog(sender, raw=False, **kwargs):
+    if not raw:
+        bump_on_commit(CATALOG)
+
+
+@receiver([post_save, post_delete], sender=UserProgress)
+def invalidate_score_fragments(sender, instance, **kwargs):
+    # XP is added with an F() update (no Profile signal) in the same transaction
+    # that creates the UserProgress row, so this covers every award
+    bump_on_commit(user_version_name(instance.user_id), LEADERBOARD)
+
+
+@receiver(post_save, sender=Profile)
+def invalidate_profile_fragments(sender, instance, raw=False, **kwargs):
+    if not raw:
+        bump_on_commit(user_version_name(instance.user_id))
+
+
+@receiver(post_save, sender=User)
+def invalidate_username_fragments(sender, instance, created, update_fields=None, raw=False, **kwargs):
+    # Usernames show on the leaderboard; logins only touch last_login
+    if created or raw or update_fields == frozenset({'last_login'}):
+        return
+    bump_on_commit(user_version_name(instance.id), LEADERBOARD)
@@ -0,0 +1,102 @@
+import hashlib
+import os
+import re
+import time
+import uuid
+from collections import Counter
+
+from django.apps import apps
+from django.core.files.storage import FileSystemStorage
+
+# Uploaded media (journal images, profile pictures, certificates) is stored once per
+# distinct content under blobs/<first 2 hex>/<sha256>.<ext>. The same photo uploaded
+# to ten journal entries is one file on disk; the rows just share the name.
+BLOB_ROOT = 'blobs'
+TEMP_ROOT = f'{BLOB_ROOT}/tmp'
+BLOB_NAME = re.compile(rf'^{BLOB_ROOT}/[0-9a-f]{{2}}/(?P<digest>[0-9a-f]{{64}})\.\w+$')
+
+# (model, field) pairs whose files live in blob storage; GC keeps anything they point at
+REFERENCING_FIELDS = (
+    ('base.JournalEntry', 'image'),
+    ('base.Profile', 'profile_pic'),
+    ('base.Certificate', 'image'),
+)
+
+
+def blob_name(digest, extension):
+    return f"{BLOB_ROOT}/{digest[:2]}/{digest}{extension}"
+
+
+def digest_from_name(name):
+    # sha256 of a blob straight from its name (None for legacy upload_to paths)
+    match = BLOB_NAME.match(name or '')
+    return match.group('digest') if match else None
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    """
+    FileSystemStorage that names every saved file after the SHA-256 of its content.
+    Saving bytes that are already stored writes nothing and returns the existing name.
+    Paths under `passthrough_prefixes` (already content-keyed derivatives) are stored
+    as-is. Files saved before this backend keep their old paths and still work.
+    """
+    passthrough_prefixes = ('derivatives/',)
+
+    def _passthrough(self, name):
+        return name.startswith(self.passthrough_prefixes)
+
+    def get_available_name(self, name, max_length=None):
+        # The upload_to name is never written to, so there's nothing to make unique
+        if self._passthrough(name):
+            return super().get_available_name(name, max_length=max_length)
+        return name
+
+    def _save(self, name, content):
+        if self._passthrough(name):
+            return super()._save(name, content)
+
+        sha = hashlib.sha256()
+        for chunk in content.chunks():
+            sha.update(chunk)
+        target = blob_name(sha.hexdigest(), os.path.splitext(name)[1].lower())
+        if self.exists(target):
+            # Touch it: an old orphan being reused must not look old to gc_media
+            # before the row that references it again is committed
+            try:
+                os.utime(self.path(target))
+                return target
+            except FileNotFoundError:
+                pass  # collected in between: write it again
+
+        # Write under a unique temp name, then rename into place: two requests
+        # saving the same bytes at once both succeed and leave one blob
+        temp = super()._save(f"{TEMP_ROOT}/{uuid.uuid4().hex}", content)
+        os.makedirs(os.path.dirname(self.path(target)), exist_ok=True)
+        os.replace(self.path(temp), self.path(target))
+        return target
+
+
+def references():
+    # Reference count per stored name across every row that points at a file
+    counts = Counter()
+    for label, field in REFERENCING_FIELDS:
+        model = apps.get_model(label)
+        names = model.objects.exclude(**{field: ''}).exclude(**{f'{field}__isnull': True})
+        counts.update(names.values_list(field, flat=True))
+    return counts
+
+
+def orphaned_blobs(storage, min_age=3600):
+    """
+    Blob (and leftover temp) names no row references. Files younger than `min_age`
+    seconds are skipped: an upload is saved to storage before its row is committed.
+    """
+    live = references()
+    cutoff = time.time() - min_age
+    root = storage.path(BLOB_ROOT)
+    for dirpath, _dirnames, filenames in os.walk(root):
+        for filename in filenames:
+            path = os.path.join(dirpath, filename)
+            name = os.path.relpath(path, storage.path('')).replace(os.sep, '/')
+            if name not in live and os.path.getmtime(path) < cutoff:
+                yield name
@@ -0,0 +1,39 @@
+from django import template
+from django.core.cache import cache
+
+from base import fragments
+
+register = template.Library()
+
+
+# Usage: {% load fragment_tags %}
+#   {% cachefragment 'home_subjects' %} ...expensive markup... {% endcachefragment %}
+# The name must be listed in base/fragments.FRAGMENTS, which says what the cache key
+# depends on. Needs `request` in the context.
+
+class FragmentNode(template.Node):
+    def __init__(self, name, nodelist):
+        self.name = name
+        self.nodelist = nodelist
+
+    def render(self, context):
+        key = fragments.fragment_key(self.name, context['request'])
+        html = cache.get(key)
+        fragments.record(self.name, hit=html is not None)
+        if html is None:
+            html = self.nodelist.render(context)
+            cache.set(key, html, fragments.FRAGMENT_TIMEOUT)
+        return html
+
+
+@register.tag
+def cachefragment(parser, token):
+    bits = token.split_contents()
+    if len(bits) != 2 or bits[1][0] not in '"\'' or bits[1][-1] != bits[1][0]:
+        raise template.TemplateSyntaxError("Usage: {% cachefragment 'name' %}")
+    name = bits[1][1:-1]
+    if name not in fragments.FRAGMENTS:
+        raise template.TemplateSyntaxError(f"Unknown fragment '{name}' (add it to base/fragments.FRAGMENTS)")
+    nodelist = parser.parse(('endcachefragment',))
+    parser.delete_first_token()
+    return FragmentNode(name, nodelist)
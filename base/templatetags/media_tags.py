@@ -0,0 +1,31 @@
+from django import template
+
+from base import images
+
+register = template.Library()
+
+
+# Usage: {% load media_tags %}
+#   {% responsive_image entry.image sizes="(min-width: 768px) 720px, 100vw" class="..." alt="..." %}
+#   <img src="{% thumbnail_url profile.profile_pic 160 %}">
+# Both serve downscaled WebP/JPEG derivatives (base/images.py); until those are ready
+# (they're made in the background) the upload itself, which was downsampled on the way in.
+
+@register.inclusion_tag('base/responsive_image.html')
+def responsive_image(field_file, sizes="100vw", default_width=640, **attrs):
+    manifest = images.derivatives_for(field_file)
+    return {
+        'ready': bool(manifest),
+        'webp_srcset': images.srcset(field_file, 'webp') if manifest else '',
+        'jpeg_srcset': images.srcset(field_file, 'jpeg') if manifest else '',
+        'src': images.derivative_url(field_file, default_width, 'jpeg') if manifest else
+               (field_file.url if field_file else ''),
+        'sizes': sizes,
+        'css_class': attrs.get('class', ''),
+        'alt': attrs.get('alt', ''),
+    }
+
+
+@register.simple_tag
+def thumbnail_url(field_file, width, ext='webp'):
+    return images.derivative_url(field_file, int(width), ext)
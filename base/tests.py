@@ -1,3 +1,1181 @@
-from django.test import TestCase
+import itertools
+import json
+import os
+import re
+import tempfile
+import threading
+from io import BytesIO
+from unittest import mock, skipUnless
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import DatabaseError, connection, connections
+from PIL import Image
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase, TransactionTestCase, override_settings, skipUnlessDBFeature
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+import datetime
+
+from .models import (Subject, Material, Goal, Question, PracticalChallenge, Profile, LeaderboardEntry, XPEvent,
+                     JournalEntry, QuizAttempt, QuestionStats, UserProgress, SubjectProgress, Certificate,
+                     CertificateRenderJob)
+from . import (async_views, attempts, catalog, catalog_import, certificates, embeds, grading, images, journal,
+               leaderboard, progress, transfer, uploads, utils, validator)
+from .storage import orphaned_blobs
+from .urls import build_urlpatterns
+from .completion import complete_goal
+from .progress import ProgressIndex
+from .xp import award_xp
+
+
+def discard_buffered_attempts():
+    # Quiz posts leave attempts in the buffer and start its flush timer; a flush firing
+    # during a later test would write into that test's database
+    with attempts._lock:
+        if attempts._timer is not None:
+            attempts._timer.cancel()
+            attempts._timer = None
+        attempts._buffer.clear()
+
+
+class SubjectPageQueryTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('learner', password='pw')
+        Profile.objects.create(user=self.user)
+        self.subject = Subject.objects.create(name="Web Development")
+        self.client.force_login(self.user)
+
+    def add_goals(self, count):
+        # Mix of quiz goals, code-lab goals and plain goals
+        for i in range(count):
+            goal = Goal.objects.create(subject=self.subject, description=f"Goal {i}", points=10)
+            if i % 3 == 0:
+                for n in range(3):
+                    Question.objects.create(
+                        goal=goal, question_text=f"Q{n}", option_1="a", option_2="b",
+                        option_3="c", option_4="d", correct_option='1',
+                    )
+            elif i % 3 == 1:
+                PracticalChallenge.objects.create(goal=goal, instruction="Make an h1", validation_text="<h1>")
+
+    def count_queries(self):
+        cache.clear()  # compare cold requests
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(reverse('subject', args=[self.subject.id]))
+        self.assertEqual(response.status_code, 200)
+        return len(ctx.captured_queries)
+
+    def test_query_count_does_not_grow_with_goals(self):
+        self.add_goals(3)
+        few = self.count_queries()
+        self.add_goals(40)
+        many = self.count_queries()
+        self.assertEqual(few, many)
+
+    def test_goal_plan_annotations(self):
+        self.add_goals(3)
+        with self.assertNumQueries(2):
+            goals = list(self.subject.goal_set.with_activities().order_by('id'))
+            self.assertEqual([g.has_quiz for g in goals], [True, False, False])
+            self.assertEqual([g.has_challenge for g in goals], [False, True, False])
+            self.assertEqual(len(goals[0].questions.all()), 3)
+
+
+class XPLedgerTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('learner', password='pw')
+        Profile.objects.create(user=self.user, bio="Keep me")
+
+    def test_award_updates_profile_ledger_and_leaderboard(self):
+        award_xp(self.user, 10, 'goal')
+        total = award_xp(self.user, 15, 'quiz')
+        profile = Profile.objects.get(user=self.user)
+        self.assertEqual(total, 25)
+        self.assertEqual(profile.total_score, 25)
+        self.assertEqual(profile.bio, "Keep me")
+        self.assertEqual(XPEvent.objects.filter(user=self.user).count(), 2)
+        self.assertEqual(LeaderboardEntry.objects.get(user=self.user).score, 25)
+
+    def test_award_creates_missing_profile(self):
+        other = User.objects.create_user('newcomer')
+        self.assertEqual(award_xp(other, 5, 'goal'), 5)
+
+
+class LeaderboardTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.users = [User.objects.create_user(name, password='pw') for name in ('ann', 'ben', 'cat')]
+        for user in self.users:
+            Profile.objects.create(user=user)
+            leaderboard.record_score(user, 0)  # as registration does
+        subject = Subject.objects.create(name="Web Development")
+        self.plain = Goal.objects.create(subject=subject, description="Read", points=10)
+        self.quiz = Goal.objects.create(subject=subject, description="Quiz", points=20)
+        self.question = Question.objects.create(goal=self.quiz, question_text="?", option_1="a", option_2="b",
+                                                option_3="c", option_4="d", correct_option='2')
+        self.lab = Goal.objects.create(subject=subject, description="Lab", points=15)
+        self.challenge = PracticalChallenge.objects.create(goal=self.lab, instruction="Make an h1",
+                                                           validation_text="<h1>")
+        Goal.objects.create(subject=subject, description="Not done by anyone", points=5)
+
+    def tearDown(self):
+        discard_buffered_attempts()
+
+    def earn(self):
+        ann, ben, cat = self.users
+        subject_id = self.plain.subject_id
+        self.client.force_login(ann)
+        self.client.post(reverse('mark_complete', args=[subject_id, self.plain.id]))
+        self.client.force_login(ben)
+        self.client.post(reverse('submit_quiz', args=[subject_id, self.quiz.id]), {f'question_{self.question.id}': '2'})
+        self.client.force_login(cat)
+        self.client.post(reverse('verify_practical', args=[self.challenge.id]), {'code_submission': '<h1>Hi</h1>'})
+
+    def entries(self):
+        return dict(LeaderboardEntry.objects.values_list('user__username', 'score'))
+
+    def test_awards_update_the_ranking(self):
+        self.earn()
+        self.assertEqual([(e.user.username, e.score) for e in leaderboard.top(3)],
+                         [('ben', 20), ('cat', 15), ('ann', 10)])
+        self.assertEqual(leaderboard.rank_for(self.users[0]), (3, 10))
+        self.assertEqual(leaderboard.rank_for(User.objects.create_user('unranked')), (None, 0))
+
+    def test_ties_share_a_rank_and_list_by_join_order(self):
+        for user in self.users:
+            leaderboard.record_score(user, 10)
+        leaderboard.record_score(self.users[2], 30)
+        self.assertEqual([e.user.username for e in leaderboard.top(3)], ['cat', 'ann', 'ben'])
+        self.assertEqual([leaderboard.rank_for(user)[0] for user in self.users], [2, 2, 1])
+
+    def test_rebuild_matches_incremental_state(self):
+        from io import StringIO
+        from django.core.management import call_command
+
+        self.earn()
+        incremental = self.entries()
+        self.assertEqual(incremental, {'ann': 10, 'ben': 20, 'cat': 15})
+        LeaderboardEntry.objects.update(score=0)
+
+        self.assertEqual(leaderboard.rebuild(), 3)
+        self.assertEqual(self.entries(), incremental)
+        self.assertEqual(leaderboard.rebuild(from_events=True), 3)
+        self.assertEqual(self.entries(), incremental)
+        out = StringIO()
+        call_command('rebuild_leaderboard', stdout=out)
+        self.assertIn("3 learners ranked", out.getvalue())
+        self.assertEqual(self.entries(), incremental)
+
+
+class CompleteGoalTests(TestCase):
+    def setUp(self):
+        cache.clear()  # catalog snapshot from earlier tests (their bumps never commit)
+        self.user = User.objects.create_user('learner', password='pw')
+        Profile.objects.create(user=self.user)
+        self.subject = Subject.objects.create(name="Logic")
+        self.goal = Goal.objects.create(subject=self.subject, description="Spot a fallacy", points=10)
+        PracticalChallenge.objects.create(goal=self.goal, instruction="Make an h1", validation_text="<h1>")
+
+    def test_repeat_completion_awards_xp_once(self):
+        first = complete_goal(self.user, self.goal, 'goal')
+        second = complete_goal(self.user, self.goal, 'goal')
+        self.assertTrue(first.created)
+        self.assertFalse(second.created)
+        self.assertIsNone(second.certificate)
+        self.assertEqual(Profile.objects.get(user=self.user).total_score, 10)
+
+    def test_resubmitting_code_lab_does_not_inflate_score(self):
+        self.client.force_login(self.user)
+        challenge = self.goal.practicalchallenge
+        for _ in range(3):
+            self.client.post(reverse('verify_practical', args=[challenge.id]), {'code_submission': "<h1>Hi</h1>"})
+        self.assertEqual(Profile.objects.get(user=self.user).total_score, 10)
+        self.assertEqual(XPEvent.objects.filter(user=self.user).count(), 1)
+
+
+class ProgressIndexTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('indexed', password='pw')
+        Profile.objects.create(user=self.user)
+        self.subject = Subject.objects.create(name="Logic")
+        # Three goals: finishing the subject would start a certificate render in the background
+        self.goals = [Goal.objects.create(subject=self.subject, description=f"Goal {n}", points=5) for n in range(3)]
+        with self.captureOnCommitCallbacks(execute=True):
+            complete_goal(self.user, self.goals[0], 'goal')
+
+    def test_miss_then_hit(self):
+        with self.assertNumQueries(1):
+            self.assertEqual(ProgressIndex(self.user).completed_ids(self.subject.id), {self.goals[0].id})
+        # Another request: served from the cache
+        with self.assertNumQueries(0):
+            index = ProgressIndex(self.user)
+            self.assertTrue(index.is_completed(self.goals[0]))
+            self.assertFalse(index.is_completed(self.goals[1]))
+
+    def test_invalidated_on_commit(self):
+        ProgressIndex(self.user).completed_ids(self.subject.id)
+        with self.captureOnCommitCallbacks() as callbacks:
+            complete_goal(self.user, self.goals[1], 'goal')
+            # Not before the commit: a concurrent request would cache the old set under the new version
+            self.assertEqual(ProgressIndex(self.user).completed_count(self.subject.id), 1)
+        for callback in callbacks:
+            callback()
+        self.assertEqual(ProgressIndex(self.user).completed_ids(self.subject.id), {g.id for g in self.goals[:2]})
+
+        with self.captureOnCommitCallbacks(execute=True):
+            UserProgress.objects.filter(goal=self.goals[0]).delete()
+        self.assertEqual(ProgressIndex(self.user).completed_ids(self.subject.id), {self.goals[1].id})
+
+
+class SubjectProgressCounterTests(TestCase):
+    def setUp(self):
+        self.alice = User.objects.create_user('alice')
+        self.bob = User.objects.create_user('bob')
+        self.logic = Subject.objects.create(name="Logic")
+        self.design = Subject.objects.create(name="Design")
+        self.goals = [Goal.objects.create(subject=self.logic, description=f"Goal {n}", points=5) for n in range(3)]
+        self.layout = Goal.objects.create(subject=self.design, description="Layout", points=5)
+
+    def complete(self, user, goal):
+        return UserProgress.objects.create(user=user, goal=goal, is_completed=True)
+
+    def assertCounters(self, expected):
+        # (user, subject) -> (completed, total), kept by the signals; recount() must agree
+        def counters():
+            return {(p.user.username, p.subject.name): (p.completed, p.total)
+                    for p in SubjectProgress.objects.select_related('user', 'subject') if p.completed}
+        self.assertEqual(counters(), expected)
+        progress.recount()
+        self.assertEqual(counters(), expected)
+
+    def test_complete_and_uncomplete(self):
+        first = self.complete(self.alice, self.goals[0])
+        self.complete(self.alice, self.goals[1])
+        self.complete(self.bob, self.layout)
+        self.assertCounters({('alice', 'Logic'): (2, 3), ('bob', 'Design'): (1, 1)})
+
+        first.delete()
+        self.assertCounters({('alice', 'Logic'): (1, 3), ('bob', 'Design'): (1, 1)})
+
+    def test_goal_added_and_deleted(self):
+        self.complete(self.alice, self.goals[0])
+        self.complete(self.alice, self.goals[1])
+        self.goals[2].delete()
+        self.assertCounters({('alice', 'Logic'): (2, 2)})
+
+        # Deleting a completed goal cascades to its progress row
+        self.goals[1].delete()
+        self.assertCounters({('alice', 'Logic'): (1, 1)})
+
+        Goal.objects.create(subject=self.logic, description="New goal", points=5)
+        self.assertCounters({('alice', 'Logic'): (1, 2)})
+
+    def test_cascading_deletes(self):
+        self.complete(self.alice, self.goals[0])
+        self.complete(self.alice, self.layout)
+        self.complete(self.bob, self.goals[0])
+        self.bob.delete()
+        self.assertCounters({('alice', 'Logic'): (1, 3), ('alice', 'Design'): (1, 1)})
+
+        self.logic.delete()
+        self.assertCounters({('alice', 'Design'): (1, 1)})
+        self.assertEqual(SubjectProgress.objects.count(), 1)
+
+
+class CertificateRenderTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('graduate', password='pw')
+        subject = Subject.objects.create(name="Logic")
+        with self.captureOnCommitCallbacks():
+            self.cert = certificates.issue_certificate(self.user, subject)
+
+    def test_failed_render_is_retried_with_backoff(self):
+        job = self.cert.render_job
+        with mock.patch.object(certificates, 'render_certificate_bytes', side_effect=OSError("font missing")), \
+                mock.patch.object(certificates.threading, 'Timer') as timer, self.assertLogs('base.certificates'):
+            for _ in range(certificates.MAX_ATTEMPTS):
+                self.assertFalse(certificates.render_job(job.id))
+        self.assertEqual([c.args[:2] for c in timer.call_args_list],
+                         [(5, certificates.submit), (10, certificates.submit)])
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), ('failed', 3))
+
+        self.client.force_login(self.user)
+        response = self.client.get(reverse('certificate', args=[self.cert.id]))
+        self.assertTrue(response.context['render_failed'])
+        self.assertNotContains(response, "window.location.reload")
+
+    def test_static_layer_and_fonts_are_built_once(self):
+        utils.clear_render_cache()
+        self.addCleanup(utils.clear_render_cache)
+        utils.generate_certificate_image('alice', 'Logic', 'Jan 01, 2026')
+        layer, fonts = utils._static_layer(), {size: utils._load_font(size) for size in (25, 40, 60)}
+        with mock.patch.object(utils.ImageFont, 'truetype') as truetype, \
+                mock.patch.object(utils.Image, 'new') as new_image:
+            utils.generate_certificate_image('bob', 'Design', 'Feb 02, 2026')
+        truetype.assert_not_called()
+        new_image.assert_not_called()
+        self.assertIs(utils._static_layer(), layer)
+        for size, font in fonts.items():
+            self.assertIs(utils._load_font(size), font)
+
+    def test_png_and_webp_output_decode(self):
+        for image_format, optimize in [('PNG', False), ('PNG', True), ('WEBP', False), ('WEBP', True)]:
+            data = utils.generate_certificate_image('alice', 'Logic', 'Jan 01, 2026', image_format, optimize).read()
+            with Image.open(BytesIO(data)) as img:
+                img.load()
+                self.assertEqual((img.format, img.size), (image_format, (utils.CERT_WIDTH, utils.CERT_HEIGHT)))
+
+
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp())
+class IssueCertificatesCommandTests(TestCase):
+    def setUp(self):
+        subject = Subject.objects.create(name="Logic")
+        goal = Goal.objects.create(subject=subject, description="Only goal", points=5)
+        self.users = [User.objects.create_user(f'graduate{n}') for n in range(2)]
+        for user in self.users:
+            UserProgress.objects.create(user=user, goal=goal, is_completed=True)
+        self.pairs = [(user.id, subject.id) for user in self.users]
+
+    def issue(self, *args):
+        from io import StringIO
+        from django.core.management import call_command
+
+        out = StringIO()
+        call_command('issue_certificates', '--workers=1', *args, stdout=out)
+        return out.getvalue()
+
+    def assertAllRendered(self):
+        self.assertEqual(Certificate.objects.count(), 2)
+        self.assertTrue(all(cert.is_ready for cert in Certificate.objects.all()))
+        self.assertEqual(set(CertificateRenderJob.objects.values_list('status', flat=True)), {'done'})
+
+    def test_dry_run_issues_nothing(self):
+        self.assertIn("2 completed course(s) without a certificate", self.issue('--dry-run'))
+        self.assertFalse(Certificate.objects.exists())
+
+    def test_issue_then_rerun_is_a_no_op(self):
+        self.assertIn("Issued 2 certificate image(s), 0 failed", self.issue())
+        self.assertAllRendered()
+        out = self.issue()
+        self.assertIn("0 completed course(s)", out)
+        self.assertIn("Nothing to render", out)
+        self.assertEqual(Certificate.objects.count(), 2)
+
+    def test_resumes_an_interrupted_run(self):
+        # Killed after recording the certificates, while rendering the first one
+        certificates.create_pending_certificates(self.pairs)
+        CertificateRenderJob.objects.filter(id=CertificateRenderJob.objects.first().id).update(
+            status='running', updated_at=datetime.datetime(2026, 1, 1, tzinfo=datetime.timezone.utc))
+        out = self.issue()
+        self.assertIn("0 completed course(s)", out)
+        self.assertIn("Rendering 2 certificate(s)", out)
+        self.assertAllRendered()
+
+    def test_pairs_issued_meanwhile_are_skipped(self):
+        with mock.patch.object(certificates, 'find_missing_certificates', return_value=self.pairs):
+            with self.captureOnCommitCallbacks():
+                # A learner's own completion gets there first
+                certificates.issue_certificate(self.users[0], Subject.objects.get())
+            out = self.issue()
+        self.assertIn("1 were issued meanwhile, skipped", out)
+        self.assertAllRendered()
+
+
+class JournalPaginationTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('writer', password='pw')
+        day = datetime.date(2026, 1, 1)
+        for i in range(25):
+            JournalEntry.objects.create(
+                user=self.user, title=f"Entry {i}", description="...",
+                date=day - datetime.timedelta(days=i // 4),
+                start_time=datetime.time(8 + i % 2), end_time=datetime.time(10),
+            )
+
+    def test_pages_cover_timeline_in_order_without_overlap(self):
+        expected = list(JournalEntry.objects.filter(user=self.user).order_by(*journal.TIMELINE_ORDER))
+        seen, cursor = [], None
+        while True:
+            page, cursor = journal.entries_page(self.user, cursor=cursor, limit=7)
+            seen.extend(page)
+            if cursor is None:
+                break
+        self.assertEqual(seen, expected)
+
+    def test_endpoint_respects_date_window(self):
+        self.client.force_login(self.user)
+        response = self.client.get(reverse('journal'), {'start': '2025-12-31', 'end': '2026-01-01'})
+        self.assertEqual({e.date for e in response.context['entries']},
+                         {datetime.date(2025, 12, 31), datetime.date(2026, 1, 1)})
+        response = self.client.get(reverse('journal_entries'), {'cursor': 'not-a-cursor'})
+        self.assertEqual(response.status_code, 400)
+
+
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp(), IMAGE_UPLOAD_MAX_BYTES=200 * 1024,
+                   IMAGE_UPLOAD_MAX_DIMENSION=800)
+class ImageUploadTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        # Pages showing an upload queue its derivatives; don't run them against the test database
+        patcher = mock.patch('base.images.submit')
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.user = User.objects.create_user('uploader', password='pw')
+        self.client.force_login(self.user)
+
+    def post_entry(self, upload):
+        return self.client.post(reverse('journal'), {
+            'title': "Photo", 'description': "...", 'date': '2026-01-01',
+            'start_time': '08:00', 'end_time': '09:00', 'image': upload,
+        }, follow=True)
+
+    def jpeg(self, size, noise=False):
+        image = Image.effect_noise(size, 64).convert('RGB') if noise else Image.new('RGB', size, 'white')
+        buffer = BytesIO()
+        image.save(buffer, format='JPEG')
+        return SimpleUploadedFile('photo.jpg', buffer.getvalue(), content_type='image/jpeg')
+
+    def test_large_image_is_downsampled(self):
+        self.post_entry(self.jpeg((3000, 1500)))
+        entry = JournalEntry.objects.get(user=self.user)
+        with Image.open(entry.image) as stored:
+            self.assertEqual(stored.size, (800, 400))
+
+    def test_derivatives_are_never_built_in_the_request(self):
+        with mock.patch('base.images.submit') as submit:
+            response = self.post_entry(self.jpeg((400, 200)))
+        entry = JournalEntry.objects.get(user=self.user)
+        # Not ready yet: the page shows the upload and queues one background job
+        self.assertContains(response, f'src="{entry.image.url}"')
+        submit.assert_called_once_with(images.build_derivatives, entry.image.name)
+        self.assertIsNone(images.derivatives_for(entry.image))
+
+        images.generate_derivatives(entry.image.name)
+        self.assertEqual(sorted(images.derivatives_for(entry.image)['webp']), [160, 320, 400])
+
+    def test_navbar_avatar_switches_to_the_thumbnail_when_ready(self):
+        profile = Profile.objects.create(user=self.user)
+        profile.profile_pic.save('me.jpg', self.jpeg((400, 400)))
+        response = self.client.get(reverse('home'))
+        self.assertContains(response, f'src="{profile.profile_pic.url}"')  # cached with the navbar
+
+        images.build_derivatives(profile.profile_pic.name)
+        response = self.client.get(reverse('home'))
+        self.assertNotContains(response, f'src="{profile.profile_pic.url}"')
+        self.assertContains(response, '_160.webp')
+
+    def test_phone_mpo_jpeg_is_accepted(self):
+        buffer = BytesIO()
+        Image.new('RGB', (40, 30), 'red').save(buffer, format='MPO', save_all=True,
+                                               append_images=[Image.new('RGB', (40, 30), 'blue')])
+        stored = uploads.process_image(SimpleUploadedFile('phone.jpg', buffer.getvalue(), content_type='image/jpeg'))
+        with Image.open(stored) as image:
+            self.assertEqual((image.format, image.size), ('JPEG', (40, 30)))
+
+    def test_metadata_is_stripped_from_small_uploads(self):
+        exif = Image.Exif()
+        exif[0x010F] = "PhoneMaker"  # Make
+        exif[0x8825] = {2: (52.0, 31.0, 0.0)}  # GPSInfo
+        buffer = BytesIO()
+        Image.new('RGB', (40, 30), 'white').save(buffer, format='JPEG', exif=exif)
+        stored = uploads.process_image(SimpleUploadedFile('small.jpg', buffer.getvalue(), content_type='image/jpeg'))
+        with Image.open(stored) as image:
+            self.assertEqual(image.size, (40, 30))
+            self.assertEqual(dict(image.getexif()), {})
+
+    def test_oversize_file_is_rejected_mid_stream(self):
+        response = self.post_entry(self.jpeg((1000, 1000), noise=True))
+        self.assertFalse(JournalEntry.objects.exists())
+        self.assertContains(response, "Image is too large")
+
+    def test_non_image_is_rejected(self):
+        fake = SimpleUploadedFile('notes.jpg', b"not an image", content_type='image/jpeg')
+        with self.assertRaises(uploads.UploadRejected):
+            uploads.process_image(fake)
+
+    def test_pixel_limit_checked_from_header(self):
+        with override_settings(IMAGE_UPLOAD_MAX_PIXELS=100):
+            with self.assertRaisesMessage(uploads.UploadRejected, "20x20 pixels"):
+                uploads.process_image(self.jpeg((20, 20)))
+
+    def test_full_decode_formats_get_the_lower_pixel_limit(self):
+        buffer = BytesIO()
+        Image.new('RGB', (20, 20), 'white').save(buffer, format='PNG')
+        png = SimpleUploadedFile('drawing.png', buffer.getvalue(), content_type='image/png')
+        with override_settings(IMAGE_UPLOAD_MAX_FULL_DECODE_PIXELS=100):
+            with self.assertRaisesMessage(uploads.UploadRejected, "20x20 pixels"):
+                uploads.process_image(png)
+            # JPEGs are decoded at reduced scale: only the overall limit applies
+            self.assertTrue(uploads.process_image(self.jpeg((20, 20))))
+
+
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp())
+class ContentAddressedStorageTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('collector', password='pw')
+
+    def entry(self, data):
+        entry = JournalEntry(user=self.user, title="Photo", description="...", date='2026-01-01',
+                             start_time='08:00', end_time='09:00')
+        entry.image.save('photo.jpg', ContentFile(data))
+        return entry
+
+    def test_identical_uploads_share_one_blob(self):
+        first, second = self.entry(b"same bytes"), self.entry(b"same bytes")
+        self.assertEqual(first.image.name, second.image.name)
+        self.assertTrue(first.image.name.startswith('blobs/'))
+        self.assertNotEqual(self.entry(b"other bytes").image.name, first.image.name)
+
+    def test_gc_only_collects_unreferenced_blobs(self):
+        entry = self.entry(b"old photo")
+        old_name = entry.image.name
+        entry.image.save('new.jpg', ContentFile(b"new photo"))
+        self.assertEqual(list(orphaned_blobs(default_storage, min_age=0)), [old_name])
+        # Too young to collect yet
+        self.assertEqual(list(orphaned_blobs(default_storage, min_age=3600)), [])
+
+    def test_reused_blob_is_not_collected(self):
+        entry = self.entry(b"old photo")
+        old_name = entry.image.name
+        entry.image.save('new.jpg', ContentFile(b"new photo"))
+        os.utime(default_storage.path(old_name), (0, 0))  # an orphan for ages
+        self.assertEqual(list(orphaned_blobs(default_storage, min_age=3600)), [old_name])
+        # Uploaded again by a row that isn't committed yet
+        self.assertEqual(self.entry(b"old photo").image.name, old_name)
+        self.assertEqual(list(orphaned_blobs(default_storage, min_age=3600)), [])
+
+
+class DashboardFragmentTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('dash', password='pw')
+        Profile.objects.create(user=self.user)
+        self.subject = Subject.objects.create(name="Web Development")
+        self.goal = Goal.objects.create(subject=self.subject, description="Goal", points=10)
+        Goal.objects.create(subject=self.subject, description="Another goal", points=10)
+        self.client.force_login(self.user)
+
+    def app_queries(self):
+        # Queries besides the session/user lookups done by the auth middleware
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(reverse('home'))
+        self.assertEqual(response.status_code, 200)
+        return response, [q['sql'] for q in ctx.captured_queries
+                          if '"django_session"' not in q['sql'] and 'FROM "auth_user"' not in q['sql']]
+
+    def test_warm_dashboard_runs_no_queries(self):
+        _, cold = self.app_queries()
+        self.assertTrue(cold)
+        _, queries = self.app_queries()
+        self.assertEqual(queries, [])
+
+    def test_completion_and_catalog_changes_invalidate(self):
+        self.app_queries()
+        with self.captureOnCommitCallbacks(execute=True):
+            complete_goal(self.user, self.goal, 'goal')
+        with self.captureOnCommitCallbacks(execute=True):
+            Subject.objects.create(name="Data Science")
+        response, _ = self.app_queries()
+        self.assertContains(response, "10 XP")
+        self.assertContains(response, "Data Science")
+
+
+class ProfileMiddlewareTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('member', password='pw')
+        self.client.force_login(self.user)
+
+    def profile_queries(self, url):
+        with CaptureQueriesContext(connection) as ctx:
+            self.client.get(url)
+        return [q['sql'] for q in ctx.captured_queries if 'FROM "base_profile"' in q['sql']]
+
+    def test_profile_created_once_then_served_from_cache(self):
+        self.profile_queries(reverse('journal'))
+        self.assertTrue(Profile.objects.filter(user=self.user).exists())
+        self.assertEqual(self.profile_queries(reverse('journal')), [])
+
+    def test_profile_edit_is_visible_on_next_request(self):
+        self.client.get(reverse('profile'))
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse('profile'), {'username': 'member', 'email': 'm@example.com', 'bio': "Hello there"})
+        self.assertContains(self.client.get(reverse('profile')), "Hello there")
+
+
+class CatalogSnapshotTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.subject = Subject.objects.create(name="Web Development")
+        goal = Goal.objects.create(subject=self.subject, description="Quiz goal", points=10)
+        Question.objects.create(goal=goal, question_text="?", option_1="a", option_2="b",
+                                option_3="c", option_4="d", correct_option='1')
+
+    def test_warm_snapshot_runs_no_queries(self):
+        catalog.snapshot()
+        catalog._local.update(version=None, snapshot=None)  # another worker: shared cache only
+        with self.assertNumQueries(0):
+            goal = catalog.goals(self.subject.id)[0]
+            self.assertTrue(goal.has_quiz)
+            self.assertEqual(len(goal.questions.all()), 1)
+            self.assertEqual(goal.subject.name, "Web Development")
+
+    def test_catalog_save_bumps_version(self):
+        catalog.snapshot()
+        with self.captureOnCommitCallbacks(execute=True):
+            Goal.objects.create(subject=self.subject, description="New goal", points=5)
+        self.assertEqual(len(catalog.goals(self.subject.id)), 2)
+
+
+@override_settings(EMBED_ORIGIN='https://studybuddy.example')
+class EmbedUrlTests(TestCase):
+    def test_resolvers(self):
+        cases = {
+            ('https://www.youtube.com/watch?v=k_K9TMJ-Y6w&t=10', 'video'):
+                'https://www.youtube.com/embed/k_K9TMJ-Y6w?rel=0&modestbranding=1&origin=https://studybuddy.example',
+            ('https://youtu.be/k_K9TMJ-Y6w', 'video'):
+                'https://www.youtube.com/embed/k_K9TMJ-Y6w?rel=0&modestbranding=1&origin=https://studybuddy.example',
+            ('https://www.youtube.com/playlist?list=PL4-IK0AVrVj', 'video'):
+                'https://www.youtube.com/embed/videoseries?list=PL4-IK0AVrVj&rel=0&modestbranding=1&origin=https://studybuddy.example',
+            ('https://vimeo.com/76979871', 'video'): 'https://player.vimeo.com/video/76979871',
+            ('https://drive.google.com/file/d/abc/view?usp=sharing', 'pdf'):
+                'https://drive.google.com/file/d/abc/preview?usp=sharing',
+            ('https://example.com/notes.pdf', 'pdf'): 'https://example.com/notes.pdf',
+            ('https://developer.mozilla.org/en-US/docs/Web/HTML', 'article'):
+                'https://developer.mozilla.org/en-US/docs/Web/HTML',
+        }
+        for (link, content_type), expected in cases.items():
+            self.assertEqual(embeds.resolve(link, content_type), expected)
+
+    @override_settings(EMBED_PDF_VIEWER=True)
+    def test_pdf_viewer_is_opt_in(self):
+        self.assertEqual(embeds.resolve('https://example.com/notes.pdf', 'pdf'),
+                         'https://docs.google.com/viewer?url=https%3A%2F%2Fexample.com%2Fnotes.pdf&embedded=true')
+
+    def test_embed_url_stored_on_save(self):
+        subject = Subject.objects.create(name="Web Development")
+        material = Material.objects.create(subject=subject, title="HTML", content_type='video',
+                                           link='https://youtu.be/k_K9TMJ-Y6w')
+        self.assertTrue(Material.objects.get(id=material.id).embed_url.startswith('https://www.youtube.com/embed/'))
+
+
+class QuizGradingTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('quizzer', password='pw')
+        Profile.objects.create(user=self.user)
+        subject = Subject.objects.create(name="Logic")
+        self.goal = Goal.objects.create(subject=subject, description="Quiz", points=10)
+        Goal.objects.create(subject=subject, description="Plain goal", points=10)
+        self.questions = [
+            Question.objects.create(goal=self.goal, question_text=f"Q{i}", option_1="a", option_2="b",
+                                    option_3="c", option_4="d", correct_option=str(i))
+            for i in (1, 2, 3)
+        ]
+
+    def tearDown(self):
+        discard_buffered_attempts()
+
+    def test_feedback_per_question(self):
+        key = grading.answer_key(self.goal.id)
+        result = grading.grade(key, {'question_%d' % self.questions[0].id: '1',
+                                     'question_%d' % self.questions[1].id: '4'})
+        self.assertEqual((result.score, result.total, result.passed), (1, 3, False))
+        self.assertEqual(result.wrong_numbers, [2, 3])
+        self.assertEqual([(f.given, f.correct_option) for f in result.feedback],
+                         [('1', '1'), ('4', '2'), (None, '3')])
+
+    def test_batch_matches_single_grading(self):
+        perfect = {f'question_{q.id}': q.correct_option for q in self.questions}
+        results = list(grading.grade_batch([(self.goal.id, perfect), (self.goal.id, {})]))
+        self.assertEqual([r.score for r in results], [3, 0])
+
+    def test_grade_submissions_command(self):
+        from io import StringIO
+        from django.core.management import call_command
+        from django.core.management.base import CommandError
+
+        perfect = {f'question_{q.id}': q.correct_option for q in self.questions}
+        good = json.dumps({'goal': self.goal.id, 'answers': perfect, 'student': 7})
+        with tempfile.NamedTemporaryFile('w', suffix='.ndjson', delete=False) as f:
+            f.write(good + '\n\n' + json.dumps({'goal': self.goal.id}) + '\n')
+        out = StringIO()
+        with self.assertRaisesMessage(CommandError, "line 3: 'answers' must be an object"):
+            call_command('grade_submissions', f.name, stdout=out, stderr=StringIO())
+        self.assertEqual(json.loads(out.getvalue())['student'], 7)
+
+        with open(f.name, 'w') as f:
+            f.write(json.dumps({'goal': 999999, 'answers': {}}) + '\n')
+        with self.assertRaisesMessage(CommandError, "line 1: no goal with id 999999"):
+            call_command('grade_submissions', f.name, stdout=StringIO(), stderr=StringIO())
+        os.unlink(f.name)
+
+    def test_question_edit_changes_key(self):
+        grading.answer_key(self.goal.id)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.questions[0].correct_option = '4'
+            self.questions[0].save()
+        self.assertEqual(grading.answer_key(self.goal.id).answers[0], '4')
+
+    def test_attempts_are_buffered_then_written_with_stats(self):
+        self.client.force_login(self.user)
+        url = reverse('submit_quiz', args=[self.goal.subject_id, self.goal.id])
+        key = grading.answer_key(self.goal.id)
+        with self.assertNumQueries(0):
+            for _ in range(3):
+                attempts.record_attempt(self.user, grading.grade(key, {f'question_{self.questions[0].id}': '1'}))
+        self.client.post(url, {f'question_{q.id}': q.correct_option for q in self.questions})
+        self.assertEqual(attempts.flush(), 4)
+        self.assertEqual(QuizAttempt.objects.filter(passed=True).count(), 1)
+        stats = {s.question_id: (s.attempts, s.correct) for s in QuestionStats.objects.all()}
+        self.assertEqual(stats[self.questions[0].id], (4, 4))
+        self.assertEqual(stats[self.questions[1].id], (4, 1))
+
+    def test_invalid_answers_count_as_unanswered(self):
+        key = grading.answer_key(self.goal.id)
+        result = grading.grade(key, {f'question_{self.questions[0].id}': 'hello',
+                                     f'question_{self.questions[1].id}': '2'})
+        self.assertEqual(result.given, (None, '2', None))
+        attempts.record_attempt(self.user, result)
+        attempts.flush()
+        self.assertEqual(sorted(QuizAttempt.objects.get().answers.values_list('given', flat=True)), ['', '', '2'])
+
+    def test_bad_row_does_not_drop_the_batch(self):
+        other = User.objects.create_user('other', password='pw')
+        key = grading.answer_key(self.goal.id)
+        for user in (self.user, other, self.user):
+            attempts.record_attempt(user, grading.grade(key, {}))
+        write = attempts.write
+
+        def failing_write(rows):
+            if any(row[0] == other.id for row in rows):
+                raise DatabaseError("value too long")
+            return write(rows)
+
+        with mock.patch.object(attempts, 'write', failing_write), self.assertLogs('base.attempts', 'ERROR'):
+            attempts.flush()
+        self.assertEqual(QuizAttempt.objects.filter(user=self.user).count(), 2)
+        self.assertFalse(QuizAttempt.objects.filter(user=other).exists())
+
+    def test_submit_quiz_view(self):
+        self.client.force_login(self.user)
+        url = reverse('submit_quiz', args=[self.goal.subject_id, self.goal.id])
+        response = self.client.post(url, {f'question_{q.id}': '1' for q in self.questions}, follow=True)
+        self.assertContains(response, "Check question(s) 2, 3")
+        self.client.post(url, {f'question_{q.id}': q.correct_option for q in self.questions})
+        self.assertEqual(Profile.objects.get(user=self.user).total_score, 10)
+
+
+@override_settings(VALIDATOR_WORKERS=0)
+class PracticalValidatorTests(TestCase):
+    PAGE = """<style>.card h1 { color: red } #title { color: rgb(0, 0, 255) } ul { font-weight: bold }</style>
+    <div class="card"><h1 id="title">Hello <b>World</b></h1>
+    <ul><li>One<li>Two<li>Three</ul><a class="nav" href="#top">Top</a><img src="cat.png" alt="A cat"></div>"""
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('coder', password='pw')
+        subject = Subject.objects.create(name="Web Development")
+        self.goal = Goal.objects.create(subject=subject, description="Style a heading", points=10)
+        Goal.objects.create(subject=subject, description="Something else", points=10)
+        self.challenge = PracticalChallenge.objects.create(
+            goal=self.goal, instruction="Make a blue h1", validation_text="h1",
+            rules=[{"selector": ".card > h1", "style": {"color": "blue"}},
+                   {"selector": "ul li", "min": 3, "message": "Add three list items"}],
+        )
+
+    def check(self, rules, page=PAGE):
+        return validator.run_checks(validator.compile_rules(rules), page)
+
+    def test_selectors_and_attributes(self):
+        self.assertEqual(self.check([
+            {"selector": "ul > li", "count": 3},
+            {"selector": "div.card h1#title b"},
+            {"selector": "img[alt='A cat']"},
+            {"selector": "a.nav", "attr": "href", "equals": "#top"},
+            {"selector": "h1", "text": "hello world"},
+            {"selector": "p, section", "count": 0},
+        ]), [])
+        self.assertEqual(len(self.check([{"selector": "ol li"}, {"selector": "img", "attr": "title"}])), 2)
+
+    def test_computed_style_cascade(self):
+        # #id beats .class, inline beats both, color and font-weight are inherited
+        self.assertEqual(self.check([
+            {"selector": "h1", "style": {"color": "#00f"}},
+            {"selector": "h1 b", "style": {"color": "blue"}},
+            {"selector": "li", "style": {"font-weight": "bold"}, "all": True},
+        ]), [])
+        self.assertEqual(self.check([{"selector": "h1", "style": {"color": "red"}}]), ["h1 should have color: #ff0000"])
+        page = self.PAGE.replace('<h1 id="title">', '<h1 id="title" style="color: red">')
+        self.assertEqual(self.check([{"selector": "h1", "style": {"color": "red"}}], page), [])
+
+    def test_invalid_rules_rejected_by_admin_validation(self):
+        from django.core.exceptions import ValidationError
+        for rules in ([{"selector": "div:hover"}], [{"selector": "li", "min": "3"}], [{"selector": "li", "max": -1}],
+                      [{"selector": "h1", "text": 5}]):
+            self.challenge.rules = rules
+            with self.assertRaises(ValidationError):
+                self.challenge.full_clean()
+
+    def test_misconfigured_challenge_is_reported(self):
+        # Saved without clean(), e.g. by a script
+        PracticalChallenge.objects.filter(id=self.challenge.id).update(rules=[{"selector": "li", "min": "3"}])
+        cache.clear()
+        self.client.login(username='coder', password='pw')
+        with self.assertLogs('base.validator', 'ERROR'):
+            response = self.client.post(reverse('verify_practical', args=[self.challenge.id]),
+                                        {'code_submission': self.PAGE})
+        self.assertContains(response, "This challenge is misconfigured")
+
+    def test_verify_code_shows_failures(self):
+        self.client.login(username='coder', password='pw')
+        url = reverse('verify_practical', args=[self.challenge.id])
+
+        response = self.client.post(url, {'code_submission': '<div class="card"><h1>Hi</h1></div>'})
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, "Add three list items")
+        self.assertFalse(UserProgress.objects.filter(user=self.user, goal=self.goal).exists())
+
+        response = self.client.post(url, {'code_submission': self.PAGE.replace('.card h1 { color: red }', '')})
+        self.assertRedirects(response, reverse('subject', args=[self.goal.subject_id]))
+        self.assertTrue(UserProgress.objects.filter(user=self.user, goal=self.goal).exists())
+
+    @override_settings(VALIDATOR_WORKERS=1, VALIDATOR_CPU_SECONDS=1)
+    def test_worker_pool(self):
+        try:
+            self.assertTrue(validator.validate(self.challenge, self.PAGE.replace('.card h1 { color: red }', '')).passed)
+            too_big = validator.validate(self.challenge, 'x' * (validator.MAX_SUBMISSION_BYTES + 1))
+            self.assertIsNotNone(too_big.error)
+        finally:
+            validator._reset_pool()
+
+
+class CatalogImportTests(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def document(self, goals=("Semantic HTML", "Flexbox")):
+        return {'subjects': [{
+            'name': "Web Development", 'description': "HTML, CSS, JS",
+            'materials': [{'title': "HTML course", 'content_type': 'video', 'link': "https://youtu.be/k_K9TMJ-Y6w"}],
+            'goals': [{'description': description, 'points': 10,
+                       'questions': [{'text': "Which tag?", 'options': ["div", "main", "b", "i"], 'answer': 2}]}
+                      for description in goals],
+        }]}
+
+    def test_import_is_idempotent(self):
+        report = catalog_import.import_catalog(self.document())
+        self.assertEqual(report.counts['Goal', 'created'], 2)
+        self.assertEqual(report.counts['Question', 'created'], 2)
+        material = Material.objects.get()
+        self.assertTrue(material.embed_url.startswith('https://www.youtube.com/embed/'))
+
+        with self.assertNumQueries(7):  # reads only, nothing to write
+            report = catalog_import.import_catalog(self.document())
+        self.assertFalse(report.changed)
+        self.assertEqual(Goal.objects.count(), 2)
+
+    def test_updates_and_prune(self):
+        catalog_import.import_catalog(self.document())
+        user = User.objects.create_user('learner', password='pw')
+        complete_goal(user, Goal.objects.get(description="Semantic HTML"), 'goal')
+
+        document = self.document(goals=("Semantic HTML", "Grid"))
+        document['subjects'][0]['goals'][0]['points'] = 20
+        with self.captureOnCommitCallbacks(execute=True):
+            report = catalog_import.import_catalog(document, prune=True)
+        self.assertEqual((report.counts['Goal', 'updated'], report.counts['Goal', 'created'],
+                          report.counts['Goal', 'deleted']), (1, 1, 1))
+        self.assertEqual(sorted(Goal.objects.values_list('description', 'points')),
+                         [("Grid", 10), ("Semantic HTML", 20)])
+        self.assertEqual(SubjectProgress.objects.get(user=user).total, 2)
+        self.assertEqual(len(catalog.goals(Subject.objects.get().id)), 2)
+
+    def test_dry_run_and_invalid_files(self):
+        report = catalog_import.import_catalog(self.document(), dry_run=True)
+        self.assertEqual(report.counts['Subject', 'created'], 1)
+        self.assertFalse(Subject.objects.exists())
+
+        document = self.document(goals=("Flexbox", "Flexbox"))
+        with self.assertRaises(catalog_import.CatalogError):
+            catalog_import.import_catalog(document)
+        document = self.document()
+        document['subjects'][0]['materials'][0]['content_type'] = 'podcast'
+        with self.assertRaises(catalog_import.CatalogError):
+            catalog_import.import_catalog(document)
+        for points in ("ten", -5, 2.5, None, True):
+            document = self.document()
+            document['subjects'][0]['goals'][0]['points'] = points
+            with self.assertRaisesMessage(catalog_import.CatalogError, "'points' must be a whole number"):
+                catalog_import.import_catalog(document)
+
+
+class DataTransferTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('mover', password='pw')
+        Profile.objects.create(user=self.user, bio="Hi")
+        subject = Subject.objects.create(name="Web Development")
+        goals = [Goal.objects.create(subject=subject, description=f"Goal {n}", points=10) for n in range(3)]
+        Question.objects.create(goal=goals[0], question_text="?", option_1="a", option_2="b",
+                                option_3="c", option_4="d", correct_option='1')
+        complete_goal(self.user, goals[0], 'goal')
+        JournalEntry.objects.create(user=self.user, title="Day 1", description="HTML", date=datetime.date(2026, 1, 2),
+                                    start_time=datetime.time(9), end_time=datetime.time(10))
+
+    def dump(self):
+        from io import StringIO
+        stream = StringIO()
+        transfer.write_ndjson(itertools.chain(transfer.export_catalog(), transfer.export_progress()), stream)
+        stream.seek(0)
+        return stream
+
+    def test_round_trip(self):
+        dump = self.dump()
+        completed_at = UserProgress.objects.get().date_completed
+        created_at = JournalEntry.objects.get().created_at
+        User.objects.all().delete()
+        Subject.objects.all().delete()
+
+        counts = transfer.import_ndjson(dump, batch_size=2)
+        self.assertEqual((counts['subject'], counts['goal'], counts['question']), (1, 3, 1))
+        self.assertEqual((counts['user'], counts['profile'], counts['progress'], counts['journal']), (1, 1, 1, 1))
+
+        user = User.objects.get(username='mover')
+        self.assertTrue(user.check_password('pw'))
+        self.assertEqual(user.profile.total_score, 10)
+        self.assertEqual(UserProgress.objects.get(user=user).date_completed, completed_at)
+        self.assertEqual(JournalEntry.objects.get(user=user).created_at, created_at)
+        # The timestamps are restored per row; the model fields still stamp new rows
+        self.assertTrue(UserProgress._meta.get_field('date_completed').auto_now_add)
+        self.assertTrue(JournalEntry._meta.get_field('created_at').auto_now_add)
+        self.assertEqual(SubjectProgress.objects.get(user=user).completed, 1)
+        self.assertEqual(LeaderboardEntry.objects.get(user=user).score, 10)
+        self.assertEqual(list(XPEvent.objects.filter(user=user).values_list('points', 'reason')),
+                         [(10, 'opening_balance')])
+
+        # Loading the same dump again adds nothing, and leaves existing learners alone
+        Profile.objects.filter(user=user).update(bio="Changed here")
+        dump.seek(0)
+        counts = transfer.import_ndjson(dump)
+        self.assertFalse(any(counts.get(kind) for kind in ('user', 'profile', 'progress', 'journal', 'goal')))
+        self.assertEqual(JournalEntry.objects.count(), 1)
+        self.assertEqual(Profile.objects.get(user=user).bio, "Changed here")
+        self.assertEqual(XPEvent.objects.filter(user=user).count(), 1)
+
+    def test_profile_listed_twice_gets_one_opening_balance(self):
+        from io import StringIO
+        User.objects.create_user('twice', password='pw')
+        record = '{"type": "profile", "user": "twice", "total_score": 30, "bio": "", "profile_pic": null}\n'
+        counts = transfer.import_ndjson(StringIO(record * 2))
+        self.assertEqual(counts['profile'], 1)
+        self.assertEqual(list(XPEvent.objects.filter(user__username='twice').values_list('points', 'reason')),
+                         [(30, 'opening_balance')])
+
+    def test_unknown_references_are_rejected(self):
+        from io import StringIO
+        stream = StringIO('{"type": "progress", "user": "nobody", "subject": "Web Development", '
+                          '"goal": "Goal 0", "is_completed": true, "date_completed": "2026-01-01T00:00:00Z"}\n')
+        with self.assertRaises(transfer.TransferError):
+            transfer.import_ndjson(stream)
+
+
+# Tables that grow with the number of learners: their queries must never scan them
+HOT_TABLES = {'base_userprogress', 'base_certificate', 'base_profile', 'base_subjectprogress',
+              'base_leaderboardentry', 'base_journalentry', 'base_xpevent'}
+
+
+def full_scans(plan):
+    """Tables read without an index in an EXPLAIN output (SQLite or PostgreSQL)."""
+    scanned = set(re.findall(r'Seq Scan on (\w+)', plan))
+    for line in plan.splitlines():
+        match = re.search(r'\bSCAN (\w+)(.*)', line)
+        if match and 'USING' not in match.group(2):
+            scanned.add(match.group(1))
+    return scanned
+
+
+@skipUnless(connection.vendor in ('sqlite', 'postgresql'), "EXPLAIN output is parsed for SQLite/PostgreSQL")
+class QueryPlanTests(TestCase):
+    """Regression tests for the indexes behind the hot paths (base/migrations/0017, 0018, 0020)."""
+
+    def setUp(self):
+        cache.clear()
+        if connection.vendor == 'postgresql':
+            # Tiny test tables would otherwise always get a sequential scan
+            with connection.cursor() as cursor:
+                cursor.execute("SET LOCAL enable_seqscan = off")
+        self.user = User.objects.create_user('planner', password='pw')
+        Profile.objects.create(user=self.user)
+        self.subject = Subject.objects.create(name="Web Development")
+        self.goals = [Goal.objects.create(subject=self.subject, description=f"Goal {n}", points=10) for n in range(2)]
+        complete_goal(self.user, self.goals[0], 'goal')
+
+    def assertUsesIndex(self, queryset, *names):
+        plan = queryset.explain()
+        self.assertFalse(full_scans(plan) & HOT_TABLES, plan)
+        if names:
+            self.assertTrue(any(name in plan for name in names), plan)
+
+    def test_hot_queries_use_their_indexes(self):
+        user, subject = self.user, self.subject
+        self.assertUsesIndex(UserProgress.objects.filter(user=user, is_completed=True),
+                             'progress_user_subject_idx', 'base_userprogress_user_id')
+        self.assertUsesIndex(UserProgress.objects.filter(user=user, subject=subject, is_completed=True)
+                             .values_list('goal_id', flat=True), 'progress_user_subject_idx')
+        self.assertUsesIndex(Certificate.objects.filter(user=user, subject=subject),
+                             'unique_certificate_per_subject', 'sqlite_autoindex_base_certificate')
+        self.assertUsesIndex(Profile.objects.order_by('-total_score', 'user')[:20], 'profile_score_idx')
+        self.assertUsesIndex(LeaderboardEntry.objects.order_by('-score', 'user_id')[:5], 'leaderboard_rank_idx')
+        self.assertUsesIndex(SubjectProgress.objects.filter(user=user, subject=subject))
+
+    def test_subject_progress_count_skips_goal_join(self):
+        queryset = UserProgress.objects.filter(user=self.user, subject=self.subject, is_completed=True)
+        self.assertEqual(queryset.count(), 1)
+        self.assertUsesIndex(queryset, 'progress_user_subject_idx')
+        self.assertNotIn('base_goal', queryset.explain())
+
+    def test_progress_follows_a_moved_goal(self):
+        self.assertEqual(UserProgress.objects.get().subject, self.subject)
+        self.assertEqual(ProgressIndex(self.user).completed_ids(self.subject.id), {self.goals[0].id})
+        other = Subject.objects.create(name="Design")
+        goal = self.goals[0]
+        goal.subject = other
+        with self.captureOnCommitCallbacks(execute=True):
+            goal.save()
+        self.assertEqual(UserProgress.objects.get().subject, other)
+        self.assertEqual(ProgressIndex(self.user).completed_ids(self.subject.id), set())
+        self.assertEqual(ProgressIndex(self.user).completed_ids(other.id), {goal.id})
+        self.assertEqual(SubjectProgress.objects.get(user=self.user, subject=other).completed, 1)
+        self.assertFalse(SubjectProgress.objects.filter(user=self.user, subject=self.subject).exists())
+
+    def test_progress_subject_follows_its_goal(self):
+        progress = UserProgress.objects.get()
+        other = Subject.objects.create(name="Design")
+        progress.goal = Goal.objects.create(subject=other, description="Elsewhere", points=5)
+        progress.subject = self.subject  # ignored: always the goal's subject
+        progress.save()
+        self.assertEqual(UserProgress.objects.get().subject, other)
+
+    def test_views_never_scan_hot_tables(self):
+        statements = []
+
+        def record(execute, sql, params, many, context):
+            if not many and sql.lstrip().upper().startswith('SELECT'):
+                statements.append((sql, params))
+            return execute(sql, params, many, context)
+
+        self.client.force_login(self.user)
+        with connection.execute_wrapper(record):
+            for url in (reverse('home'), reverse('subject', args=[self.subject.id]),
+                        reverse('journal'), reverse('profile')):
+                self.assertEqual(self.client.get(url).status_code, 200)
+            self.client.get(reverse('mark_complete', args=[self.subject.id, self.goals[1].id]))
+
+        explain = 'EXPLAIN QUERY PLAN ' if connection.vendor == 'sqlite' else 'EXPLAIN '
+        with connection.cursor() as cursor:
+            for sql, params in statements:
+                cursor.execute(explain + sql, params)
+                plan = '\n'.join(' '.join(str(col) for col in row) for row in cursor.fetchall())
+                self.assertFalse(full_scans(plan) & HOT_TABLES, f"{sql}\n{plan}")
+
+    def test_certificate_is_unique_per_subject(self):
+        from django.db import IntegrityError
+        from .certificates import issue_certificate
+
+        with self.captureOnCommitCallbacks():
+            cert = issue_certificate(self.user, self.subject)
+            self.assertEqual(issue_certificate(self.user, self.subject), cert)
+        with self.assertRaises(IntegrityError):
+            Certificate.objects.create(user=self.user, subject=self.subject)
+
+
+class AsyncRoutes:
+    # URLconf with the learning flow served by base/async_views.py (USE_ASYNC_VIEWS)
+    urlpatterns = build_urlpatterns(async_views)
+
+
+@override_settings(ROOT_URLCONF=AsyncRoutes)
+class AsyncViewTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('async', password='pw')
+        Profile.objects.create(user=self.user)
+        self.subject = Subject.objects.create(name="Web Development")
+        self.quiz_goal = Goal.objects.create(subject=self.subject, description="Quiz", points=10)
+        self.question = Question.objects.create(goal=self.quiz_goal, question_text="?", option_1="a", option_2="b",
+                                                option_3="c", option_4="d", correct_option='2')
+        self.goal = Goal.objects.create(subject=self.subject, description="Read", points=5)
+
+    def tearDown(self):
+        discard_buffered_attempts()
+
+    async def test_learning_flow(self):
+        await self.async_client.aforce_login(self.user)
+
+        response = await self.async_client.get(reverse('home'))
+        self.assertContains(response, "Web Development")
+
+        url = reverse('submit_quiz', args=[self.subject.id, self.quiz_goal.id])
+        response = await self.async_client.post(url, {f'question_{self.question.id}': '2'})
+        self.assertRedirects(response, reverse('subject', args=[self.subject.id]), fetch_redirect_response=False)
+        await self.async_client.post(reverse('mark_complete', args=[self.subject.id, self.goal.id]))
+
+        response = await self.async_client.get(reverse('subject', args=[self.subject.id]))
+        self.assertEqual(response.context['completed_ids'], {self.quiz_goal.id, self.goal.id})
+        self.assertTrue(await Certificate.objects.filter(user=self.user, subject=self.subject).aexists())
+        profile = await Profile.objects.aget(user=self.user)
+        self.assertEqual(profile.total_score, 15)
+
+    async def test_journal(self):
+        await self.async_client.aforce_login(self.user)
+        await self.async_client.post(reverse('journal'), {'title': "Async", 'description': "...",
+                                                          'date': '2026-01-01', 'start_time': '09:00',
+                                                          'end_time': '10:00'})
+        response = await self.async_client.get(reverse('journal'))
+        self.assertEqual([entry.title for entry in response.context['entries']], ["Async"])
+
+    async def test_login_required(self):
+        response = await self.async_client.get(reverse('journal'))
+        self.assertEqual(response.status_code, 302)
+
+
+@skipUnlessDBFeature('has_select_for_update')
+class XPConcurrencyTests(TransactionTestCase):
+    # Needs a database with real row locking (PostgreSQL); SQLite serializes writers differently
+    THREADS = 8
+    AWARDS_PER_THREAD = 25
+
+    def test_parallel_awards_lose_no_increments(self):
+        user = User.objects.create_user('racer')
+        Profile.objects.create(user=user)
+        start = threading.Barrier(self.THREADS)
+        errors = []
+
+        def worker():
+            try:
+                start.wait()
+                for _ in range(self.AWARDS_PER_THREAD):
+                    award_xp(user, 1, 'goal')
+            except Exception as exc:
+                errors.append(exc)
+            finally:
+                connections.close_all()
+
+        threads = [threading.Thread(target=worker) for _ in range(self.THREADS)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        expected = self.THREADS * self.AWARDS_PER_THREAD
+        self.assertEqual(errors, [])
+        self.assertEqual(Profile.objects.get(user=user).total_score, expected)
+        self.assertEqual(XPEvent.objects.filter(user=user).count(), expected)
+        self.assertEqual(LeaderboardEntry.objects.get(user=user).score, expected)
@@ -0,0 +1,287 @@
+import datetime
+import json
+from collections import defaultdict
+
+from django.contrib.auth.models import User
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime, parse_time
+
+from . import catalog_import, leaderboard, progress
+from .fragments import bump_on_commit, user_version_name
+from .models import (Goal, JournalEntry, Material, PracticalChallenge, Profile, Question, Subject, UserProgress,
+                     XPEvent)
+from .progress import progress_version_name
+
+# Backups and moves between environments, as newline-delimited JSON: one record per
+# line, {"type": "<kind>", ...}. Rows refer to each other by natural key (subject name,
+# goal description, username), never by id, so a dump loads into any database.
+#
+#   catalog:  subject, material, goal, question, challenge
+#   progress: user, profile, progress (UserProgress), journal
+#
+# Both directions stream: exports read with iterator(chunk_size=...), imports parse one
+# line at a time and write every `batch_size` records, so memory use doesn't grow with
+# the number of rows. Catalog records go through the bulk catalog importer
+# (base/catalog_import.py); learner rows are inserted with bulk_create, skipping rows
+# that already exist (profiles included: a learner's score here is never overwritten).
+# Uploaded images are referenced by name only: copy MEDIA_ROOT alongside the dump.
+CATALOG_TYPES = ('subject', 'material', 'goal', 'question', 'challenge')
+CATALOG_MODELS = ('Subject', 'Material', 'Goal', 'Question', 'PracticalChallenge')  # same order
+PROGRESS_TYPES = ('user', 'profile', 'progress', 'journal')
+CHUNK_SIZE = 2000
+
+
+class TransferError(ValueError):
+    pass
+
+
+# --- Export ---
+
+class Encoder(DjangoJSONEncoder):
+    # Full microseconds (DjangoJSONEncoder rounds to milliseconds), so timestamps survive a round trip
+    def default(self, o):
+        if isinstance(o, (datetime.datetime, datetime.time)):
+            return o.isoformat()
+        return super().default(o)
+
+
+def export_catalog(chunk_size=CHUNK_SIZE):
+    for row in Subject.objects.order_by('id').values('name', 'description').iterator(chunk_size=chunk_size):
+        yield {'type': 'subject', **row}
+    for row in (Material.objects.order_by('id')
+                .values('subject__name', 'title', 'content_type', 'link').iterator(chunk_size=chunk_size)):
+        yield {'type': 'material', 'subject': row.pop('subject__name'), **row}
+    for row in Goal.objects.order_by('id').values('subject__name', 'description', 'points').iterator(chunk_size=chunk_size):
+        yield {'type': 'goal', 'subject': row.pop('subject__name'), **row}
+    for q in (Question.objects.order_by('id')
+              .values('goal__subject__name', 'goal__description', 'question_text', 'option_1', 'option_2',
+                      'option_3', 'option_4', 'correct_option').iterator(chunk_size=chunk_size)):
+        yield {'type': 'question', 'subject': q['goal__subject__name'], 'goal': q['goal__description'],
+               'text': q['question_text'], 'options': [q['option_1'], q['option_2'], q['option_3'], q['option_4']],
+               'answer': q['correct_option']}
+    for row in (PracticalChallenge.objects.order_by('id')
+                .values('goal__subject__name', 'goal__description', 'instruction', 'starter_code', 'hint',
+                        'validation_text', 'rules').iterator(chunk_size=chunk_size)):
+        yield {'type': 'challenge', 'subject': row.pop('goal__subject__name'), 'goal': row.pop('goal__description'),
+               **row}
+
+
+def export_progress(chunk_size=CHUNK_SIZE):
+    # Password hashes are included so accounts keep working after a move
+    for row in (User.objects.order_by('id')
+                .values('username', 'email', 'first_name', 'last_name', 'password', 'is_active', 'date_joined')
+                .iterator(chunk_size=chunk_size)):
+        yield {'type': 'user', **row}
+    for row in (Profile.objects.order_by('id')
+                .values('user__username', 'total_score', 'bio', 'profile_pic').iterator(chunk_size=chunk_size)):
+        yield {'type': 'profile', 'user': row.pop('user__username'), **row}
+    for row in (UserProgress.objects.order_by('id')
+                .values('user__username', 'goal__subject__name', 'goal__description', 'is_completed',
+                        'date_completed').iterator(chunk_size=chunk_size)):
+        yield {'type': 'progress', 'user': row.pop('user__username'), 'subject': row.pop('goal__subject__name'),
+               'goal': row.pop('goal__description'), **row}
+    for row in (JournalEntry.objects.order_by('id')
+                .values('user__username', 'title', 'description', 'date', 'start_time', 'end_time', 'image',
+                        'created_at').iterator(chunk_size=chunk_size)):
+        yield {'type': 'journal', 'user': row.pop('user__username'), **row}
+
+
+def write_ndjson(records, stream):
+    count = 0
+    for record in records:
+        stream.write(json.dumps(record, cls=Encoder, ensure_ascii=False))
+        stream.write('\n')
+        count += 1
+    return count
+
+
+# --- Import ---
+
+def read_ndjson(stream):
+    for number, line in enumerate(stream, 1):
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+        except json.JSONDecodeError as e:
+            raise TransferError(f"line {number}: invalid JSON ({e})")
+        if not isinstance(record, dict) or record.get('type') not in CATALOG_TYPES + PROGRESS_TYPES:
+            raise TransferError(f"line {number}: unknown record type")
+        yield record
+
+
+def catalog_document(records):
+    """Catalog records -> the nested document base/catalog_import.py takes."""
+    subjects, goals = {}, {}
+    for record in records:
+        kind = record['type']
+        if kind == 'subject':
+            subjects[record['name']] = {'name': record['name'], 'description': record.get('description', ''),
+                                        'materials': [], 'goals': []}
+            continue
+        subject = subjects.get(record['subject'])
+        if subject is None:
+            raise TransferError(f"{kind} refers to unknown subject '{record['subject']}'")
+        if kind == 'material':
+            subject['materials'].append({k: record[k] for k in ('title', 'content_type', 'link')})
+        elif kind == 'goal':
+            goal = goals[record['subject'], record['description']] = {
+                'description': record['description'], 'points': record.get('points', 10), 'questions': [],
+            }
+            subject['goals'].append(goal)
+        else:
+            goal = goals.get((record['subject'], record['goal']))
+            if goal is None:
+                raise TransferError(f"{kind} refers to unknown goal '{record['goal']}'")
+            if kind == 'question':
+                goal['questions'].append({k: record[k] for k in ('text', 'options', 'answer')})
+            else:
+                goal['challenge'] = {k: v for k, v in record.items() if k not in ('type', 'subject', 'goal')}
+    return {'subjects': list(subjects.values())}
+
+
+class Importer:
+    """Feeds records (dicts, in dump order) into the database. See import_ndjson()."""
+
+    def __init__(self, batch_size=CHUNK_SIZE, prune=False):
+        self.batch_size = batch_size
+        self.prune = prune
+        self.counts = defaultdict(int)  # type -> records written (existing rows are skipped)
+        self.catalog_records = []
+        self.pending_type, self.pending = None, []
+        self._goals = None
+
+    def add(self, record):
+        kind = record['type']
+        if kind in CATALOG_TYPES:
+            # The catalog is small: diffed as a whole by the catalog importer
+            self.catalog_records.append(record)
+            return
+        self.flush_catalog()
+        if kind != self.pending_type or len(self.pending) >= self.batch_size:
+            self.flush()
+            self.pending_type = kind
+        self.pending.append(record)
+
+    def finish(self):
+        self.flush_catalog()
+        self.flush()
+        if self.counts.get('progress'):
+            progress.recount()
+        if self.counts.get('profile') or self.counts.get('progress'):
+            leaderboard.rebuild()
+        return dict(self.counts)
+
+    def flush_catalog(self):
+        if self.catalog_records:
+            report = catalog_import.import_catalog(catalog_document(self.catalog_records), prune=self.prune)
+            for (model, action), n in report.counts.items():
+                if action in ('created', 'updated'):
+                    self.counts[CATALOG_TYPES[CATALOG_MODELS.index(model)]] += n
+            self.catalog_records, self._goals = [], None
+
+    def flush(self):
+        if self.pending:
+            with transaction.atomic():
+                self.counts[self.pending_type] += getattr(self, f'_write_{self.pending_type}')(self.pending)
+            self.pending = []
+
+    # -- one batch of a single type --
+    def goals(self):
+        # (subject name, goal description) -> (goal id, subject id), for the whole (small) catalog
+        if self._goals is None:
+            self._goals = {(name, description): (goal_id, subject_id) for goal_id, subject_id, name, description
+                           in Goal.objects.values_list('id', 'subject_id', 'subject__name', 'description')}
+        return self._goals
+
+    def _user_ids(self, records):
+        names = {record['user'] for record in records}
+        ids = dict(User.objects.filter(username__in=names).values_list('username', 'id'))
+        missing = names - set(ids)
+        if missing:
+            raise TransferError(f"unknown user(s): {', '.join(sorted(missing)[:5])}")
+        bump_on_commit(*(name for user_id in ids.values()
+                         for name in (user_version_name(user_id), progress_version_name(user_id))))
+        return ids
+
+    def _write_user(self, records):
+        # Existing usernames are left alone (password, email... stay as they are here)
+        existing = set(User.objects.filter(username__in=[r['username'] for r in records])
+                       .values_list('username', flat=True))
+        fields = ('username', 'email', 'first_name', 'last_name', 'password', 'is_active')
+        users = [User(date_joined=parse_datetime(r['date_joined']) if r.get('date_joined') else timezone.now(),
+                      **{f: r[f] for f in fields if f in r})
+                 for r in records if r['username'] not in existing]
+        User.objects.bulk_create(users, ignore_conflicts=True)
+        return len(users)
+
+    def _write_profile(self, records):
+        ids = self._user_ids(records)
+        existing = set(Profile.objects.filter(user_id__in=ids.values()).values_list('user_id', flat=True))
+        profiles = {}
+        for r in records:  # a user listed twice only gets the first profile (and one opening balance)
+            if ids[r['user']] not in existing:
+                profiles.setdefault(ids[r['user']], Profile(user_id=ids[r['user']], total_score=r.get('total_score', 0),
+                                                            bio=r.get('bio'), profile_pic=r.get('profile_pic') or None))
+        Profile.objects.bulk_create(profiles.values(), ignore_conflicts=True)
+        # ignore_conflicts leaves the ids unset, so check which rows actually went in: only those get a
+        # ledger row (a profile created for the same user by another process mid-import would still count)
+        inserted = set(Profile.objects.filter(user_id__in=profiles).values_list('user_id', flat=True))
+        profiles = [p for user_id, p in profiles.items() if user_id in inserted]
+        # An imported score is an opening balance (as in migration 0012), so the XP
+        # ledger still adds up to total_score
+        XPEvent.objects.bulk_create([XPEvent(user_id=p.user_id, points=p.total_score, reason='opening_balance')
+                                     for p in profiles if p.total_score])
+        return len(profiles)
+
+    def _write_progress(self, records):
+        ids, goals = self._user_ids(records), self.goals()
+        rows = []
+        for r in records:
+            goal = goals.get((r['subject'], r['goal']))
+            if goal is None:
+                raise TransferError(f"progress refers to unknown goal '{r['goal']}' in '{r['subject']}'")
+            rows.append(UserProgress(user_id=ids[r['user']], goal_id=goal[0], subject_id=goal[1],
+                                     is_completed=r['is_completed'], date_completed=parse_datetime(r['date_completed'])))
+        existing = set(UserProgress.objects.filter(user_id__in=ids.values()).values_list('user_id', 'goal_id'))
+        stamps = {(row.user_id, row.goal_id): row.date_completed
+                  for row in rows if (row.user_id, row.goal_id) not in existing}
+        UserProgress.objects.bulk_create([row for row in rows if (row.user_id, row.goal_id) in stamps],
+                                         ignore_conflicts=True)
+        # auto_now_add stamped every row with "now": put the original completion times back
+        inserted = (UserProgress.objects.filter(user_id__in={user_id for user_id, _ in stamps},
+                                                goal_id__in={goal_id for _, goal_id in stamps})
+                    .values_list('id', 'user_id', 'goal_id'))
+        rows = [UserProgress(id=row_id, date_completed=stamps[user_id, goal_id])
+                for row_id, user_id, goal_id in inserted if (user_id, goal_id) in stamps]
+        UserProgress.objects.bulk_update(rows, ['date_completed'])
+        return len(rows)
+
+    def _write_journal(self, records):
+        # No natural key: an entry with the same user, creation time and title is the same entry
+        ids = self._user_ids(records)
+        rows = [JournalEntry(user_id=ids[r['user']], title=r['title'], description=r['description'],
+                             date=parse_date(r['date']), start_time=parse_time(r['start_time']),
+                             end_time=parse_time(r['end_time']), image=r.get('image') or None,
+                             created_at=parse_datetime(r['created_at'])) for r in records]
+        existing = set(JournalEntry.objects.filter(user_id__in=ids.values(),
+                                                   created_at__in={row.created_at for row in rows})
+                       .values_list('user_id', 'created_at', 'title'))
+        rows = [row for row in rows if (row.user_id, row.created_at, row.title) not in existing]
+        stamps = [row.created_at for row in rows]
+        JournalEntry.objects.bulk_create(rows)
+        # As above: bulk_create overwrote created_at with "now" (and set the ids, on PostgreSQL and SQLite)
+        for row, created_at in zip(rows, stamps):
+            row.created_at = created_at
+        JournalEntry.objects.bulk_update(rows, ['created_at'])
+        return len(rows)
+
+
+def import_ndjson(stream, batch_size=CHUNK_SIZE, prune=False):
+    """Loads a dump written by export (any mix of record types). Returns {type: rows written}."""
+    importer = Importer(batch_size=batch_size, prune=prune)
+    for record in read_ndjson(stream):
+        importer.add(record)
+    return importer.finish()
@@ -0,0 +1,145 @@
+import os
+
+from PIL import Image, ImageOps, UnidentifiedImageError
+from django.conf import settings
+from django.core.files.uploadedfile import TemporaryUploadedFile
+from django.core.files.uploadhandler import FileUploadHandler, SkipFile
+
+from . import images  # noqa: F401  (registers the HEIC opener when pillow-heif is installed)
+
+# Journal images and profile pictures: anything outside these limits is refused
+# before Pillow decodes a single pixel. MPO is what Pillow calls the multi-picture
+# JPEGs many phones take (only the first, main picture is kept).
+ALLOWED_FORMATS = {'JPEG', 'MPO', 'PNG', 'WEBP', 'GIF', 'HEIF'}
+# Stored copies are written in the same format, except these
+OUTPUT_FORMATS = {'MPO': 'JPEG', 'GIF': 'PNG', 'HEIF': 'JPEG'}
+EXTENSIONS = {'JPEG': 'jpg', 'PNG': 'png', 'WEBP': 'webp'}
+# Only the JPEG decoder can decode at reduced scale (draft()); everything else is
+# decoded in full before it's shrunk, so those get the lower full-decode pixel limit.
+# Worst case per upload is then about IMAGE_UPLOAD_MAX_FULL_DECODE_PIXELS * 4 bytes.
+DRAFT_FORMATS = {'JPEG', 'MPO'}
+
+
+def max_bytes():
+    return getattr(settings, 'IMAGE_UPLOAD_MAX_BYTES', 10 * 1024 * 1024)
+
+
+def max_pixels():
+    return getattr(settings, 'IMAGE_UPLOAD_MAX_PIXELS', 40_000_000)
+
+
+def max_full_decode_pixels():
+    return getattr(settings, 'IMAGE_UPLOAD_MAX_FULL_DECODE_PIXELS', 16_000_000)
+
+
+def max_dimension():
+    return getattr(settings, 'IMAGE_UPLOAD_MAX_DIMENSION', 2560)
+
+
+class UploadRejected(ValueError):
+    pass
+
+
+class SizeLimitUploadHandler(FileUploadHandler):
+    """
+    First entry in FILE_UPLOAD_HANDLERS. Counts bytes as the multipart body streams
+    in and skips a file as soon as it passes IMAGE_UPLOAD_MAX_BYTES, so an oversize
+    upload is never fully buffered or written to disk. The rest of the form still
+    parses; accept_image() reports the skipped file to the view.
+    """
+
+    def new_file(self, field_name, *args, **kwargs):
+        super().new_file(field_name, *args, **kwargs)
+        self.received = 0
+
+    def receive_data_chunk(self, raw_data, start):
+        self.received += len(raw_data)
+        if self.received > max_bytes():
+            rejected = getattr(self.request, 'rejected_uploads', {})
+            rejected[self.field_name] = f"Image is too large (max {max_bytes() // (1024 * 1024)} MB)."
+            self.request.rejected_uploads = rejected
+            raise SkipFile()
+        return raw_data
+
+    def file_complete(self, file_size):
+        # Let the memory/temp-file handlers after us build the UploadedFile
+        return None
+
+
+def probe(uploaded):
+    """
+    Header-only check: Image.open() reads just enough to know the format and size.
+    Returns the (still undecoded) image; raises UploadRejected.
+    """
+    uploaded.seek(0)
+    try:
+        image = Image.open(uploaded)
+    except (UnidentifiedImageError, Image.DecompressionBombError, OSError) as exc:
+        raise UploadRejected("Unsupported or unreadable image file.") from exc
+
+    if image.format not in ALLOWED_FORMATS:
+        raise UploadRejected(f"Unsupported image type ({image.format}).")
+    limit = max_pixels() if image.format in DRAFT_FORMATS else min(max_pixels(), max_full_decode_pixels())
+    if image.width * image.height > limit:
+        raise UploadRejected(f"Image is too large ({image.width}x{image.height} pixels).")
+    return image
+
+
+def reencode(uploaded, image):
+    """
+    Writes `image` to a new temp file, shrunk to fit IMAGE_UPLOAD_MAX_DIMENSION if
+    it's larger. Every upload goes through here: EXIF orientation is applied and
+    metadata (GPS etc.) is not copied, and HEIF/MPO/GIF become formats browsers show.
+    draft() asks the JPEG decoder for a reduced-scale image first, so a 24MP photo
+    is decoded at 1/2-1/8 size instead of in full (other formats are decoded in full,
+    which probe() bounds with the lower full-decode pixel limit).
+    """
+    output_format = OUTPUT_FORMATS.get(image.format, image.format)
+    scale = max_dimension() / max(image.size)
+    if scale < 1:
+        target = (max(1, round(image.width * scale)), max(1, round(image.height * scale)))
+        # thumbnail() alone only drafts down to twice the target size, which for
+        # phone photos means no reduction at all
+        image.draft('RGB', target)
+        image.thumbnail(target, Image.LANCZOS)
+    image = ImageOps.exif_transpose(image)
+    if output_format == 'JPEG' and image.mode != 'RGB':
+        image = image.convert('RGB')
+
+    stem = os.path.splitext(os.path.basename(uploaded.name))[0]
+    stored = TemporaryUploadedFile(
+        f"{stem}.{EXTENSIONS[output_format]}", f"image/{output_format.lower()}", 0, None
+    )
+    options = {'quality': 85, 'optimize': True} if output_format in ('JPEG', 'WEBP') else {'optimize': True}
+    image.save(stored, format=output_format, **options)
+    stored.size = stored.tell()
+    stored.seek(0)
+    return stored
+
+
+def process_image(uploaded):
+    # Validate an UploadedFile and return a re-encoded copy ready for an ImageField
+    try:
+        return reencode(uploaded, probe(uploaded))
+    except (OSError, Image.DecompressionBombError) as exc:  # truncated / corrupt pixel data
+        raise UploadRejected("Unsupported or unreadable image file.") from exc
+
+
+def accept_image(request, field_name):
+    """
+    The image posted as `field_name`, validated and bounded in size; None if nothing
+    was uploaded. Raises UploadRejected with a user-facing message otherwise.
+    """
+    rejected = getattr(request, 'rejected_uploads', {})
+    if field_name in rejected:
+        raise UploadRejected(rejected[field_name])
+
+    uploaded = request.FILES.get(field_name)
+    if not uploaded:
+        return None
+    processed = process_image(uploaded)
+    if processed is not uploaded:
+        # Closed with the other uploads at the end of the request (storage may have
+        # moved the temp file away by then, which close() tolerates)
+        request.FILES.appendlist(field_name, processed)
+    return processed
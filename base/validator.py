@@ -0,0 +1,500 @@
+import logging
+import re
+import signal
+import threading
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeout
+from concurrent.futures.process import BrokenProcessPool
+from html.parser import HTMLParser
+from multiprocessing import get_context
+from typing import NamedTuple, Optional
+
+try:
+    import resource
+except ImportError:  # not on Windows: no per-submission limits there
+    resource = None
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+# Code-lab validation. A PracticalChallenge's `rules` is a list of assertions about the
+# submitted page, checked against a parsed DOM and its computed styles:
+#
+#   {"selector": "ul > li", "min": 3}                       element count (also "count", "max")
+#   {"selector": "a.nav", "attr": "href", "contains": "#"}  attribute ("equals" / "contains" / present)
+#   {"selector": "h1", "text": "Hello"}                     text content (case-insensitive)
+#   {"selector": "h1", "style": {"color": "blue"}}          computed style (<style> + inline, inherited)
+#
+# A rule passes if any matched element satisfies it ("all": true = every one), and may
+# carry a "message" shown when it fails. Selectors support tag, *, #id, .class,
+# [attr], [attr=value], descendant and '>' child combinators, and comma lists.
+# Challenges without rules keep the old validation_text substring check.
+#
+# Submissions are checked in a separate process pool with CPU/memory limits, so a
+# pathological submission can't stall or bloat the web workers.
+
+MAX_SUBMISSION_BYTES = 100_000
+VOID_TAGS = {'area', 'base', 'br', 'col', 'embed', 'hr', 'img', 'input', 'link', 'meta', 'source', 'track', 'wbr'}
+# Tags whose end tag is optional: opening one of these closes an open sibling (<li>a<li>b)
+IMPLIED_END = {'li': {'li'}, 'p': {'p'}, 'option': {'option'}, 'tr': {'tr', 'td', 'th'},
+               'td': {'td', 'th'}, 'th': {'td', 'th'}, 'dt': {'dt', 'dd'}, 'dd': {'dt', 'dd'}}
+INHERITED = {'color', 'font-family', 'font-size', 'font-style', 'font-weight', 'line-height',
+             'text-align', 'text-transform', 'letter-spacing', 'visibility', 'list-style-type'}
+NAMED_COLORS = {
+    'black': '#000000', 'silver': '#c0c0c0', 'gray': '#808080', 'grey': '#808080', 'white': '#ffffff',
+    'maroon': '#800000', 'red': '#ff0000', 'purple': '#800080', 'fuchsia': '#ff00ff', 'green': '#008000',
+    'lime': '#00ff00', 'olive': '#808000', 'yellow': '#ffff00', 'navy': '#000080', 'blue': '#0000ff',
+    'teal': '#008080', 'aqua': '#00ffff', 'orange': '#ffa500',
+}
+
+
+# --- DOM -------------------------------------------------------------------------
+
+class Node:
+    __slots__ = ('tag', 'attrs', 'children', 'parent', 'texts')
+
+    def __init__(self, tag, attrs, parent):
+        self.tag = tag
+        self.attrs = attrs
+        self.children = []
+        self.parent = parent
+        self.texts = []
+
+    def classes(self):
+        return self.attrs.get('class', '').split()
+
+    def text(self):
+        return ''.join(self.texts) + ''.join(child.text() for child in self.children)
+
+    def iter(self):
+        for child in self.children:
+            yield child
+            yield from child.iter()
+
+
+class _TreeBuilder(HTMLParser):
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.root = Node(None, {}, None)
+        self.current = self.root
+        self.css = []
+
+    def handle_starttag(self, tag, attrs):
+        while self.current.tag in IMPLIED_END.get(tag, ()):
+            self.current = self.current.parent
+        node = Node(tag, {name: value or '' for name, value in attrs}, self.current)
+        self.current.children.append(node)
+        if tag not in VOID_TAGS:
+            self.current = node
+
+    def handle_startendtag(self, tag, attrs):
+        self.current.children.append(Node(tag, {name: value or '' for name, value in attrs}, self.current))
+
+    def handle_endtag(self, tag):
+        # Close up to the matching open tag; stray end tags are ignored like browsers do
+        node = self.current
+        while node is not self.root and node.tag != tag:
+            node = node.parent
+        if node is not self.root:
+            self.current = node.parent
+
+    def handle_data(self, data):
+        if self.current.tag == 'style':
+            self.css.append(data)
+        else:
+            self.current.texts.append(data)
+
+
+def parse_html(code):
+    builder = _TreeBuilder()
+    builder.feed(code)
+    builder.close()
+    return builder.root, '\n'.join(builder.css)
+
+
+# --- Selectors -------------------------------------------------------------------
+
+class Compound(NamedTuple):
+    tag: Optional[str]
+    ids: tuple
+    classes: tuple
+    attrs: tuple  # (name, value or None)
+
+
+SIMPLE = re.compile(r'#([\w-]+)|\.([\w-]+)|\[\s*([\w-]+)\s*(=\s*["\']?([^"\'\]]*)["\']?\s*)?\]')
+TOKEN = re.compile(r'>|(?:\[[^\]]*\]|[^\s>\[])+')
+COMPOUND = re.compile(r'^([a-zA-Z][\w-]*|\*)?((?:#[\w-]+|\.[\w-]+|\[[^\]]*\])*)$')
+
+
+def _compile_compound(text):
+    match = COMPOUND.match(text)
+    if not match or not text:
+        raise ValueError(f"Unsupported selector part: {text!r}")
+    tag = match.group(1) if match.group(1) not in (None, '*') else None
+    ids, classes, attrs = [], [], []
+    for id_, cls, attr, has_value, value in SIMPLE.findall(match.group(2)):
+        if id_:
+            ids.append(id_)
+        elif cls:
+            classes.append(cls)
+        else:
+            attrs.append((attr.lower(), value if has_value else None))
+    return Compound(tag.lower() if tag else None, tuple(ids), tuple(classes), tuple(attrs))
+
+
+def compile_selector(text):
+    """
+    'nav > ul li.active, footer a' -> tuple of groups; a group is a tuple of
+    (combinator, Compound) pairs, combinator being None (first), ' ' or '>'.
+    """
+    groups = []
+    for group in text.split(','):
+        parts, combinator = [], None
+        for token in TOKEN.findall(group):
+            if token == '>':
+                combinator = '>'
+                continue
+            parts.append((combinator if parts else None, _compile_compound(token)))
+            combinator = ' '
+        if not parts:
+            raise ValueError(f"Empty selector in {text!r}")
+        groups.append(tuple(parts))
+    return tuple(groups)
+
+
+def _matches_compound(node, compound):
+    if node.tag is None:
+        return False
+    if compound.tag and node.tag != compound.tag:
+        return False
+    if compound.ids and any(node.attrs.get('id') != id_ for id_ in compound.ids):
+        return False
+    if compound.classes:
+        classes = node.classes()
+        if any(cls not in classes for cls in compound.classes):
+            return False
+    for name, value in compound.attrs:
+        if name not in node.attrs or (value is not None and node.attrs[name] != value):
+            return False
+    return True
+
+
+def _matches_group(node, parts, memo=None):
+    # memo: {(id(node), len(parts)): bool} for one group, so descendant chains stay linear
+    if memo is not None:
+        key = (id(node), len(parts))
+        if key not in memo:
+            memo[key] = _match(node, parts, memo)
+        return memo[key]
+    return _match(node, parts, {})
+
+
+def _match(node, parts, memo):
+    combinator, compound = parts[-1]
+    if not _matches_compound(node, compound):
+        return False
+    if len(parts) == 1:
+        return True
+    if combinator == '>':
+        return node.parent is not None and _matches_group(node.parent, parts[:-1], memo)
+    ancestor = node.parent
+    while ancestor is not None:
+        if _matches_group(ancestor, parts[:-1], memo):
+            return True
+        ancestor = ancestor.parent
+    return False
+
+
+def select(root, selector):
+    memos = [{} for _ in selector]
+    return [node for node in root.iter()
+            if any(_matches_group(node, group, memo) for group, memo in zip(selector, memos))]
+
+
+def _specificity(group):
+    compounds = [compound for _, compound in group]
+    return (sum(len(c.ids) for c in compounds),
+            sum(len(c.classes) + len(c.attrs) for c in compounds),
+            sum(1 for c in compounds if c.tag))
+
+
+# --- CSS -------------------------------------------------------------------------
+
+def normalize_value(prop, value):
+    value = ' '.join(value.replace('!important', '').lower().split())
+    if 'color' in prop:
+        value = NAMED_COLORS.get(value, value)
+        if re.fullmatch(r'#[0-9a-f]{3}', value):
+            value = '#' + ''.join(ch * 2 for ch in value[1:])
+        rgb = re.fullmatch(r'rgba?\((\d+),\s*(\d+),\s*(\d+)(?:,\s*1(?:\.0+)?)?\)', value)
+        if rgb:
+            value = '#' + ''.join(f'{min(int(n), 255):02x}' for n in rgb.groups())
+    return value
+
+
+def parse_declarations(text):
+    declarations = {}
+    for item in text.split(';'):
+        if ':' in item:
+            prop, value = item.split(':', 1)
+            prop = prop.strip().lower()
+            if prop:
+                declarations[prop] = normalize_value(prop, value)
+    return declarations
+
+
+def parse_css(css):
+    # [(specificity, order, selector group, declarations)]; unsupported selectors and @-rules are skipped
+    css = re.sub(r'/\*.*?\*/', '', css, flags=re.S)
+    css = re.sub(r'@[^{]+\{(?:[^{}]*\{[^}]*\})*[^}]*\}', '', css)
+    rules = []
+    for order, (selectors, body) in enumerate(re.findall(r'([^{}]+)\{([^}]*)\}', css)):
+        try:
+            compiled = compile_selector(selectors)
+        except ValueError:
+            continue
+        declarations = parse_declarations(body)
+        for group in compiled:
+            rules.append((_specificity(group), order, group, declarations))
+    rules.sort(key=lambda rule: (rule[0], rule[1]))
+    return rules
+
+
+def computed_style(node, css_rules, _cache):
+    if node is None or node.tag is None:
+        return {}
+    if id(node) not in _cache:
+        style = {prop: value for prop, value in computed_style(node.parent, css_rules, _cache).items()
+                 if prop in INHERITED}
+        for _spec, _order, group, declarations in css_rules:
+            if _matches_group(node, group):
+                style.update(declarations)
+        style.update(parse_declarations(node.attrs.get('style', '')))
+        _cache[id(node)] = style
+    return _cache[id(node)]
+
+
+# --- Rules -----------------------------------------------------------------------
+
+class Rule(NamedTuple):
+    source: str
+    selector: tuple
+    count: Optional[int]
+    min: Optional[int]
+    max: Optional[int]
+    attr: Optional[str]
+    equals: Optional[str]
+    contains: Optional[str]
+    text: Optional[str]
+    style: tuple  # ((prop, normalized value), ...)
+    all: bool
+    message: str
+
+
+def compile_rules(rules):
+    """Validates and pre-parses a challenge's rules. Raises ValueError for bad ones."""
+    if not isinstance(rules, list):
+        raise ValueError("Rules must be a list")
+    compiled = []
+    for rule in rules:
+        if not isinstance(rule, dict) or not isinstance(rule.get('selector'), str):
+            raise ValueError(f"Each rule needs a 'selector': {rule!r}")
+        style = rule.get('style') or {}
+        if not isinstance(style, dict):
+            raise ValueError(f"'style' must be an object: {rule!r}")
+        for key in ('count', 'min', 'max'):
+            value = rule.get(key)
+            if value is not None and (type(value) is not int or value < 0):
+                raise ValueError(f"'{key}' must be a whole number of at least 0: {rule!r}")
+        for key in ('attr', 'equals', 'contains', 'text', 'message'):
+            if rule.get(key) is not None and not isinstance(rule[key], str):
+                raise ValueError(f"'{key}' must be a string: {rule!r}")
+        compiled.append(Rule(
+            source=rule['selector'],
+            selector=compile_selector(rule['selector']),
+            count=rule.get('count'), min=rule.get('min'), max=rule.get('max'),
+            attr=rule.get('attr'), equals=rule.get('equals'), contains=rule.get('contains'),
+            text=rule.get('text'),
+            style=tuple((prop.lower(), normalize_value(prop.lower(), str(value))) for prop, value in style.items()),
+            all=bool(rule.get('all')),
+            message=rule.get('message') or '',
+        ))
+    return tuple(compiled)
+
+
+def _describe(rule):
+    if rule.message:
+        return rule.message
+    if rule.style:
+        return f"{rule.source} should have " + "; ".join(f"{p}: {v}" for p, v in rule.style)
+    if rule.attr:
+        return f"{rule.source} needs a {rule.attr} attribute" + (f" of '{rule.equals}'" if rule.equals else '')
+    if rule.text:
+        return f"{rule.source} should contain the text '{rule.text}'"
+    return f"Expected {rule.source} in your page"
+
+
+def _element_ok(rule, node, css_rules, cache):
+    if rule.attr:
+        if rule.attr not in node.attrs:
+            return False
+        value = node.attrs[rule.attr]
+        if rule.equals is not None and value != rule.equals:
+            return False
+        if rule.contains is not None and rule.contains.lower() not in value.lower():
+            return False
+    if rule.text and rule.text.lower() not in ' '.join(node.text().split()).lower():
+        return False
+    if rule.style:
+        style = computed_style(node, css_rules, cache)
+        if any(style.get(prop) != value for prop, value in rule.style):
+            return False
+    return True
+
+
+def run_checks(compiled_rules, code):
+    """Pure check of one submission. Returns the failure messages ([] = passed)."""
+    root, css = parse_html(code)
+    css_rules = parse_css(css)
+    cache = {}
+    failures = []
+    for rule in compiled_rules:
+        nodes = select(root, rule.selector)
+        count = len(nodes)
+        if rule.count is not None and count != rule.count:
+            ok = False
+        elif rule.max is not None and count > rule.max:
+            ok = False
+        elif count < (rule.min if rule.min is not None else (0 if rule.count == 0 or rule.max is not None else 1)):
+            ok = False
+        elif not (rule.attr or rule.text or rule.style):
+            ok = True
+        else:
+            checks = (_element_ok(rule, node, css_rules, cache) for node in nodes)
+            ok = all(checks) if rule.all else any(checks)
+        if not ok:
+            failures.append(_describe(rule))
+    return failures
+
+
+# --- Sandbox ---------------------------------------------------------------------
+
+class ValidationResult(NamedTuple):
+    passed: bool
+    failures: list
+    error: Optional[str] = None  # set when the submission couldn't be checked at all
+
+
+class SubmissionTooExpensive(Exception):
+    pass
+
+
+def _limits():
+    return (getattr(settings, 'VALIDATOR_CPU_SECONDS', 2),
+            getattr(settings, 'VALIDATOR_MEMORY_MB', 256))
+
+
+def _on_cpu_limit(signum, frame):
+    raise SubmissionTooExpensive("CPU time limit")
+
+
+def _init_worker(memory_mb):
+    if resource is not None:
+        limit = memory_mb * 1024 * 1024
+        resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+        signal.signal(signal.SIGXCPU, _on_cpu_limit)
+
+
+def _checked_in_worker(compiled_rules, code, cpu_seconds):
+    # RLIMIT_CPU counts the worker's whole lifetime: allow `cpu_seconds` more from now
+    if resource is not None:
+        usage = resource.getrusage(resource.RUSAGE_SELF)
+        used = int(usage.ru_utime + usage.ru_stime)
+        resource.setrlimit(resource.RLIMIT_CPU, (used + cpu_seconds, resource.RLIM_INFINITY))
+    try:
+        return run_checks(compiled_rules, code)
+    except MemoryError:
+        raise SubmissionTooExpensive("memory limit")
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool():
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _cpu, memory_mb = _limits()
+                # 'spawn': workers don't inherit the web process's threads, DB connections or memory
+                _pool = ProcessPoolExecutor(
+                    max_workers=getattr(settings, 'VALIDATOR_WORKERS', 2),
+                    mp_context=get_context('spawn'),
+                    initializer=_init_worker, initargs=(memory_mb,),
+                )
+    return _pool
+
+
+def _reset_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
+
+
+_compiled = {'key': None, 'by_challenge': {}}
+_compiled_lock = threading.Lock()
+
+
+def compiled_rules(challenge):
+    # Compiled once per challenge and catalog version (rules are edited in the admin)
+    from .fragments import CATALOG
+    from .versions import get_version
+
+    version = get_version(CATALOG)
+    with _compiled_lock:
+        if _compiled['key'] != version:
+            _compiled['key'], _compiled['by_challenge'] = version, {}
+        rules = _compiled['by_challenge'].get(challenge.id)
+        if rules is None:
+            rules = _compiled['by_challenge'][challenge.id] = compile_rules(challenge.rules)
+    return rules
+
+
+def validate(challenge, code):
+    """Checks a submission for `challenge`. Never raises for bad submissions (or bad rules)."""
+    if len(code.encode()) > MAX_SUBMISSION_BYTES:
+        return ValidationResult(False, [], f"Your code is too long (max {MAX_SUBMISSION_BYTES // 1000} KB).")
+    if not challenge.rules:
+        # Legacy challenges: the required snippet must appear somewhere
+        ok = challenge.validation_text.lower() in code.lower()
+        return ValidationResult(ok, [])
+
+    try:
+        rules = compiled_rules(challenge)
+    except ValueError as e:
+        # Rules that never went through the admin's clean() (e.g. a catalog import)
+        logger.error("Challenge %s has invalid rules: %s", challenge.id, e)
+        return ValidationResult(False, [], "This challenge is misconfigured, so your code can't be checked right "
+                                           "now. Please let us know!")
+    if getattr(settings, 'VALIDATOR_WORKERS', 2) == 0:
+        return ValidationResult(*_result(run_checks(rules, code)))
+
+    cpu_seconds, _memory = _limits()
+    try:
+        future = get_pool().submit(_checked_in_worker, rules, code, cpu_seconds)
+        failures = future.result(timeout=getattr(settings, 'VALIDATOR_TIMEOUT', 10))
+    except SubmissionTooExpensive:
+        return ValidationResult(False, [], "Your code took too many resources to check. Try something simpler.")
+    except FutureTimeout:
+        return ValidationResult(False, [], "Checking your code took too long. Please try again.")
+    except BrokenProcessPool:
+        _reset_pool()
+        return ValidationResult(False, [], "Your code could not be checked. Please try again.")
+    return ValidationResult(*_result(failures))
+
+
+def _result(failures):
+    return not failures, failures
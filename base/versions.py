@@ -0,0 +1,43 @@
+import time
+
+from django.core.cache import cache
+
+# Version counters live in the shared cache and never expire.
+# Cached data is keyed on a version, so bumping the counter invalidates
+# every entry built from the old one without having to find and delete them.
+
+
+def _key(name):
+    return f"version:{name}"
+
+
+def _fresh():
+    # Start from a timestamp so a counter lost to eviction can't come back
+    # at a value that older cache entries were stored under.
+    return int(time.time() * 1000)
+
+
+def get_version(name):
+    version = cache.get(_key(name))
+    if version is None:
+        cache.add(_key(name), _fresh(), timeout=None)
+        version = cache.get(_key(name))
+    return version
+
+
+async def aget_version(name):
+    # For async views: same counter, read with the cache's async API
+    version = await cache.aget(_key(name))
+    if version is None:
+        await cache.aadd(_key(name), _fresh(), timeout=None)
+        version = await cache.aget(_key(name))
+    return version
+
+
+def bump_version(name):
+    try:
+        return cache.incr(_key(name))
+    except ValueError:
+        # Counter missing (first use or evicted)
+        cache.add(_key(name), _fresh(), timeout=None)
+        return cache.incr(_key(name))
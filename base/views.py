@@ -8,65 +8,54 @@ from django.contrib import messages # Import for error messages
 from .models import Subject, Material, Goal, Question, Profile, UserProgress, JournalEntry
 from django.shortcuts import render, redirect, get_object_or_404
 from .models import Certificate
-from .utils import generate_certificate_image
-from django.utils import timezone
 from .models import PracticalChallenge 
+from django.http import Http404, JsonResponse
+from django.contrib.admin.views.decorators import staff_member_required
+from django.utils.functional import SimpleLazyObject
+from django.template.loader import render_to_string
+from . import attempts, catalog, fragments, grading, journal, leaderboard, uploads, validator
+from .completion import complete_goal
+from .progress import progress_for, subject_progress
 
 
-def check_course_completion(user, subject):
-    # Get total goals for this subject
-    total_goals = Goal.objects.filter(subject=subject).count()
-    
-    # Get completed goals for this user & subject
-    completed_goals = UserProgress.objects.filter(user=user, goal__subject=subject, is_completed=True).count()
-
-    if total_goals > 0 and completed_goals == total_goals:
-        # Check if certificate already exists
-        if not Certificate.objects.filter(user=user, subject=subject).exists():
-            # GENERATE CERTIFICATE
-            img_file = generate_certificate_image(
-                user.username, 
-                subject.name, 
-                timezone.now().strftime("%Y-%m-%d")
-            )
-            cert = Certificate.objects.create(user=user, subject=subject)
-            cert.image.save(f"cert_{user.id}_{subject.id}.png", img_file)
-            return cert
-    return None
 def home(request):
     # 1. CHECK: If user is NOT logged in, show the Landing Page
     if not request.user.is_authenticated:
         return render(request, 'base/landing.html')
 
     # 2. IF LOGGED IN: Run the Dashboard Logic
-    subjects = Subject.objects.all()
+    # Everything here is lazy: the template caches each panel (base/fragments.py),
+    # so on a warm hit none of these queries run.
+    subjects = catalog.subjects()
     
-    # Fetch Leaderboard
-    leaderboard = Profile.objects.order_by('-total_score')[:5] 
+    # Fetch Leaderboard (materialized rank table, see base/leaderboard.py)
+    top_learners = leaderboard.top(5)
+    my_rank = SimpleLazyObject(lambda: leaderboard.rank_for(request.user)[0])
 
-    context = {'subjects': subjects, 'leaderboard': leaderboard}
+    context = {'subjects': subjects, 'leaderboard': top_learners, 'my_rank': my_rank}
     return render(request, 'base/home.html', context)
 
 @login_required(login_url='login')
 def subject_page(request, pk):
-    # 1. Fetch Subject
-    subject = get_object_or_404(Subject, id=pk)
+    # 1. Fetch Subject (from the in-memory catalog snapshot, see base/catalog.py)
+    subject = catalog.get_subject_or_404(pk)
     
-    # 2. Fetch Materials & Goals
-    materials = subject.material_set.all()
-    goals = subject.goal_set.all()
+    # 2. Fetch Materials & Goals (questions/challenges included, no queries)
+    materials = catalog.materials(subject.id)
+    goals = catalog.goals(subject.id)
+
+    # 3. Get Completed Goal IDs for THIS subject (a set, so 'goal.id in completed_ids' is O(1))
+    completed_ids = progress_for(request).completed_ids(subject.id)
 
-    # 3. Get Completed Goal IDs (to check off items)
-    completed_ids = UserProgress.objects.filter(
-        user=request.user, 
-        is_completed=True
-    ).values_list('goal_id', flat=True)
+    # 4. Progress counters (percentage for the header)
+    progress = subject_progress(request.user, subject)
 
     context = {
         'subject': subject, 
         'materials': materials, 
         'goals': goals,
-        'completed_ids': completed_ids 
+        'completed_ids': completed_ids,
+        'progress': progress,
         # Note: We do NOT need to pass 'challenges' here. 
         # The template accesses them via goal.practicalchallenge
     }
@@ -91,6 +80,7 @@ def register_page(request):
             user = form.save()
             # Create a Profile for the new user so they have a Score of 0
             Profile.objects.create(user=user) 
+            leaderboard.record_score(user, 0)
             login(request, user)
             return redirect('home')
     else:
@@ -103,71 +93,47 @@ def logout_user(request):
     logout(request)
     return redirect('login')
 @login_required(login_url='login')
-@login_required(login_url='login')
 def mark_complete(request, subject_id, goal_id):
     if request.method == 'POST':
-        goal = Goal.objects.get(id=goal_id)
-        
-        # Check if already completed
-        already_done = UserProgress.objects.filter(user=request.user, goal=goal).exists()
+        goal = catalog.get_goal_or_404(goal_id)
         
-        if not already_done:
-            UserProgress.objects.create(user=request.user, goal=goal, is_completed=True)
-            
-            # --- FIX: Safe Profile Access ---
-            # This gets the profile if it exists, OR creates it if it's missing
-            profile, created = Profile.objects.get_or_create(user=request.user)
-            
-            profile.total_score += goal.points
-            profile.save()
-
-            new_cert = check_course_completion(request.user, goal.subject)
-        if new_cert:
-            return redirect('certificate', pk=new_cert.id)
+        # Mark as done + award XP (no-op if already completed, see base/completion.py)
+        result = complete_goal(request.user, goal, 'goal')
+        if result.certificate:
+            return redirect('certificate', pk=result.certificate.id)
             
     return redirect('subject', pk=subject_id)
 @login_required(login_url='login')
 def submit_quiz(request, subject_id, goal_id):
     if request.method == 'POST':
-        # 1. Fetch Goal and Questions
-        goal = Goal.objects.get(id=goal_id)
-        questions = goal.questions.all()
+        # 1. Fetch Goal and its compiled answer key (cached, see base/grading.py)
+        goal = catalog.get_goal_or_404(goal_id)
+        key = grading.answer_key(goal.id)
         
-        score = 0
-        total = questions.count()
-        
-        # 2. Grade the Quiz
-        for q in questions:
-            # Get user's selected option from the HTML form
-            user_answer = request.POST.get(f'question_{q.id}')
-            if user_answer == q.correct_option:
-                score += 1
+        # 2. Grade the Quiz in one pass over the submitted form
+        result = grading.grade(key, request.POST)
+        if result.total:
+            # Kept for question-difficulty stats; buffered, written in batches
+            attempts.record_attempt(request.user, result)
         
         # 3. Check Logic (Must get 100% to pass)
-        if score == total:
-            # Check if already completed to prevent double XP
-            progress_exists = UserProgress.objects.filter(user=request.user, goal=goal).exists()
+        if result.passed:
+            # A. Mark as Done + Add XP (only the first time, prevents double XP)
+            completion = complete_goal(request.user, goal, 'quiz')
             
-            if not progress_exists:
-                # A. Mark as Done
-                UserProgress.objects.create(user=request.user, goal=goal, is_completed=True)
-                
-                # B. Add XP (Safe Profile Access)
-                profile, created = Profile.objects.get_or_create(user=request.user)
-                profile.total_score += goal.points
-                profile.save()
-                
+            if completion.created:
                 messages.success(request, f"Quiz Passed! +{goal.points} XP")
                 
-                # C. Check for Certificate (Course Completion)
-                new_cert = check_course_completion(request.user, goal.subject)
-                if new_cert:
+                # B. Check for Certificate (Course Completion)
+                if completion.certificate:
                     # Redirect to the celebration page
-                    return redirect('certificate', pk=new_cert.id)
+                    return redirect('certificate', pk=completion.certificate.id)
             else:
                 messages.info(request, "You have already completed this quiz.")
-        else:
-            messages.error(request, f"You scored {score}/{total}. You need 100% to pass. Try again!")
+        elif result.total:
+            wrong = ", ".join(str(n) for n in result.wrong_numbers)
+            messages.error(request, f"You scored {result.score}/{result.total}. You need 100% to pass. "
+                                    f"Check question(s) {wrong} and try again!")
             
     # If not a certificate redirect, go back to the subject page
     return redirect('subject', pk=subject_id)
@@ -180,7 +146,12 @@ def journal_page(request):
         # NEW INPUTS
         start_time = request.POST.get('start_time')
         end_time = request.POST.get('end_time')
-        image = request.FILES.get('image')
+        # Size/type-checked and re-encoded (no metadata, downsampled if huge) before it reaches the ImageField
+        try:
+            image = uploads.accept_image(request, 'image')
+        except uploads.UploadRejected as exc:
+            messages.error(request, str(exc))
+            return redirect('journal')
 
         JournalEntry.objects.create(
             user=request.user,
@@ -193,11 +164,28 @@ def journal_page(request):
         )
         return redirect('journal')
 
-    # Sort by date, then by start_time
-    entries = JournalEntry.objects.filter(user=request.user).order_by('-date', 'start_time')
-    context = {'entries': entries}
+    # First page of the timeline (newest day first, then by start_time); the rest loads on scroll
+    start, end = journal.parse_range(request.GET)
+    entries, next_cursor = journal.entries_page(request.user, start=start, end=end)
+    context = {'entries': entries, 'next_cursor': next_cursor, 'start': start, 'end': end}
     return render(request, 'base/journal.html', context)
 @login_required(login_url='login')
+def journal_entries(request):
+    # Infinite-scroll endpoint: the next page of timeline cards as HTML + the next cursor
+    start, end = journal.parse_range(request.GET)
+    try:
+        entries, next_cursor = journal.entries_page(
+            request.user, cursor=request.GET.get('cursor'), start=start, end=end
+        )
+    except journal.InvalidCursor:
+        return JsonResponse({'error': 'Invalid cursor'}, status=400)
+
+    html = render_to_string('base/journal_entries.html', {
+        'entries': entries,
+        'continued_date': request.GET.get('continued'),
+    }, request=request)
+    return JsonResponse({'html': html, 'next': next_cursor})
+@login_required(login_url='login')
 def edit_journal(request, pk):
     entry = get_object_or_404(JournalEntry, id=pk, user=request.user)
 
@@ -209,8 +197,13 @@ def edit_journal(request, pk):
         entry.end_time = request.POST.get('end_time')
         entry.description = request.POST.get('description')
         
-        if request.FILES.get('image'):
-            entry.image = request.FILES.get('image')
+        try:
+            image = uploads.accept_image(request, 'image')
+        except uploads.UploadRejected as exc:
+            messages.error(request, str(exc))
+            return redirect('edit_journal', pk=entry.id)
+        if image:
+            entry.image = image
             
         entry.save()
         return redirect('journal')
@@ -221,11 +214,17 @@ def edit_journal(request, pk):
 def profile_page(request):
     user = request.user
     
-    # --- FIX: Safe Access ---
-    # This gets the profile if it exists, OR creates it immediately if missing
-    profile, created = Profile.objects.get_or_create(user=user)
+    # Loaded (and created if missing) once per request by base.middleware.ProfileMiddleware
+    profile = request.profile
 
     if request.method == 'POST':
+        # 0. Reject a bad picture before changing anything
+        try:
+            profile_pic = uploads.accept_image(request, 'profile_pic')
+        except uploads.UploadRejected as exc:
+            messages.error(request, str(exc))
+            return redirect('profile')
+
         # 1. Update User Data (Auth)
         user.username = request.POST.get('username')
         user.email = request.POST.get('email')
@@ -235,53 +234,68 @@ def profile_page(request):
         profile.bio = request.POST.get('bio')
         
         # Check if a new image was uploaded
-        if request.FILES.get('profile_pic'):
-            profile.profile_pic = request.FILES.get('profile_pic')
+        if profile_pic:
+            profile.profile_pic = profile_pic
         
-        profile.save()
+        # Only the edited fields: total_score is owned by base/xp.py
+        profile.save(update_fields=['bio', 'profile_pic'])
         return redirect('profile')
 
-    context = {'user': user, 'profile': profile}
+    # 3. Course progress per subject
+    subject_progress = progress_for(request).summary()
+
+    context = {'user': user, 'profile': profile, 'subject_progress': subject_progress}
     return render(request, 'base/profile.html', context)
 @login_required(login_url='login')
 def certificate_view(request, pk):
-    cert = get_object_or_404(Certificate, id=pk)
-    context = {'cert': cert}
+    cert = get_object_or_404(Certificate.objects.select_related('user', 'subject', 'render_job'), id=pk)
+    # The image may still be rendering in the background; the template polls until it's ready
+    render_failed = hasattr(cert, 'render_job') and cert.render_job.status == 'failed'
+    context = {'cert': cert, 'render_failed': render_failed}
     return render(request, 'base/certificate.html', context)
 @login_required(login_url='login')
 def practical_page(request, goal_id):
-    goal = get_object_or_404(Goal, id=goal_id)
+    goal = catalog.get_goal_or_404(goal_id)
     # Get the challenge linked to this goal (or 404 if none exists)
-    challenge = get_object_or_404(PracticalChallenge, goal=goal)
+    if not goal.has_challenge:
+        raise Http404("This goal has no code lab")
+    challenge = goal.practicalchallenge
     
     context = {'goal': goal, 'challenge': challenge}
     return render(request, 'base/practical_lab.html', context)
 
 @login_required(login_url='login')
 def verify_code(request, challenge_id):
+    challenge = catalog.get_challenge_or_404(challenge_id)
+    goal = catalog.get_goal_or_404(challenge.goal_id)
+
     if request.method == 'POST':
-        challenge = get_object_or_404(PracticalChallenge, id=challenge_id)
-        user_code = request.POST.get('code_submission')
+        user_code = request.POST.get('code_submission', '')
         
-        # Simple Validation: Check if the required text exists in their code
-        # (In a real app, you'd parse the AST, but this works for basic learning)
-        if challenge.validation_text.lower() in user_code.lower():
+        # Parse the page and check the challenge's rules (in the validator pool, see base/validator.py)
+        check = validator.validate(challenge, user_code)
+        if check.passed:
             
-            # 1. Mark Goal Complete
-            UserProgress.objects.get_or_create(
-                user=request.user, 
-                goal=challenge.goal, 
-                defaults={'is_completed': True}
-            )
+            # 1. Mark Goal Complete + Award XP (only the first time)
+            result = complete_goal(request.user, goal, 'challenge')
             
-            # 2. Award XP
-            profile, _ = Profile.objects.get_or_create(user=request.user)
-            profile.total_score += challenge.goal.points
-            profile.save()
-            
-            messages.success(request, f"Correct! +{challenge.goal.points} XP")
-            return redirect('subject', pk=challenge.goal.subject.id)
+            if result.created:
+                messages.success(request, f"Correct! +{goal.points} XP")
+                if result.certificate:
+                    return redirect('certificate', pk=result.certificate.id)
+            else:
+                messages.info(request, "Correct! You have already completed this challenge.")
+            return redirect('subject', pk=goal.subject_id)
         else:
-            messages.error(request, "Not quite. Check the hint!")
+            # 2. Show what's missing and keep their code in the editor
+            messages.error(request, check.error or "Not quite. Check the hint!")
+            for failure in check.failures[:5]:
+                messages.warning(request, failure)
+            context = {'goal': goal, 'challenge': challenge, 'code': user_code}
+            return render(request, 'base/practical_lab.html', context)
             
-    return redirect('practical', goal_id=challenge.goal.id)
\ No newline at end of file
+    return redirect('practical', goal_id=goal.id)
+@staff_member_required
+def fragment_stats(request):
+    # Monitoring: hit/miss counters of the cached dashboard fragments
+    return JsonResponse(fragments.stats())
@@ -0,0 +1,28 @@
+from django.db import transaction
+from django.db.models import F
+
+from . import leaderboard
+from .models import Profile, XPEvent
+
+
+def award_xp(user, points, reason, goal=None):
+    """
+    The only place XP is handed out.
+    Appends an XPEvent and bumps Profile.total_score with an atomic F() update
+    (no read-modify-write, so concurrent awards can't overwrite each other and
+    bio/profile_pic are never rewritten), then syncs the leaderboard.
+    Returns the user's new total.
+    """
+    with transaction.atomic():
+        XPEvent.objects.create(user=user, goal=goal, points=points, reason=reason)
+
+        profiles = Profile.objects.filter(user=user)
+        if not profiles.update(total_score=F('total_score') + points):
+            # Profile missing (e.g. user created in the admin)
+            Profile.objects.get_or_create(user=user)
+            profiles.update(total_score=F('total_score') + points)
+
+        # Our UPDATE holds the row lock until commit, so this read is exactly our result
+        total = profiles.values_list('total_score', flat=True).get()
+        leaderboard.record_score(user, total)
+    return total
@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/6.0/ref/settings/
 """
 
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -46,6 +47,7 @@ MIDDLEWARE = [
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'base.middleware.ProfileMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -76,7 +78,7 @@ WSGI_APPLICATION = 'studybuddy.wsgi.application'
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.postgresql',
-        'NAME': 'study_buddy',     # The name you gave in pgAdmin
+        'NAME': os.environ.get('DATABASE_NAME', 'study_buddy'),  # The name you gave in pgAdmin
         'USER': 'postgres',        # The default user
         'PASSWORD': 'your_password_here', # <--- PUT YOUR PGADMIN PASSWORD HERE
         'HOST': 'localhost',
@@ -85,6 +87,25 @@ DATABASES = {
 }
 
 
+# Shared cache: version counters, the catalog snapshot, cached fragments and
+# profiles must be the same for every worker process (locmem is per-process).
+# Set REDIS_URL (e.g. redis://127.0.0.1:6379/1, needs `pip install redis`) whenever
+# more than one worker process serves the site; locmem is fine for a single runserver.
+if os.environ.get('REDIS_URL'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': os.environ['REDIS_URL'],
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    }
+
+
 # Password validation
 # https://docs.djangoproject.com/en/6.0/ref/settings/#auth-password-validators
 
@@ -125,3 +146,57 @@ MEDIA_URL = '/media/'
 
 # Path where media is stored
 MEDIA_ROOT = BASE_DIR / 'media'
+
+# Uploads are stored by content hash and deduplicated (see base/storage.py).
+# Unreferenced blobs are removed with: python manage.py gc_media
+STORAGES = {
+    'default': {'BACKEND': 'base.storage.ContentAddressedStorage'},
+    'staticfiles': {'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage'},
+}
+
+# Background work (certificate images, ...) runs in an in-process thread pool.
+# Leftover jobs can be drained with: python manage.py render_certificates
+BACKGROUND_WORKERS = 2
+
+# Certificate images: 'PNG' or 'WEBP'. OPTIMIZE gives smaller files at some render cost.
+CERTIFICATE_IMAGE_FORMAT = 'PNG'
+CERTIFICATE_IMAGE_OPTIMIZE = False
+# A failed render is retried after this many seconds, doubling each time (3 attempts)
+CERTIFICATE_RETRY_SECONDS = 5
+
+# Image uploads (journal + profile pictures), see base/uploads.py.
+# Files above FILE_UPLOAD_MAX_MEMORY_SIZE stream to a temp file instead of RAM;
+# the size-limit handler drops anything over IMAGE_UPLOAD_MAX_BYTES mid-stream.
+FILE_UPLOAD_HANDLERS = [
+    'base.uploads.SizeLimitUploadHandler',
+    'django.core.files.uploadhandler.MemoryFileUploadHandler',
+    'django.core.files.uploadhandler.TemporaryFileUploadHandler',
+]
+FILE_UPLOAD_MAX_MEMORY_SIZE = 256 * 1024
+IMAGE_UPLOAD_MAX_BYTES = 10 * 1024 * 1024
+IMAGE_UPLOAD_MAX_PIXELS = 40_000_000     # refused before decoding
+IMAGE_UPLOAD_MAX_FULL_DECODE_PIXELS = 16_000_000  # same, for formats without reduced-scale decoding (PNG, WebP...)
+IMAGE_UPLOAD_MAX_DIMENSION = 2560        # larger images are downsampled on upload
+
+# Sent as the 'origin' of embedded YouTube players (base/embeds.py); use the site's
+# public URL in production. After changing it run: python manage.py refresh_embed_urls
+EMBED_ORIGIN = 'http://127.0.0.1:8000'
+# Show PDF materials through the Google Docs viewer (sends their URLs to Google).
+# Off: PDFs are framed directly. Run refresh_embed_urls after changing it.
+EMBED_PDF_VIEWER = False
+
+# Quiz attempts are buffered and written in batches (base/attempts.py)
+QUIZ_ATTEMPT_BATCH_SIZE = 200
+QUIZ_ATTEMPT_FLUSH_SECONDS = 5
+
+# Code-lab submissions are checked in a process pool (base/validator.py); 0 workers = in-process
+VALIDATOR_WORKERS = 2
+VALIDATOR_CPU_SECONDS = 2       # per submission
+VALIDATOR_MEMORY_MB = 256       # per worker process
+VALIDATOR_TIMEOUT = 10          # seconds the request waits for a result
+
+# Serve home, subject, mark-complete, quiz and journal with the async views in
+# base/async_views.py. Only worth it under ASGI (studybuddy.asgi:application);
+# under WSGI each async view runs in its own event loop. (USE_ASYNC_VIEWS=1 in the
+# environment turns it on too; the loadtest benchmark starts uvicorn that way.)
+USE_ASYNC_VIEWS = os.environ.get('USE_ASYNC_VIEWS') == '1'